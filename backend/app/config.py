@@ -1,14 +1,112 @@
 import os
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+@dataclass(frozen=True)
+class ASRPool:
+    """A set of ASR endpoints serving some of the models."""
+    name: str
+    urls: str  # comma-separated base URLs, like ASR_URL
+    max_concurrent: int  # jobs in this pool at once; 0 = only the global cap
+
+
+def _parse_mapping(value: str, separator: str) -> dict[str, str]:
+    """Parse "key=value<separator>key=value" into a dict, skipping blanks."""
+    result = {}
+    for item in value.split(separator):
+        key, sep, val = item.partition("=")
+        if sep and key.strip() and val.strip():
+            result[key.strip()] = val.strip()
+    return result
+
+
 class Settings:
     ASR_BACKEND: str = os.getenv("ASR_BACKEND", "murmurai")
+    # One base URL, or several comma-separated ones to load-balance across
     ASR_URL: str = os.getenv("ASR_URL", "http://localhost:8880")
+    ASR_HEALTH_CHECK_PATH: str = os.getenv("ASR_HEALTH_CHECK_PATH", "/health")
+    ASR_HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("ASR_HEALTH_CHECK_INTERVAL_SECONDS", "15"))
+    ASR_HEALTH_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("ASR_HEALTH_CHECK_TIMEOUT_SECONDS", "5"))
+    ASR_EJECT_FAILURES: int = int(os.getenv("ASR_EJECT_FAILURES", "3"))
+    ASR_EJECT_SECONDS: float = float(os.getenv("ASR_EJECT_SECONDS", "30"))
+    # Idempotent ASR calls (status, result, cancel) are tried this many times
+    # in all, with full-jitter exponential backoff between attempts.
+    ASR_RETRY_ATTEMPTS: int = int(os.getenv("ASR_RETRY_ATTEMPTS", "3"))
+    ASR_RETRY_BASE_SECONDS: float = float(os.getenv("ASR_RETRY_BASE_SECONDS", "0.5"))
+    ASR_RETRY_MAX_SECONDS: float = float(os.getenv("ASR_RETRY_MAX_SECONDS", "10"))
     ASR_API_KEY: str = os.getenv("ASR_API_KEY", "")
+    # Extra endpoint pools for model-based routing, e.g.
+    # ASR_POOLS="gpu=http://gpu1:8880,http://gpu2:8880;cpu=http://cpu1:8880"
+    # ASR_MODEL_POOLS="large-v3=gpu,large-v3-turbo=gpu,base=cpu"
+    # ASR_POOL_MAX_CONCURRENT="gpu=4,cpu=8"
+    # Models without a mapping use the "default" pool (ASR_URL).
+    ASR_POOLS: str = os.getenv("ASR_POOLS", "")
+    ASR_MODEL_POOLS: str = os.getenv("ASR_MODEL_POOLS", "")
+    ASR_POOL_MAX_CONCURRENT: str = os.getenv("ASR_POOL_MAX_CONCURRENT", "")
+    # WhisperX requests wait this long plus the given multiple of the audio's
+    # length, and at most this many run at once per endpoint (0 = no limit).
+    WHISPERX_TIMEOUT_SECONDS: float = float(os.getenv("WHISPERX_TIMEOUT_SECONDS", "600"))
+    WHISPERX_TIMEOUT_PER_AUDIO_SECOND: float = float(os.getenv("WHISPERX_TIMEOUT_PER_AUDIO_SECOND", "1.0"))
+    WHISPERX_MAX_CONCURRENT_PER_ENDPOINT: int = int(os.getenv("WHISPERX_MAX_CONCURRENT_PER_ENDPOINT", "0"))
     ASR_MAX_CONCURRENT: int = int(os.getenv("ASR_MAX_CONCURRENT", "3"))
+    ASR_MAX_CONCURRENT_PER_USER: int = int(os.getenv("ASR_MAX_CONCURRENT_PER_USER", "0"))
+    ASR_QUEUE_MAX_PER_USER: int = int(os.getenv("ASR_QUEUE_MAX_PER_USER", "100"))
+    ASR_QUEUE_MAX_LENGTH: int = int(os.getenv("ASR_QUEUE_MAX_LENGTH", "0"))
+    ASR_BATCH_MAX_ITEMS: int = int(os.getenv("ASR_BATCH_MAX_ITEMS", "500"))
+    ASR_QUEUE_RETRY_AFTER_SECONDS: int = int(os.getenv("ASR_QUEUE_RETRY_AFTER_SECONDS", "60"))
+    # Within a priority class, each second a job has waited offsets this many
+    # seconds of its expected runtime (shortest-job-first with aging).
+    ASR_QUEUE_AGING_RATE: float = float(os.getenv("ASR_QUEUE_AGING_RATE", "1.0"))
+    # A job is promoted one priority class per this many seconds waited (0 = never).
+    ASR_QUEUE_PROMOTE_SECONDS: int = int(os.getenv("ASR_QUEUE_PROMOTE_SECONDS", "1800"))
+    ASR_POLL_MIN_SECONDS: float = float(os.getenv("ASR_POLL_MIN_SECONDS", "2"))
+    ASR_POLL_MAX_SECONDS: float = float(os.getenv("ASR_POLL_MAX_SECONDS", "60"))
+    ASR_DEFAULT_RTF: float = float(os.getenv("ASR_DEFAULT_RTF", "0.15"))
+    ASR_CALLBACK_BASE_URL: str = os.getenv("ASR_CALLBACK_BASE_URL", "")
+    ASR_CALLBACK_SECRET: str = os.getenv("ASR_CALLBACK_SECRET", "")
+    ASR_CALLBACK_FALLBACK_POLL_SECONDS: float = float(os.getenv("ASR_CALLBACK_FALLBACK_POLL_SECONDS", "60"))
+
+    # Segmented mode: split files longer than 1.5 segments at silences near
+    # every N minutes and transcribe the parts in parallel (0 = off).
+    ASR_SEGMENT_MINUTES: float = float(os.getenv("ASR_SEGMENT_MINUTES", "0"))
+    ASR_SEGMENT_MAX_PARALLEL: int = int(os.getenv("ASR_SEGMENT_MAX_PARALLEL", "4"))
+    ASR_SEGMENT_OVERLAP_SECONDS: float = float(os.getenv("ASR_SEGMENT_OVERLAP_SECONDS", "15"))
+    ASR_SEGMENT_SEARCH_SECONDS: float = float(os.getenv("ASR_SEGMENT_SEARCH_SECONDS", "60"))
+    ASR_SILENCE_NOISE_DB: float = float(os.getenv("ASR_SILENCE_NOISE_DB", "-35"))
+    ASR_SILENCE_MIN_SECONDS: float = float(os.getenv("ASR_SILENCE_MIN_SECONDS", "0.5"))
+    # Cut silences of at least ASR_TRIM_MIN_SILENCE_SECONDS out of the audio
+    # before submitting it; timestamps are mapped back afterwards.
+    ASR_TRIM_SILENCE: bool = os.getenv("ASR_TRIM_SILENCE", "false").lower() in ("true", "1", "yes")
+    ASR_TRIM_MIN_SILENCE_SECONDS: float = float(os.getenv("ASR_TRIM_MIN_SILENCE_SECONDS", "3"))
+    ASR_TRIM_PADDING_SECONDS: float = float(os.getenv("ASR_TRIM_PADDING_SECONDS", "0.5"))
+    ASR_TRIM_MIN_SAVED_SECONDS: float = float(os.getenv("ASR_TRIM_MIN_SAVED_SECONDS", "30"))
+    # Reuse ASR results for identical audio (by content hash) transcribed with
+    # identical settings. Least recently used entries are evicted beyond
+    # either limit; ASR_RESULT_CACHE_MB=0 disables the cache.
+    ASR_RESULT_CACHE_MB: float = float(os.getenv("ASR_RESULT_CACHE_MB", "256"))
+    ASR_RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("ASR_RESULT_CACHE_MAX_ENTRIES", "10000"))
+
+    # Live transcription over /api/ws/live: the audio after the last final
+    # utterance is re-transcribed every LIVE_INTERVAL_SECONDS. Utterances
+    # ending more than LIVE_FINALIZE_SECONDS before the end of the audio are
+    # final; the rest stay partial until the next pass.
+    LIVE_TRANSCRIPTION_ENABLED: bool = os.getenv("LIVE_TRANSCRIPTION_ENABLED", "false").lower() in ("true", "1", "yes")
+    LIVE_MAX_SESSIONS: int = int(os.getenv("LIVE_MAX_SESSIONS", "4"))
+    LIVE_INTERVAL_SECONDS: float = float(os.getenv("LIVE_INTERVAL_SECONDS", "5"))
+    LIVE_FINALIZE_SECONDS: float = float(os.getenv("LIVE_FINALIZE_SECONDS", "3"))
+    LIVE_MAX_WINDOW_SECONDS: float = float(os.getenv("LIVE_MAX_WINDOW_SECONDS", "30"))
+
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "10"))
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # Run the job worker inside the API process. Set false when jobs are
+    # handled by separate `python -m app.worker` processes instead.
+    JOB_WORKER_ENABLED: bool = os.getenv("JOB_WORKER_ENABLED", "true").lower() in ("true", "1", "yes")
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", "9101"))
 
     WHISPER_MODELS: list[str] = os.getenv("WHISPER_MODELS", "base,large-v3,large-v3-turbo").split(",")
     DEFAULT_WHISPER_MODEL: str = os.getenv("DEFAULT_WHISPER_MODEL", "base")
@@ -25,6 +123,8 @@ class Settings:
     CONTACT_EMAIL: str = os.getenv("CONTACT_EMAIL", "")
     DEFAULT_EXPIRY_HOURS: int = int(os.getenv("DEFAULT_EXPIRY_HOURS", "72"))
     ARCHIVE_EXPIRY_HOURS: int = int(os.getenv("ARCHIVE_EXPIRY_HOURS", "4320"))
+    # Upload sessions without a new chunk for this long are discarded
+    UPLOAD_SESSION_EXPIRY_HOURS: int = int(os.getenv("UPLOAD_SESSION_EXPIRY_HOURS", "24"))
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "")
 
     POPULAR_LANGUAGES: list[str] = os.getenv("POPULAR_LANGUAGES", "de,en,es,fr").split(",")
@@ -56,6 +156,19 @@ class Settings:
 
     APP_PUBLIC_URL: str = os.getenv("APP_PUBLIC_URL", "")
 
+    @property
+    def asr_pools(self) -> dict[str, ASRPool]:
+        caps = {name: int(cap) for name, cap in _parse_mapping(self.ASR_POOL_MAX_CONCURRENT, ",").items()}
+        pools = {"default": ASRPool("default", self.ASR_URL, caps.get("default", 0))}
+        for name, urls in _parse_mapping(self.ASR_POOLS, ";").items():
+            pools[name] = ASRPool(name, urls, caps.get(name, 0))
+        return pools
+
+    def asr_pool_for_model(self, model: str | None) -> ASRPool:
+        pools = self.asr_pools
+        name = _parse_mapping(self.ASR_MODEL_POOLS, ",").get(model or "")
+        return pools.get(name, pools["default"])
+
     @property
     def db_path(self) -> str:
         if self.DATABASE_PATH:
@@ -22,7 +22,9 @@ CREATE TABLE IF NOT EXISTS files (
     file_size INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     expires_at TIMESTAMP,
-    is_archived INTEGER DEFAULT 0
+    is_archived INTEGER DEFAULT 0,
+    origin TEXT DEFAULT 'upload',
+    content_hash TEXT
 );
 
 CREATE TABLE IF NOT EXISTS transcriptions (
@@ -45,8 +47,23 @@ CREATE TABLE IF NOT EXISTS transcriptions (
     refined_utterances_json TEXT,
     refinement_metadata_json TEXT,
     translation_source TEXT,
-    translation_source_hash TEXT
+    translation_source_hash TEXT,
+    claimed_by TEXT,
+    lease_expires_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    attempts INTEGER DEFAULT 0,
+    asr_callback_status TEXT,
+    priority_class TEXT DEFAULT 'interactive',
+    audio_duration REAL,
+    speech_map_json TEXT,
+    batch_id TEXT,
+    stage TEXT,
+    progress REAL,
+    stage_detail_json TEXT,
+    stage_started_at TIMESTAMP,
+    started_at TIMESTAMP
 );
+CREATE INDEX IF NOT EXISTS idx_transcriptions_status ON transcriptions(status);
 
 CREATE TABLE IF NOT EXISTS speaker_mappings (
     transcription_id TEXT REFERENCES transcriptions(id),
@@ -132,6 +149,82 @@ CREATE TABLE IF NOT EXISTS api_tokens (
 CREATE INDEX IF NOT EXISTS idx_api_tokens_user ON api_tokens(user_id);
 CREATE INDEX IF NOT EXISTS idx_api_tokens_hash ON api_tokens(token_hash);
 
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    user_id TEXT REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_batches_user ON batches(user_id);
+
+CREATE TABLE IF NOT EXISTS asr_jobs (
+    id TEXT PRIMARY KEY,
+    backend TEXT NOT NULL,
+    endpoint TEXT,
+    status TEXT NOT NULL,
+    audio_seconds REAL,
+    result_json TEXT,
+    error_message TEXT,
+    created_at TIMESTAMP,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS asr_slots (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    model TEXT,
+    lease_expires_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    expected_size INTEGER,
+    expected_sha256 TEXT,
+    has_video INTEGER,
+    source TEXT NOT NULL,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    writer TEXT,
+    writer_expires_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS partial_results (
+    transcription_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    utterances_json TEXT NOT NULL,
+    utterance_count INTEGER NOT NULL,
+    end_ms INTEGER,
+    created_at TIMESTAMP,
+    PRIMARY KEY (transcription_id, seq)
+);
+
+CREATE TABLE IF NOT EXISTS rtf_estimates (
+    backend TEXT NOT NULL,
+    model TEXT NOT NULL,
+    rtf REAL NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (backend, model)
+);
+
+CREATE TABLE IF NOT EXISTS asr_result_cache (
+    cache_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    settings_json TEXT NOT NULL,
+    result_json TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_asr_result_cache_last_used ON asr_result_cache(last_used_at);
+
 CREATE TABLE IF NOT EXISTS invitations (
     id TEXT PRIMARY KEY,
     email TEXT NOT NULL,
@@ -168,6 +261,26 @@ MIGRATIONS = [
     ("translation_source_hash", "transcriptions", "translation_source_hash TEXT"),
     ("source", "analyses", "source TEXT"),
     ("source_hash", "analyses", "source_hash TEXT"),
+    ("claimed_by", "transcriptions", "claimed_by TEXT"),
+    ("lease_expires_at", "transcriptions", "lease_expires_at TIMESTAMP"),
+    ("heartbeat_at", "transcriptions", "heartbeat_at TIMESTAMP"),
+    ("attempts", "transcriptions", "attempts INTEGER DEFAULT 0"),
+    ("asr_callback_status", "transcriptions", "asr_callback_status TEXT"),
+    ("origin", "files", "origin TEXT DEFAULT 'upload'"),
+    ("priority_class", "transcriptions", "priority_class TEXT DEFAULT 'interactive'"),
+    ("audio_duration", "transcriptions", "audio_duration REAL"),
+    ("speech_map_json", "transcriptions", "speech_map_json TEXT"),
+    ("content_hash", "files", "content_hash TEXT"),
+    ("batch_id", "transcriptions", "batch_id TEXT"),
+    ("stage", "transcriptions", "stage TEXT"),
+    ("progress", "transcriptions", "progress REAL"),
+    ("stage_detail_json", "transcriptions", "stage_detail_json TEXT"),
+    ("stage_started_at", "transcriptions", "stage_started_at TIMESTAMP"),
+    ("started_at", "transcriptions", "started_at TIMESTAMP"),
+    ("expected_size", "upload_sessions", "expected_size INTEGER"),
+    ("expected_sha256", "upload_sessions", "expected_sha256 TEXT"),
+    ("writer", "upload_sessions", "writer TEXT"),
+    ("writer_expires_at", "upload_sessions", "writer_expires_at TIMESTAMP"),
 ]
 
 
@@ -237,6 +350,10 @@ async def init_db(db_path: str) -> None:
             "UPDATE analyses SET source = 'original' "
             "WHERE analysis_json IS NOT NULL AND source IS NULL"
         )
+        # Indexes on migration-added columns can't live in SCHEMA, which runs
+        # before the columns exist on old databases.
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files(content_hash)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_transcriptions_batch ON transcriptions(batch_id)")
         await db.commit()
 
 
@@ -1,7 +1,7 @@
 import asyncio
 import logging
 
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Request, WebSocket
 
 from app.config import settings
 from app.database import get_db
@@ -100,6 +100,7 @@ async def get_current_user(request: Request) -> UserInfo:
             if result is not None:
                 user, token_id = result
                 user.is_admin = _is_admin_email(user.email)
+                user.via_api_token = True
                 inc(api_token_auth_total, "success")
                 asyncio.create_task(_touch_best_effort(token_id))
                 return user
@@ -142,3 +143,32 @@ async def get_current_user(request: Request) -> UserInfo:
             )
 
     return resolved
+
+
+async def get_websocket_user(websocket: WebSocket) -> UserInfo | None:
+    """The user behind an accepted WebSocket, or None after closing it (4001).
+
+    Browsers cannot send custom headers on WebSocket requests, so API tokens
+    come as `?token=`; otherwise the proxy's headers identify the user.
+    """
+    if settings.ENABLE_API_TOKENS:
+        raw = websocket.query_params.get("token")
+        if raw and raw.startswith("tw_"):
+            async with get_db() as db:
+                result = await resolve_token(db, raw_token=raw)
+            if result is None:
+                inc(api_token_auth_total, "failure")
+                inc(auth_failures_total, "invalid_token")
+                await websocket.close(code=4001, reason="Invalid token")
+                return None
+            inc(api_token_auth_total, "success")
+            user = result[0]
+            user.via_api_token = True
+            return user
+
+    user_id = websocket.headers.get("x-auth-request-user")
+    if not user_id:
+        inc(auth_failures_total, "ws_missing_headers")
+        await websocket.close(code=4001, reason="Missing authentication")
+        return None
+    return UserInfo(id=user_id, email=websocket.headers.get("x-auth-request-email"))
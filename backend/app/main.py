@@ -1,7 +1,7 @@
 import asyncio
 import os
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -9,10 +9,16 @@ from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from app.config import settings
 from app.database import init_db, get_db
-from app.routers import config_router, upload, transcription, refinement, analysis, translation, presets, tokens, invitations as invitations_router
-from app.metrics import inc, gauge_set, cleanup_runs_total, cleanup_items_deleted_total, storage_bytes, api_tokens_active, invitations_expired_total, init_label_series, users_total, users_with_transcriptions, users_new
+from app.routers import config_router, upload, transcription, live, refinement, analysis, translation, presets, tokens, asr_callback, invitations as invitations_router
+from app.metrics import inc, gauge_set, cleanup_runs_total, cleanup_items_deleted_total, upload_sessions_total, storage_bytes, api_tokens_active, invitations_expired_total, init_label_series, users_total, users_with_transcriptions, users_new
+from app.services import partial_results, upload_sessions
 from app.services.audio import has_video_stream
 from app.services.api_tokens import cleanup_stale_tokens, count_active_tokens
+from app.services.asr.balancer import start_health_checks
+from app.services.http_clients import close_clients, open_clients
+from app.services.job_queue import JobWorker
+from app.services.storage import release_files
+from app.services.pipeline import run_transcription_job
 
 
 def _dir_size_bytes(path: str) -> int:
@@ -75,19 +81,12 @@ async def cleanup_old_files():
                     )
                 """
 
-                # Get expired files to delete from disk
+                # Get expired files to delete from disk once their rows are gone
                 cursor = await db.execute(
-                    f"SELECT file_path, mp3_path FROM files WHERE id IN ({expired_files_q})",
+                    f"SELECT content_hash, file_path, mp3_path FROM files WHERE id IN ({expired_files_q})",
                     (now,),
                 )
-                rows = await cursor.fetchall()
-                for row in rows:
-                    for path in [row["file_path"], row["mp3_path"]]:
-                        if path and os.path.exists(path):
-                            try:
-                                os.unlink(path)
-                            except OSError:
-                                pass
+                expired_media = await cursor.fetchall()
 
                 # Delete related DB records
                 expired_transcriptions_q = f"SELECT id FROM transcriptions WHERE file_id IN ({expired_files_q})"
@@ -111,7 +110,22 @@ async def cleanup_old_files():
                     (now,),
                 )
                 db_files_deleted = cursor.rowcount
+                # Batches whose transcriptions are all gone
+                cursor = await db.execute(
+                    """DELETE FROM batches WHERE id NOT IN (
+                           SELECT batch_id FROM transcriptions WHERE batch_id IS NOT NULL
+                       )"""
+                )
+                batches_deleted = cursor.rowcount
+                partials_deleted = await partial_results.drop_stale(db)
+                sessions_expired = await upload_sessions.expire(db)
+                # WhisperX job rows are collected when read; anything left is stale
+                await db.execute("DELETE FROM asr_jobs WHERE created_at < ?", (
+                    (datetime.now(timezone.utc) - timedelta(days=1)).isoformat(),
+                ))
                 await db.commit()
+                # Blobs shared with unexpired uploads of the same content stay
+                await release_files(db, expired_media)
                 tokens_deleted = await cleanup_stale_tokens(db)
                 active_tokens = await count_active_tokens(db)
                 from app.services.invitations import (
@@ -127,6 +141,10 @@ async def cleanup_old_files():
             inc(cleanup_items_deleted_total, "transcription", amount=transcriptions_deleted)
             inc(cleanup_items_deleted_total, "analysis", amount=analyses_deleted)
             inc(cleanup_items_deleted_total, "speaker_mapping", amount=mappings_deleted)
+            inc(cleanup_items_deleted_total, "batch", amount=batches_deleted)
+            inc(cleanup_items_deleted_total, "partial_result", amount=partials_deleted)
+            inc(cleanup_items_deleted_total, "upload_session", amount=sessions_expired)
+            inc(upload_sessions_total, "expired", amount=sessions_expired)
             inc(cleanup_items_deleted_total, "api_token", amount=tokens_deleted)
             inc(cleanup_items_deleted_total, "invitation", amount=invitations_deleted)
             for _ in range(invitations_expired):
@@ -163,9 +181,21 @@ async def lifespan(app: FastAPI):
         gauge_set(api_tokens_active, await count_active_tokens(db))
         await refresh_user_gauges(db)
     init_label_series()
+    open_clients()
     cleanup_task = asyncio.create_task(cleanup_old_files())
+    job_worker = None
+    stop_health_checks = asyncio.Event()
+    if settings.JOB_WORKER_ENABLED:
+        # Picks up pending jobs and any orphaned by a previous process right away
+        job_worker = JobWorker(run_transcription_job)
+        job_worker.start()
+        start_health_checks(stop_health_checks)
     yield
     cleanup_task.cancel()
+    stop_health_checks.set()
+    if job_worker is not None:
+        await job_worker.stop()
+    await close_clients()
 
 
 app = FastAPI(title="Transcription Service", lifespan=lifespan)
@@ -181,10 +211,12 @@ if settings.DEV_MODE:
 app.include_router(config_router.router)
 app.include_router(upload.router)
 app.include_router(transcription.router)
+app.include_router(live.router)
 app.include_router(refinement.router)
 app.include_router(analysis.router)
 app.include_router(translation.router)
 app.include_router(presets.router)
+app.include_router(asr_callback.router)
 if settings.ENABLE_API_TOKENS:
     app.include_router(tokens.router)
 # Invitations router is mounted unconditionally; its `_require_invitation_mode`
@@ -41,6 +41,14 @@ if _enabled:
 
 # --- Uploads ---
 file_uploads_total = _counter("transcription_file_uploads_total", "Total file uploads", ["file_type", "status"])
+file_uploads_deduplicated_total = _counter(
+    "transcription_file_uploads_deduplicated_total",
+    "Uploads whose content was already stored and reused without converting again",
+)
+upload_sessions_total = _counter(
+    "transcription_upload_sessions_total", "Chunked upload sessions by outcome",
+    ["outcome"],  # outcome: finalized | aborted | expired | invalid
+)
 file_upload_size_bytes = _histogram(
     "transcription_file_upload_size_bytes", "Upload size in bytes",
     buckets=[1024, 10240, 102400, 1048576, 10485760, 104857600, 1073741824],
@@ -50,7 +58,7 @@ file_renames_total = _counter("transcription_file_renames_total", "Total file re
 # --- Transcription jobs ---
 transcriptions_total = _counter(
     "transcription_jobs_total", "Total transcription jobs",
-    ["backend", "language", "model", "status"],
+    ["backend", "language", "model", "status", "cache_hit"],
 )
 transcription_duration_seconds = _histogram(
     "transcription_duration_seconds", "Transcription wall-clock duration",
@@ -68,11 +76,40 @@ transcription_realtime_factor = _histogram(
     buckets=[0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16],
 )
 transcription_queue_depth = _gauge("transcription_queue_depth", "Transcriptions in 'pending' state waiting to start")
+transcription_queue_users = _gauge("transcription_queue_users", "Distinct users with at least one pending transcription")
+transcription_queue_rejections_total = _counter(
+    "transcription_queue_rejections_total", "Transcription requests rejected with 429 by queue length limits",
+    ["scope"],  # scope: user | global
+)
 transcription_queue_wait_seconds = _histogram(
     "transcription_queue_wait_seconds", "Time a job spent pending before processing started",
-    labels=["backend"],
+    labels=["backend", "priority"],
     buckets=[0.1, 0.5, 1, 5, 15, 30, 60, 300, 900],
 )
+transcription_asr_polls = _histogram(
+    "transcription_asr_polls_per_job", "ASR get_status calls made per job before it finished",
+    labels=["backend"],
+    buckets=[1, 2, 3, 5, 8, 13, 21, 50, 100],
+)
+transcription_trimmed_audio_seconds = _counter(
+    "transcription_trimmed_audio_seconds_total",
+    "Silent audio seconds cut out before ASR submission (ASR time not spent)",
+    ["backend"],
+)
+transcription_segments = _histogram(
+    "transcription_segments_per_job", "ASR segments a job was split into in segmented mode",
+    labels=["backend"],
+    buckets=[2, 3, 4, 6, 8, 12, 16, 24, 32],
+)
+asr_callbacks_total = _counter(
+    "transcription_asr_callbacks_total", "Completion callbacks received from the ASR backend",
+    ["result"],  # result: accepted | rejected | stale | unknown
+)
+transcription_cancelled_audio_seconds = _counter(
+    "transcription_cancelled_audio_seconds_total",
+    "Audio seconds of cancelled jobs, i.e. ASR work reclaimed by cancellation",
+    ["backend", "stage"],  # stage: pending | processing
+)
 active_transcriptions = _gauge("transcription_active_jobs", "Active transcription jobs")
 diarization_speakers_total = _counter(
     "transcription_diarization_speakers_total",
@@ -80,6 +117,69 @@ diarization_speakers_total = _counter(
     ["count"],
 )
 
+# --- ASR endpoints (see services/asr/balancer.py) ---
+asr_endpoint_inflight = (
+    Gauge("transcription_asr_endpoint_inflight", "Open requests per ASR endpoint", ["endpoint"])
+    if _enabled else None
+)
+asr_endpoint_outstanding_audio_seconds = (
+    Gauge(
+        "transcription_asr_endpoint_outstanding_audio_seconds",
+        "Audio seconds submitted to an ASR endpoint and not yet collected", ["endpoint"],
+    )
+    if _enabled else None
+)
+asr_endpoint_healthy = (
+    Gauge("transcription_asr_endpoint_healthy", "1 if the ASR endpoint is in rotation, 0 if ejected", ["endpoint"])
+    if _enabled else None
+)
+asr_endpoint_circuit_state = (
+    Gauge(
+        "transcription_asr_endpoint_circuit_state",
+        "Circuit breaker state per ASR endpoint: 0 closed, 1 half-open, 2 open", ["endpoint"],
+    )
+    if _enabled else None
+)
+asr_endpoint_retries_total = _counter(
+    "transcription_asr_endpoint_retries_total", "ASR requests retried after a transient failure",
+    ["endpoint", "operation"],
+)
+transcriptions_held_total = _counter(
+    "transcription_jobs_held_total",
+    "Jobs put back in the queue because the ASR backend was unreachable", ["reason"],
+)
+asr_endpoint_request_duration_seconds = _histogram(
+    "transcription_asr_endpoint_request_duration_seconds", "ASR endpoint request latency",
+    labels=["endpoint", "operation"],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600],
+)
+
+whisperx_jobs = (
+    Gauge(
+        "transcription_whisperx_jobs",
+        "WhisperX jobs of this process by state (queued for an endpoint slot / running)", ["state"],
+    )
+    if _enabled else None
+)
+
+asr_upload_bytes = _counter(
+    "transcription_asr_upload_bytes_total", "Audio bytes uploaded to the ASR backend", ["backend"],
+)
+asr_upload_throughput_bytes_per_second = _histogram(
+    "transcription_asr_upload_throughput_bytes_per_second", "Per-request upload throughput to the ASR backend",
+    labels=["backend"],
+    buckets=[1e5, 5e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 1e9],
+)
+
+# --- Outbound HTTP clients (see services/http_clients.py) ---
+http_pool_connections = (
+    Gauge(
+        "transcription_http_pool_connections", "Pooled outbound HTTP connections",
+        ["upstream", "state"],  # upstream: asr | llm | idp; state: active | idle
+    )
+    if _enabled else None
+)
+
 # --- Editing ---
 edits_saved_total = _counter("transcription_edits_saved_total", "Transcription edits saved")
 speaker_renames_total = _counter("transcription_speaker_renames_total", "Speaker renames")
@@ -124,13 +224,28 @@ websocket_connections_active = _gauge("transcription_websocket_connections_activ
 websocket_connections_total = _counter("transcription_websocket_connections_total", "Total WebSocket connections")
 websocket_messages_sent_total = _counter(
     "transcription_websocket_messages_sent_total", "WebSocket messages sent to clients",
-    ["type"],  # type: status | error
+    ["type"],  # type: status | partial | error | transcript | done
 )
 websocket_disconnects_total = _counter(
     "transcription_websocket_disconnects_total", "WebSocket disconnects",
     ["reason"],  # reason: client_disconnect | auth_missing | not_found | completed | failed | not_found_record | error
 )
 
+# --- Live transcription ---
+live_sessions_active = _gauge("transcription_live_sessions_active", "Open live transcription sessions")
+live_sessions_total = _counter(
+    "transcription_live_sessions_total", "Live transcription sessions by outcome",
+    ["outcome"],  # outcome: completed | aborted | rejected | failed
+)
+live_window_duration_seconds = _histogram(
+    "transcription_live_window_duration_seconds", "Time to transcribe one live audio window",
+    ["backend"],
+    buckets=[0.25, 0.5, 1, 2, 3, 5, 10, 20, 30],
+)
+live_passes_skipped_total = _counter(
+    "transcription_live_passes_skipped_total", "Live transcription passes skipped because every ASR slot was taken",
+)
+
 # --- Cleanup ---
 cleanup_runs_total = _counter("transcription_cleanup_runs_total", "Cleanup job runs", ["status"])
 cleanup_items_deleted_total = _counter("transcription_cleanup_items_deleted_total", "Items deleted by cleanup", ["resource_type"])
@@ -280,8 +395,9 @@ def init_label_series() -> None:
     models = {"default", *settings.WHISPER_MODELS}
     for language in languages:
         for model in models:
-            for status in ("completed", "failed"):
-                transcriptions_total.labels(backend, language, model, status).inc(0)
+            for status in ("completed", "failed", "cancelled"):
+                transcriptions_total.labels(backend, language, model, status, "false").inc(0)
+            transcriptions_total.labels(backend, language, model, "completed", "true").inc(0)
 
     if users_new is not None:
         users_new.labels("7d").set(0)
@@ -12,6 +12,7 @@ class UserInfo(BaseModel):
     id: str
     email: str | None = None
     is_admin: bool = False
+    via_api_token: bool = False
 
 
 class FileInfo(BaseModel):
@@ -22,6 +23,24 @@ class FileInfo(BaseModel):
     has_video: bool = False
 
 
+class UploadSessionRequest(BaseModel):
+    filename: str
+    has_video: bool | None = None
+    source: str = "upload"
+    # Optional, checked when the session is finalized
+    size: int | None = None
+    sha256: str | None = None
+
+
+class UploadSession(BaseModel):
+    id: str
+    filename: str
+    # Bytes received so far: where the next chunk must start
+    offset: int
+    size: int | None = None
+    expires_at: str
+
+
 class TranscriptionSettings(BaseModel):
     file_id: str
     language: str | None = None
@@ -32,11 +51,76 @@ class TranscriptionSettings(BaseModel):
     hotwords: str | None = None
 
 
+class BatchTranscriptionItem(BaseModel):
+    """One file of a batch; settings left unset fall back to the batch's."""
+    file_id: str
+    language: str | None = None
+    model: str | None = None
+    min_speakers: int | None = None
+    max_speakers: int | None = None
+    initial_prompt: str | None = None
+    hotwords: str | None = None
+
+
+class BatchTranscriptionRequest(BaseModel):
+    """Files to transcribe (`file_ids` and/or `items`) with shared settings."""
+    file_ids: list[str] = []
+    items: list[BatchTranscriptionItem] = []
+    language: str | None = None
+    model: str = "base"
+    min_speakers: int = 0
+    max_speakers: int = 0
+    initial_prompt: str | None = None
+    hotwords: str | None = None
+
+    @model_validator(mode="after")
+    def at_least_one_file(self) -> "BatchTranscriptionRequest":
+        if not self.file_ids and not self.items:
+            raise ValueError("At least one of file_ids or items must be provided")
+        return self
+
+    def expand(self) -> list[TranscriptionSettings]:
+        """Per-file settings, shared values overridden by each item's own."""
+        shared = self.model_dump(exclude={"file_ids", "items"})
+        items = [BatchTranscriptionItem(file_id=f) for f in self.file_ids] + self.items
+        return [
+            TranscriptionSettings(**{**shared, **item.model_dump(exclude_none=True)})
+            for item in items
+        ]
+
+
+class BatchItemStatus(BaseModel):
+    id: str
+    file_id: str
+    status: str
+    error: str | None = None
+
+
+class BatchStatus(BaseModel):
+    id: str
+    # pending until a job starts, processing while any is queued or running,
+    # then completed, failed (nothing completed) or partial
+    status: str
+    created_at: str
+    total: int
+    counts: dict[str, int]
+    items: list[BatchItemStatus]
+
+
 class TranscriptionStatus(BaseModel):
     id: str
     status: str
-    progress: float | None = None
+    progress: float | None = None  # 0..1 within the current stage, when known
     error: str | None = None
+    # queued/converting/uploading/transcribing/generating_title (services/progress.py)
+    stage: str | None = None
+    stage_detail: dict = {}
+    # Estimates from the queue ahead and observed realtime factors (services/eta.py)
+    queue_position: int | None = None
+    expected_start_at: str | None = None
+    expected_completion_at: str | None = None
+    # Utterances already final while segments are still running (services/partial_results.py)
+    partial_utterances: int = 0
 
 
 class Utterance(BaseModel):
@@ -216,6 +300,14 @@ class TranslationResult(BaseModel):
     source_available: bool = True
 
 
+class ModelQueue(BaseModel):
+    """Load on the endpoint pool a model is routed to; shared by all its models."""
+    pool: str
+    queued: int
+    running: int
+    max_concurrent: int  # 0 = only the global cap
+
+
 class ConfigResponse(BaseModel):
     asr_backend: str
     whisper_models: list[str]
@@ -229,6 +321,8 @@ class ConfigResponse(BaseModel):
     contact_email: str = ""
     is_admin: bool = False
     invitation_mode: bool = False
+    model_queues: dict[str, ModelQueue] = {}
+    live_transcription: bool = False
 
 
 # --- Invitations ---
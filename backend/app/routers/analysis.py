@@ -7,6 +7,7 @@ from app.dependencies import get_current_user
 from app.router_helpers import ensure_transcription_owned, load_speaker_mappings
 from app.models import UserInfo, AnalysisRequest, AnalysisListItem
 from app.database import get_db
+from app.services.http_clients import get_client
 from app.services.llm import get_llm_provider
 from app.services.llm.prompt import (
     format_transcript_for_llm,
@@ -202,24 +203,22 @@ async def _call_llm(provider, user_content: str, system_prompt: str) -> dict:
         return json.loads(content)
     elif hasattr(provider, "_base_url"):
         # Ollama provider
-        import httpx
-        async with httpx.AsyncClient(timeout=300) as client:
-            resp = await client.post(
-                f"{provider._base_url}/api/chat",
-                json={
-                    "model": provider._model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_content},
-                    ],
-                    "stream": False,
-                    "format": "json",
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            track_llm_tokens(settings.LLM_PROVIDER, provider._model, "analysis", data)
-            return json.loads(data["message"]["content"])
+        resp = await get_client("llm").post(
+            f"{provider._base_url}/api/chat",
+            json={
+                "model": provider._model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content},
+                ],
+                "stream": False,
+                "format": "json",
+            },
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        track_llm_tokens(settings.LLM_PROVIDER, provider._model, "analysis", data)
+        return json.loads(data["message"]["content"])
     else:
         raise HTTPException(status_code=503, detail="Unsupported LLM provider for analysis")
 
@@ -0,0 +1,61 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.database import get_db
+from app.metrics import inc, asr_callbacks_total
+from app.services.asr import callbacks
+from app.services.asr.balancer import raw_job_id
+
+router = APIRouter()
+
+
+@router.post("/api/asr/callback/{transcription_id}")
+async def asr_callback(transcription_id: str, request: Request):
+    """Completion webhook called by the ASR server, authenticated per job.
+
+    Deliberately outside get_current_user: the caller is the ASR host, which
+    proves itself with the HMAC token registered at submit time.
+    """
+    if not callbacks.callbacks_enabled():
+        raise HTTPException(status_code=404)
+    if not callbacks.verify_callback_token(transcription_id, request.headers.get(callbacks.CALLBACK_HEADER)):
+        inc(asr_callbacks_total, "rejected")
+        raise HTTPException(status_code=401, detail="Invalid callback token")
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        # Valid JSON but not an object: still a wake-up, just without details
+        payload = {}
+    status = callbacks.callback_status(payload.get("status"))
+    reported_job = payload.get("transcript_id") or payload.get("id")
+
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT asr_job_id FROM transcriptions WHERE id = ?", (transcription_id,),
+        )
+        row = await cursor.fetchone()
+        if not row:
+            inc(asr_callbacks_total, "unknown")
+            raise HTTPException(status_code=404, detail="Transcription not found")
+        # With several endpoints the stored id carries "@<url>"; ASR reports its own part
+        if reported_job and row["asr_job_id"] and reported_job not in (
+            row["asr_job_id"], raw_job_id(row["asr_job_id"]),
+        ):
+            # Late callback for a job that was since re-submitted
+            inc(asr_callbacks_total, "stale")
+            return {"status": "ignored"}
+        if status:
+            await db.execute(
+                "UPDATE transcriptions SET asr_callback_status = ? WHERE id = ?",
+                (status, transcription_id),
+            )
+            await db.commit()
+
+    woke = callbacks.notify(transcription_id)
+    inc(asr_callbacks_total, "accepted")
+    logging.info("ASR callback for %s: %s (waiter %s)", transcription_id, status, "woken" if woke else "not local")
+    return {"status": "ok"}
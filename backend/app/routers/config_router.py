@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends
 from app.config import settings
+from app.database import get_db
 from app.dependencies import get_current_user
-from app.models import ConfigResponse, UserInfo
+from app.models import ConfigResponse, ModelQueue, UserInfo
 from app.metrics import metrics_response
+from app.services.scheduler import pool_queue_depths
 
 router = APIRouter()
 
@@ -14,6 +16,15 @@ async def health():
 
 @router.get("/api/config", response_model=ConfigResponse)
 async def get_config(user: UserInfo = Depends(get_current_user)):
+    async with get_db() as db:
+        queued, running = await pool_queue_depths(db)
+    model_queues = {}
+    for model in settings.WHISPER_MODELS:
+        pool = settings.asr_pool_for_model(model)
+        model_queues[model] = ModelQueue(
+            pool=pool.name, queued=queued.get(pool.name, 0), running=running.get(pool.name, 0),
+            max_concurrent=pool.max_concurrent,
+        )
     return ConfigResponse(
         asr_backend=settings.ASR_BACKEND,
         whisper_models=settings.WHISPER_MODELS,
@@ -27,6 +38,8 @@ async def get_config(user: UserInfo = Depends(get_current_user)):
         contact_email=settings.CONTACT_EMAIL,
         is_admin=user.is_admin,
         invitation_mode=settings.INVITATION_MODE,
+        model_queues=model_queues,
+        live_transcription=settings.LIVE_TRANSCRIPTION_ENABLED,
     )
 
 
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import suppress
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, WebSocket
+
+from app.config import settings
+from app.database import get_db
+from app.dependencies import get_websocket_user
+from app.metrics import (
+    inc, gauge_inc, gauge_dec,
+    transcriptions_total, errors_total,
+    live_sessions_active, live_sessions_total, live_passes_skipped_total,
+    websocket_connections_active, websocket_connections_total,
+    websocket_messages_sent_total,
+)
+from app.models import UserInfo, Utterance
+from app.routers.upload import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, store_upload
+from app.services import storage
+from app.services.asr import get_asr_backend
+from app.services.asr.base import TranscriptionSettings
+from app.services.job_queue import asr_slot, notify_new_job
+from app.services.live import LiveSession
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_active_sessions = 0
+
+
+async def _send(websocket: WebSocket, message: dict) -> None:
+    await websocket.send_json(message)
+    inc(websocket_messages_sent_total, message["type"])
+
+
+async def _send_transcript(websocket: WebSocket, final: list[Utterance], partial: list[Utterance]) -> None:
+    await _send(websocket, {
+        "type": "transcript",
+        "final": [u.model_dump() for u in final],
+        "partial": [u.model_dump() for u in partial],
+    })
+
+
+async def _receive(websocket: WebSocket, session: LiveSession) -> bool:
+    """Append audio until the client sends stop (True) or goes away (False)."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return False
+        if message.get("bytes"):
+            await session.append(message["bytes"])
+        elif message.get("text"):
+            try:
+                stop = json.loads(message["text"]).get("type") == "stop"
+            except (ValueError, AttributeError):
+                stop = False
+            if stop:
+                return True
+
+
+async def _advance(session: LiveSession, user: UserInfo, ts: TranscriptionSettings, *, final: bool = False):
+    """Run one pass in a scheduler slot, like a queued job would.
+
+    Returns the utterances that became final, or None when the scheduler's
+    caps leave no slot.
+    """
+    async with asr_slot(user.id, ts.model) as granted:
+        if not granted:
+            return None
+        return await session.advance(final=final)
+
+
+async def _transcribe_periodically(
+    websocket: WebSocket, session: LiveSession, user: UserInfo, ts: TranscriptionSettings,
+) -> None:
+    while True:
+        await asyncio.sleep(settings.LIVE_INTERVAL_SECONDS)
+        if not session.has_new_audio:
+            continue
+        # A skipped or failed window is transcribed again, with more audio, next pass
+        try:
+            final = await _advance(session, user, ts)
+        except Exception as e:
+            logger.warning("Live transcription pass failed: %s", e)
+            continue
+        if final is None:
+            inc(live_passes_skipped_total)
+            continue
+        await _send_transcript(websocket, final, session.partial)
+
+
+async def _save(session: LiveSession, user: UserInfo, ts: TranscriptionSettings, has_video: bool, complete: bool):
+    """Store the recording and its transcription; returns (file info, transcription id).
+
+    If the last pass failed, the transcription is queued for the regular
+    pipeline instead of being stored as completed.
+    """
+    path, size, content_hash = await session.close()
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%S")
+    file_info = await store_upload(
+        user, path, size, content_hash, session.ext, f"recording-{timestamp}{session.ext}",
+        has_video=has_video, source="recorder",
+    )
+    transcription_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    async with get_db() as db:
+        await db.execute(
+            """INSERT INTO transcriptions
+               (id, user_id, file_id, asr_backend, status, language, model, priority_class,
+                audio_duration, result_json, started_at, completed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, 'recorder', ?, ?, ?, ?)""",
+            (transcription_id, user.id, file_info.id, settings.ASR_BACKEND,
+             "completed" if complete else "pending", ts.language, ts.model, session.duration,
+             json.dumps([u.model_dump() for u in session.final]) if complete else None,
+             now if complete else None, now if complete else None),
+        )
+        await db.commit()
+    if complete:
+        inc(transcriptions_total, settings.ASR_BACKEND, ts.language or "auto", ts.model or "default", "completed", "false")
+    else:
+        notify_new_job()
+    return file_info, transcription_id
+
+
+async def _run(websocket: WebSocket, session: LiveSession, user: UserInfo, ts: TranscriptionSettings, has_video: bool) -> str:
+    passes = asyncio.create_task(_transcribe_periodically(websocket, session, user, ts))
+    try:
+        stopped = await _receive(websocket, session)
+    except storage.UploadTooLargeError:
+        await session.discard()
+        inc(errors_total, "file_too_large", "live")
+        await _send(websocket, {"type": "error", "detail": "Recording too large (max 1GB)"})
+        await websocket.close(code=1009)
+        return "failed"
+    finally:
+        passes.cancel()
+        # A send that failed because the client left surfaces here; ignore it
+        await asyncio.gather(passes, return_exceptions=True)
+
+    if session.size == 0:
+        await session.discard()
+        return "aborted"
+    try:
+        final = await _advance(session, user, ts, final=True)
+        if final is None:
+            logger.info("No ASR slot for the final live pass, queueing the recording")
+    except Exception as e:
+        logger.warning("Final live transcription pass failed, queueing the recording: %s", e)
+        final = None
+    complete = final is not None
+    # A client that went away without stopping still gets its recording saved
+    file_info, transcription_id = await _save(session, user, ts, has_video, complete)
+    if stopped:
+        if complete:
+            await _send_transcript(websocket, final, [])
+        await _send(websocket, {
+            "type": "done", "file": file_info.model_dump(), "transcription_id": transcription_id,
+            "status": "completed" if complete else "pending",
+        })
+    return "completed" if stopped else "aborted"
+
+
+@router.websocket("/api/ws/live")
+async def live_transcription(
+    websocket: WebSocket,
+    language: str | None = None,
+    model: str | None = None,
+    format: str = "webm",
+    has_video: bool = False,
+):
+    """Transcribe a recording while it is made.
+
+    The client sends the recording as binary messages (MediaRecorder chunks,
+    in order) and `{"type": "stop"}` when done. The server sends
+    `{"type": "transcript", "final": [...], "partial": [...]}` after each pass:
+    `final` utterances are new and settled, `partial` replaces the previous
+    partial ones. After stop it sends `{"type": "done", "file": ...,
+    "transcription_id": ...}` and closes.
+    """
+    global _active_sessions
+    await websocket.accept()
+    inc(websocket_connections_total)
+    gauge_inc(websocket_connections_active)
+    outcome = "rejected"
+    try:
+        if not settings.LIVE_TRANSCRIPTION_ENABLED:
+            await websocket.close(code=4004, reason="Live transcription is disabled")
+            return
+        user = await get_websocket_user(websocket)
+        if user is None:
+            return
+        ext = f".{format.lower()}"
+        if ext not in ALLOWED_EXTENSIONS:
+            await websocket.close(code=4000, reason=f"Unsupported format: {format}")
+            return
+        if _active_sessions >= settings.LIVE_MAX_SESSIONS:
+            await websocket.close(code=4029, reason="Too many live sessions, try again later")
+            return
+
+        ts = TranscriptionSettings(language=language, model=model or settings.DEFAULT_WHISPER_MODEL)
+        transcriber = get_asr_backend(ts.model).live_transcriber(ts)
+        session = LiveSession(transcriber, backend_name=settings.ASR_BACKEND, ext=ext, max_bytes=MAX_FILE_SIZE)
+        _active_sessions += 1
+        gauge_inc(live_sessions_active)
+        outcome = "failed"
+        try:
+            outcome = await _run(websocket, session, user, ts, has_video)
+        except BaseException:
+            await session.discard()
+            raise
+        finally:
+            _active_sessions -= 1
+            gauge_dec(live_sessions_active)
+            await transcriber.close()
+    finally:
+        inc(live_sessions_total, outcome)
+        gauge_dec(websocket_connections_active)
+        with suppress(Exception):
+            await websocket.close()
@@ -1,39 +1,71 @@
 import asyncio
 import json
-import logging
-import time
-import traceback
 import uuid
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from app.config import settings
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_websocket_user
 from app.router_helpers import ensure_transcription_owned, load_speaker_mappings
 from app.models import (
     UserInfo, TranscriptionSettings as TranscriptionSettingsModel,
     TranscriptionStatus, TranscriptionListItem, Utterance, SpeakerMappingRequest,
     TitleRequest, TranscriptionUpdateRequest,
+    BatchTranscriptionRequest, BatchStatus, BatchItemStatus,
 )
 from app.database import get_db
-from app.services.asr import get_asr_backend
-from app.services.api_tokens import resolve_token
-from app.services.asr.base import TranscriptionSettings
 from app.services.audio import get_media_duration
+from app.services import partial_results
+from app.services.eta import estimate
+from app.services.job_queue import cancel_local_job, notify_new_job
+from app.services.progress import describe
+from app.services.storage import release_files
+from app.services.scheduler import QueueFullError, QueueLimitError, check_admission, priority_class_for
 from app.services.formats import generate_srt, generate_vtt, generate_txt
 from app.metrics import (
-    inc, observe, gauge_inc, gauge_dec,
-    transcriptions_total, transcription_duration_seconds, active_transcriptions,
-    transcription_audio_duration_seconds, transcription_realtime_factor,
-    transcription_queue_depth, transcription_queue_wait_seconds,
-    diarization_speakers_total, edits_saved_total, speaker_renames_total,
-    downloads_total, deletions_total, errors_total,
+    inc, gauge_inc, gauge_dec,
+    transcriptions_total, transcription_queue_rejections_total,
+    transcription_cancelled_audio_seconds,
+    edits_saved_total, speaker_renames_total,
+    downloads_total, deletions_total,
     websocket_connections_active, websocket_connections_total,
     websocket_messages_sent_total, websocket_disconnects_total,
-    auth_failures_total, api_token_auth_total,
 )
 
 router = APIRouter()
 
+# ffprobe runs in parallel for a batch, but not one per file all at once
+_PROBE_CONCURRENCY = 8
+# How often the status WebSocket pushes the job's stage and progress
+_WS_STATUS_INTERVAL_SECONDS = 2
+
+
+async def _admit_or_429(db, user_id: str, count: int = 1) -> None:
+    """Check the queue limits for `count` more jobs.
+
+    Call inside the BEGIN IMMEDIATE transaction that inserts them, so
+    concurrent requests (possibly in other API processes) can't all pass
+    against the same count.
+    """
+    try:
+        await check_admission(db, user_id, count)
+    except QueueFullError as e:
+        inc(transcription_queue_rejections_total, e.scope)
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)},
+        )
+    except QueueLimitError as e:
+        # Retrying can't help: the request is larger than the queue allows
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _probe_duration(path: str | None) -> float | None:
+    if not path:
+        return None
+    try:
+        return await asyncio.wait_for(get_media_duration(path), timeout=5)
+    except Exception:
+        return None
+
 
 @router.post("/api/transcribe")
 async def start_transcription(
@@ -42,7 +74,7 @@ async def start_transcription(
 ):
     async with get_db() as db:
         cursor = await db.execute(
-            "SELECT id, mp3_path FROM files WHERE id = ? AND user_id = ?",
+            "SELECT id, mp3_path, origin FROM files WHERE id = ? AND user_id = ?",
             (req.file_id, user.id),
         )
         file_row = await cursor.fetchone()
@@ -50,136 +82,217 @@ async def start_transcription(
             raise HTTPException(status_code=404, detail="File not found")
 
     transcription_id = str(uuid.uuid4())
-    mp3_path = file_row["mp3_path"]
+    priority = priority_class_for(via_api_token=user.via_api_token, origin=file_row["origin"])
+    # Probed once here so the scheduler can order by expected job length
+    audio_duration = await _probe_duration(file_row["mp3_path"])
 
     async with get_db() as db:
-        await db.execute(
-            """INSERT INTO transcriptions
-               (id, user_id, file_id, asr_backend, status, language, model,
-                min_speakers, max_speakers, initial_prompt, hotwords)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (transcription_id, user.id, req.file_id, settings.ASR_BACKEND,
-             "pending", req.language, req.model, req.min_speakers, req.max_speakers,
-             req.initial_prompt, req.hotwords),
-        )
-        await db.commit()
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            await _admit_or_429(db, user.id)
+            await db.execute(
+                """INSERT INTO transcriptions
+                   (id, user_id, file_id, asr_backend, status, language, model,
+                    min_speakers, max_speakers, initial_prompt, hotwords,
+                    priority_class, audio_duration)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (transcription_id, user.id, req.file_id, settings.ASR_BACKEND,
+                 "pending", req.language, req.model, req.min_speakers, req.max_speakers,
+                 req.initial_prompt, req.hotwords, priority, audio_duration),
+            )
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
 
-    gauge_inc(transcription_queue_depth)
-    submitted_at = time.monotonic()
-    asyncio.create_task(_run_transcription(transcription_id, mp3_path, req, submitted_at))
+    notify_new_job()
     return {"id": transcription_id, "status": "pending"}
 
 
-async def _run_transcription(transcription_id: str, file_path: str, req: TranscriptionSettingsModel, submitted_at: float):
-    backend = get_asr_backend()
-    backend_name = settings.ASR_BACKEND
-    ts = TranscriptionSettings(
-        language=req.language, model=req.model,
-        min_speakers=req.min_speakers, max_speakers=req.max_speakers,
-        initial_prompt=req.initial_prompt, hotwords=req.hotwords,
-    )
+@router.post("/api/transcribe/batch")
+async def start_batch_transcription(
+    req: BatchTranscriptionRequest,
+    user: UserInfo = Depends(get_current_user),
+):
+    """Queue one transcription per file in a single transaction."""
+    jobs = req.expand()
+    if settings.ASR_BATCH_MAX_ITEMS > 0 and len(jobs) > settings.ASR_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files in one batch (limit {settings.ASR_BATCH_MAX_ITEMS})",
+        )
 
-    gauge_dec(transcription_queue_depth)
-    observe(transcription_queue_wait_seconds, time.monotonic() - submitted_at, backend_name)
-    gauge_inc(active_transcriptions)
-    start_time = time.monotonic()
+    file_ids = list(dict.fromkeys(job.file_id for job in jobs))
+    async with get_db() as db:
+        placeholders = ",".join("?" * len(file_ids))
+        cursor = await db.execute(
+            f"SELECT id, mp3_path, origin FROM files WHERE user_id = ? AND id IN ({placeholders})",
+            (user.id, *file_ids),
+        )
+        files = {row["id"]: row for row in await cursor.fetchall()}
+    missing = [f for f in file_ids if f not in files]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"File not found: {', '.join(missing)}")
+
+    semaphore = asyncio.Semaphore(_PROBE_CONCURRENCY)
+
+    async def probe(file_id: str) -> float | None:
+        async with semaphore:
+            return await _probe_duration(files[file_id]["mp3_path"])
+
+    durations = dict(zip(file_ids, await asyncio.gather(*(probe(f) for f in file_ids))))
+
+    batch_id = str(uuid.uuid4())
+    rows = [
+        (str(uuid.uuid4()), user.id, job.file_id, settings.ASR_BACKEND,
+         "pending", job.language, job.model, job.min_speakers, job.max_speakers,
+         job.initial_prompt, job.hotwords,
+         priority_class_for(via_api_token=user.via_api_token, origin=files[job.file_id]["origin"]),
+         durations[job.file_id], batch_id)
+        for job in jobs
+    ]
+    async with get_db() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            await _admit_or_429(db, user.id, len(rows))
+            await db.execute("INSERT INTO batches (id, user_id) VALUES (?, ?)", (batch_id, user.id))
+            await db.executemany(
+                """INSERT INTO transcriptions
+                   (id, user_id, file_id, asr_backend, status, language, model,
+                    min_speakers, max_speakers, initial_prompt, hotwords,
+                    priority_class, audio_duration, batch_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
 
-    try:
-        audio_duration = await asyncio.wait_for(get_media_duration(file_path), timeout=5)
-    except (asyncio.TimeoutError, Exception):
-        audio_duration = None
-    if audio_duration is not None:
-        observe(transcription_audio_duration_seconds, audio_duration, backend_name)
+    notify_new_job()
+    return {
+        "id": batch_id,
+        "status": "pending",
+        "transcription_ids": [row[0] for row in rows],
+    }
 
-    try:
-        async with get_db() as db:
-            await db.execute("UPDATE transcriptions SET status = ? WHERE id = ?", ("processing", transcription_id))
-            await db.commit()
 
-        asr_job_id = await backend.submit(file_path, ts)
+def _batch_status(counts: dict[str, int]) -> str:
+    active = counts.get("pending", 0) + counts.get("processing", 0)
+    if active:
+        return "pending" if counts.get("pending", 0) == sum(counts.values()) else "processing"
+    if counts.get("completed", 0) == sum(counts.values()):
+        return "completed"
+    return "partial" if counts.get("completed", 0) else "failed"
 
-        async with get_db() as db:
-            await db.execute("UPDATE transcriptions SET asr_job_id = ? WHERE id = ?", (asr_job_id, transcription_id))
-            await db.commit()
 
-        while True:
-            status = await backend.get_status(asr_job_id)
-            if status.status == "completed":
-                break
-            elif status.status == "failed":
-                raise RuntimeError(status.error or "Transcription failed")
-            await asyncio.sleep(5)
+@router.get("/api/batches/{batch_id}", response_model=BatchStatus)
+async def get_batch(batch_id: str, user: UserInfo = Depends(get_current_user)):
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT id, created_at FROM batches WHERE id = ? AND user_id = ?",
+            (batch_id, user.id),
+        )
+        batch = await cursor.fetchone()
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        cursor = await db.execute(
+            """SELECT id, file_id, status, error_message FROM transcriptions
+               WHERE batch_id = ? AND user_id = ? ORDER BY rowid""",
+            (batch_id, user.id),
+        )
+        rows = await cursor.fetchall()
 
-        result = await backend.get_result(asr_job_id)
+    counts: dict[str, int] = {}
+    for row in rows:
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+    return BatchStatus(
+        id=batch["id"],
+        status=_batch_status(counts) if rows else "completed",
+        created_at=str(batch["created_at"]),
+        total=len(rows),
+        counts=counts,
+        items=[
+            BatchItemStatus(id=r["id"], file_id=r["file_id"], status=r["status"], error=r["error_message"])
+            for r in rows
+        ],
+    )
 
-        duration = time.monotonic() - start_time
-        lang_label = req.language or "auto"
-        model_label = req.model or "default"
-        observe(transcription_duration_seconds, duration, backend_name, lang_label, model_label)
-        inc(transcriptions_total, backend_name, lang_label, model_label, "completed")
-        if audio_duration and audio_duration > 0:
-            observe(transcription_realtime_factor, duration / audio_duration, backend_name, model_label)
 
-        speakers = {u.speaker for u in result.utterances if u.speaker}
-        if speakers:
-            inc(diarization_speakers_total, str(min(len(speakers), 20)))
+@router.post("/api/transcription/{transcription_id}/cancel")
+async def cancel_transcription(transcription_id: str, user: UserInfo = Depends(get_current_user)):
+    async with get_db() as db:
+        cursor = await db.execute(
+            """SELECT status, asr_backend, language, model, audio_duration
+               FROM transcriptions WHERE id = ? AND user_id = ?""",
+            (transcription_id, user.id),
+        )
+        row = await cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Transcription not found")
+        # The status guard makes cancel race-free against the pipeline's final
+        # UPDATE: whichever commits first wins, the other is a no-op.
+        cursor = await db.execute(
+            """UPDATE transcriptions SET status = 'cancelled', claimed_by = NULL,
+               lease_expires_at = NULL, completed_at = ?
+               WHERE id = ? AND status IN ('pending', 'processing')""",
+            (datetime.now(timezone.utc).isoformat(), transcription_id),
+        )
+        await db.commit()
+    if cursor.rowcount == 0:
+        raise HTTPException(status_code=409, detail=f"Transcription already {row['status']}")
 
-        async with get_db() as db:
-            await db.execute(
-                """UPDATE transcriptions SET status = ?, result_json = ?, completed_at = ? WHERE id = ?""",
-                ("completed", json.dumps([u.model_dump() for u in result.utterances]),
-                 datetime.now(timezone.utc).isoformat(), transcription_id),
-            )
-            await db.commit()
+    cancel_local_job(transcription_id)
 
-        # Generate title if LLM is available
-        try:
-            from app.services.llm import get_llm_provider
-            provider = get_llm_provider()
-            if provider and result.utterances:
-                transcript_text = " ".join(u.text for u in result.utterances)
-                title = await provider.generate_title(transcript_text)
-                if title:
-                    async with get_db() as db:
-                        await db.execute(
-                            "UPDATE transcriptions SET title = ? WHERE id = ?",
-                            (title, transcription_id),
-                        )
-                        await db.commit()
-        except Exception as e:
-            logging.warning("Title generation failed for %s: %s", transcription_id, e)
-
-    except Exception as e:
-        logging.error("Transcription %s failed: %s: %s", transcription_id, type(e).__name__, e)
-        logging.error("Traceback: %s", traceback.format_exc())
-        inc(transcriptions_total, backend_name, req.language or "auto", req.model or "default", "failed")
-        inc(errors_total, "transcription_failed", "asr")
+    backend_name = row["asr_backend"] or settings.ASR_BACKEND
+    inc(transcriptions_total, backend_name, row["language"] or "auto", row["model"] or "default", "cancelled", "false")
+    if row["audio_duration"]:
+        inc(transcription_cancelled_audio_seconds, backend_name, row["status"], amount=row["audio_duration"])
+    return {"id": transcription_id, "status": "cancelled"}
 
-        async with get_db() as db:
-            await db.execute(
-                "UPDATE transcriptions SET status = ?, error_message = ? WHERE id = ?",
-                ("failed", str(e), transcription_id),
-            )
-            await db.commit()
-    finally:
-        gauge_dec(active_transcriptions)
+
+_STATUS_COLUMNS = (
+    "id, status, error_message, stage, progress, stage_detail_json, stage_started_at, "
+    "audio_duration, asr_backend, model, started_at"
+)
+
+
+async def _stage_of(db, row) -> dict:
+    """describe() plus the queue position and expected times from eta.estimate()."""
+    times = await estimate(db, row)
+    return {**describe(row, times["queue_position"]), **times}
 
 
 @router.get("/api/status/{transcription_id}")
 async def get_status(transcription_id: str, user: UserInfo = Depends(get_current_user)):
     async with get_db() as db:
         cursor = await db.execute(
-            "SELECT id, status, error_message FROM transcriptions WHERE id = ? AND user_id = ?",
+            f"SELECT {_STATUS_COLUMNS} FROM transcriptions WHERE id = ? AND user_id = ?",
             (transcription_id, user.id),
         )
         row = await cursor.fetchone()
-    if not row:
-        raise HTTPException(status_code=404, detail="Transcription not found")
-    return TranscriptionStatus(id=row["id"], status=row["status"], error=row["error_message"])
+        if not row:
+            raise HTTPException(status_code=404, detail="Transcription not found")
+        stage = await _stage_of(db, row)
+        partial = await partial_results.summary(db, transcription_id)
+    return TranscriptionStatus(
+        id=row["id"], status=row["status"], error=row["error_message"],
+        stage=stage["stage"], progress=stage["progress"], stage_detail=stage["detail"],
+        queue_position=stage["queue_position"], expected_start_at=stage["expected_start_at"],
+        expected_completion_at=stage["expected_completion_at"],
+        partial_utterances=partial["utterances"],
+    )
 
 
 @router.get("/api/transcription/{transcription_id}")
-async def get_transcription(transcription_id: str, user: UserInfo = Depends(get_current_user)):
+async def get_transcription(
+    transcription_id: str, partial: bool = False, user: UserInfo = Depends(get_current_user),
+):
+    """The transcription result.
+
+    With `partial=true`, a job that is still running returns the utterances
+    final so far (segmented jobs only; otherwise none) with `"partial": true`.
+    """
     async with get_db() as db:
         cursor = await db.execute(
             "SELECT * FROM transcriptions WHERE id = ? AND user_id = ?",
@@ -188,16 +301,19 @@ async def get_transcription(transcription_id: str, user: UserInfo = Depends(get_
         row = await cursor.fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Transcription not found")
-    if row["status"] != "completed":
+    in_progress = row["status"] in ("pending", "processing")
+    if row["status"] != "completed" and not (partial and in_progress):
         raise HTTPException(status_code=400, detail="Transcription not yet completed")
 
-    utterances = [Utterance(**u) for u in json.loads(row["result_json"] or "[]")]
-
     async with get_db() as db:
+        if in_progress:
+            utterances = await partial_results.load(db, transcription_id)
+        else:
+            utterances = [Utterance(**u) for u in json.loads(row["result_json"] or "[]")]
         speaker_mappings = await load_speaker_mappings(db, transcription_id)
 
     return {
-        "id": row["id"], "status": row["status"],
+        "id": row["id"], "status": row["status"], "partial": in_progress,
         "utterances": [u.model_dump() for u in utterances],
         "text": " ".join(u.text for u in utterances),
         "language": row["language"],
@@ -284,7 +400,6 @@ async def update_speaker_mappings(transcription_id: str, request: SpeakerMapping
 
 @router.delete("/api/transcription/{transcription_id}")
 async def delete_transcription(transcription_id: str, user: UserInfo = Depends(get_current_user)):
-    import os
     async with get_db() as db:
         cursor = await db.execute(
             "SELECT file_id FROM transcriptions WHERE id = ? AND user_id = ?",
@@ -297,7 +412,7 @@ async def delete_transcription(transcription_id: str, user: UserInfo = Depends(g
         # Get file paths before deleting DB records
         file_id = row["file_id"]
         file_cursor = await db.execute(
-            "SELECT file_path, mp3_path FROM files WHERE id = ?", (file_id,),
+            "SELECT content_hash, file_path, mp3_path FROM files WHERE id = ?", (file_id,),
         )
         file_row = await file_cursor.fetchone()
 
@@ -316,14 +431,13 @@ async def delete_transcription(transcription_id: str, user: UserInfo = Depends(g
             should_delete_files = False
         await db.commit()
 
-    # Remove files from disk only if the file record was deleted
-    if file_row and should_delete_files:
-        for path in (file_row["file_path"], file_row["mp3_path"]):
-            if path:
-                try:
-                    os.remove(path)
-                except OSError:
-                    pass
+        # Remove media from disk only if the file record was deleted and no
+        # other upload of the same content still uses it
+        if file_row and should_delete_files:
+            await release_files(db, [file_row])
+
+    # Stop the job if it was still queued or running here
+    cancel_local_job(transcription_id)
 
     inc(deletions_total, "transcription")
 
@@ -400,30 +514,11 @@ async def websocket_status(websocket: WebSocket, transcription_id: str):
     gauge_inc(websocket_connections_active)
     close_reason = "client_disconnect"
     try:
-        # Prefer API token from query param when feature is enabled
-        user_id: str | None = None
-        if settings.ENABLE_API_TOKENS:
-            raw = websocket.query_params.get("token")
-            if raw and raw.startswith("tw_"):
-                async with get_db() as db:
-                    result = await resolve_token(db, raw_token=raw)
-                if result is None:
-                    inc(api_token_auth_total, "failure")
-                    inc(auth_failures_total, "invalid_token")
-                    close_reason = "auth_missing"
-                    await websocket.close(code=4001, reason="Invalid token")
-                    return
-                user_id = result[0].id
-                inc(api_token_auth_total, "success")
-
-        if user_id is None:
-            user_id = websocket.headers.get("x-auth-request-user")
-
-        if not user_id:
-            inc(auth_failures_total, "ws_missing_headers")
+        user = await get_websocket_user(websocket)
+        if user is None:
             close_reason = "auth_missing"
-            await websocket.close(code=4001, reason="Missing authentication")
             return
+        user_id = user.id
 
         # Verify user owns this transcription
         async with get_db() as db:
@@ -436,13 +531,19 @@ async def websocket_status(websocket: WebSocket, transcription_id: str):
                 await websocket.close(code=4003, reason="Not found")
                 return
 
+        partial_sent = 0
         while True:
             async with get_db() as db:
                 cursor = await db.execute(
-                    "SELECT status, error_message FROM transcriptions WHERE id = ?",
+                    f"SELECT {_STATUS_COLUMNS} FROM transcriptions WHERE id = ?",
                     (transcription_id,),
                 )
                 row = await cursor.fetchone()
+                stage = await _stage_of(db, row) if row else None
+                partial = (
+                    await partial_results.summary(db, transcription_id)
+                    if row and row["status"] == "processing" else None
+                )
 
             if not row:
                 await websocket.send_json({"type": "error", "detail": "Transcription not found"})
@@ -452,16 +553,26 @@ async def websocket_status(websocket: WebSocket, transcription_id: str):
 
             status = row["status"]
             msg = {"type": "status", "status": status}
+            if stage["stage"]:
+                msg.update(stage=stage["stage"], progress=stage["progress"], detail=stage["detail"])
+            for key in ("queue_position", "expected_start_at", "expected_completion_at"):
+                if stage[key] is not None:
+                    msg[key] = stage[key]
             if status == "failed" and row["error_message"]:
                 msg["error"] = row["error_message"]
             await websocket.send_json(msg)
             inc(websocket_messages_sent_total, "status")
+            if partial and partial["utterances"] > partial_sent:
+                # More of the start is final: fetch it with ?partial=true
+                await websocket.send_json({"type": "partial", **partial})
+                inc(websocket_messages_sent_total, "partial")
+                partial_sent = partial["utterances"]
 
-            if status in ("completed", "failed"):
+            if status in ("completed", "failed", "cancelled"):
                 close_reason = status
                 break
 
-            await asyncio.sleep(5)
+            await asyncio.sleep(_WS_STATUS_INTERVAL_SECONDS)
     except WebSocketDisconnect:
         close_reason = "client_disconnect"
     except Exception:
@@ -1,99 +1,304 @@
 import os
 import uuid
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, UploadFile, HTTPException
+from typing import NoReturn
+from fastapi import APIRouter, Depends, Request, Response, UploadFile, HTTPException
 from fastapi.responses import FileResponse
+from starlette.requests import ClientDisconnect
 from app.config import settings
 from app.dependencies import get_current_user
 from app.router_helpers import fetch_file_owned_or_404
-from app.models import UserInfo, FileInfo, RenameRequest
+from app.models import UserInfo, FileInfo, RenameRequest, UploadSession, UploadSessionRequest
 from app.database import get_db
+from app.services import storage, upload_sessions
 from app.services.audio import convert_to_mp3, has_video_stream
-from app.metrics import inc, observe, file_uploads_total, file_upload_size_bytes, file_renames_total, errors_total
+from app.metrics import inc, observe, file_uploads_total, file_upload_size_bytes, file_uploads_deduplicated_total, file_renames_total, errors_total, upload_sessions_total
 
 router = APIRouter()
 
+UPLOAD_SOURCES = {"upload", "recorder"}
 ALLOWED_EXTENSIONS = {".mp3", ".wav", ".mp4", ".webm", ".m4a", ".mov", ".aac", ".opus", ".ogg"}
 MAX_FILE_SIZE = 1 * 1024 * 1024 * 1024  # 1GB
+# Pure audio extensions never have video
+_AUDIO_ONLY_EXTENSIONS = {".mp3", ".wav", ".m4a", ".aac", ".opus", ".ogg"}
 
 
 @router.post("/api/upload", response_model=FileInfo)
 async def upload_file(
     file: UploadFile,
     has_video: bool | None = None,
+    source: str = "upload",
     user: UserInfo = Depends(get_current_user),
 ):
-    ext = os.path.splitext(file.filename or "")[1].lower()
+    ext = _upload_extension(file.filename, source)
+
+    os.makedirs(settings.TEMP_PATH, exist_ok=True)
+
+    # Stream file to disk in chunks, hashing as it goes; reject early if too large
+    try:
+        temp_path, file_size, content_hash = await storage.receive_upload(file, ext, MAX_FILE_SIZE)
+    except storage.UploadTooLargeError:
+        _reject_too_large(ext)
+
+    return await store_upload(
+        user, temp_path, file_size, content_hash, ext, file.filename or "",
+        has_video=has_video, source=source,
+    )
+
+
+@router.put("/api/upload/raw", response_model=FileInfo)
+async def upload_raw(
+    request: Request,
+    filename: str,
+    has_video: bool | None = None,
+    source: str = "upload",
+    user: UserInfo = Depends(get_current_user),
+):
+    """Upload the request body itself as the file named `filename`.
+
+    Unlike a multipart upload, the body isn't spooled to a temporary file
+    first: it is hashed and written once, then moved into storage.
+    """
+    ext = _upload_extension(filename, source)
+    # Refuse before reading anything when the client says it's too large
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_FILE_SIZE:
+        _reject_too_large(ext)
+    try:
+        temp_path, file_size, content_hash = await storage.receive_stream(request.stream(), ext, MAX_FILE_SIZE)
+    except storage.UploadTooLargeError:
+        _reject_too_large(ext)
+    except ClientDisconnect:
+        raise HTTPException(status_code=400, detail="Upload interrupted")
+    if file_size == 0:
+        storage.discard(temp_path)
+        raise HTTPException(status_code=400, detail="Nothing uploaded")
+
+    return await store_upload(
+        user, temp_path, file_size, content_hash, ext, filename,
+        has_video=has_video, source=source,
+    )
+
+
+def _upload_extension(filename: str | None, source: str) -> str:
+    """The upload's extension, after checking it and `source` are accepted."""
+    if source not in UPLOAD_SOURCES:
+        raise HTTPException(status_code=400, detail=f"Invalid source: {source}")
+    ext = os.path.splitext(filename or "")[1].lower()
     if ext not in ALLOWED_EXTENSIONS:
         inc(file_uploads_total, ext.lstrip("."), "rejected")
         inc(errors_total, "unsupported_file_type", "upload")
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
+    return ext
 
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(settings.TEMP_PATH, f"{file_id}{ext}")
 
-    os.makedirs(settings.TEMP_PATH, exist_ok=True)
+def _reject_too_large(ext: str) -> NoReturn:
+    inc(file_uploads_total, ext.lstrip("."), "rejected")
+    inc(errors_total, "file_too_large", "upload")
+    raise HTTPException(status_code=413, detail="File too large (max 1GB)")
 
-    # Stream file to disk in chunks, reject early if too large
-    total_size = 0
-    try:
-        with open(file_path, "wb") as f:
-            while True:
-                chunk = await file.read(1024 * 1024)  # 1MB chunks
-                if not chunk:
-                    break
-                total_size += len(chunk)
-                if total_size > MAX_FILE_SIZE:
-                    inc(file_uploads_total, ext.lstrip("."), "rejected")
-                    inc(errors_total, "file_too_large", "upload")
-                    raise HTTPException(status_code=413, detail="File too large (max 1GB)")
-                f.write(chunk)
-    except HTTPException:
-        # Clean up partial file on rejection
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise
-    file_size = total_size
-
-    # Convert to MP3 if needed
-    mp3_path = await convert_to_mp3(file_path)
-
-    # Detect video tracks
-    if has_video is None:
-        # Pure audio extensions never have video
-        audio_only_exts = {".mp3", ".wav", ".m4a", ".aac", ".opus", ".ogg"}
-        if ext in audio_only_exts:
-            has_video = False
-        else:
-            has_video = await has_video_stream(file_path)
 
+async def store_upload(
+    user: UserInfo, temp_path: str, file_size: int, content_hash: str, ext: str,
+    filename: str, *, has_video: bool | None, source: str,
+) -> FileInfo:
+    """Place a received upload in storage and record its `files` row.
+
+    `temp_path` is consumed: it becomes the stored blob, or is discarded when
+    the same content is already stored. Reusing or placing the blob and
+    adding the row happen in one write transaction (see services/storage.py).
+    """
+    file_id = str(uuid.uuid4())
     media_type = ext.lstrip(".")
     expires_at = (datetime.now(timezone.utc) + timedelta(hours=settings.DEFAULT_EXPIRY_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
 
     async with get_db() as db:
-        # Ensure user exists
-        await db.execute(
-            "INSERT OR IGNORE INTO users (id, email) VALUES (?, ?)",
-            (user.id, user.email),
-        )
-        await db.execute(
-            "INSERT INTO files (id, user_id, original_filename, file_path, mp3_path, media_type, file_size, expires_at, has_video) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (file_id, user.id, file.filename, file_path, mp3_path, media_type, file_size, expires_at, int(has_video)),
-        )
-        await db.commit()
+        existing = await storage.find_blob(db, content_hash, ext)
+    converted = None
+    try:
+        while True:
+            if existing is None and converted is None:
+                # Transcode before taking the write lock, it can take minutes
+                converted = await convert_to_mp3(temp_path)
+            if has_video is None:
+                if existing is not None and existing["has_video"] is not None:
+                    has_video = bool(existing["has_video"])
+                elif ext in _AUDIO_ONLY_EXTENSIONS:
+                    has_video = False
+                else:
+                    has_video = await has_video_stream(temp_path)
+
+            async with get_db() as db:
+                await db.execute("BEGIN IMMEDIATE")
+                try:
+                    existing = await storage.find_blob(db, content_hash, ext)
+                    if existing is None and converted is None:
+                        # The stored copy was released since we looked
+                        await db.rollback()
+                        continue
+                    if existing is not None:
+                        # Same bytes already stored: share the original and its mp3
+                        file_path, mp3_path = existing["file_path"], existing["mp3_path"]
+                    else:
+                        file_path = storage.place_blob(temp_path, content_hash, ext)
+                        mp3_path = (
+                            file_path if os.path.abspath(converted) == os.path.abspath(temp_path)
+                            else storage.place_blob(converted, content_hash, storage.CONVERTED_EXT)
+                        )
+                    # Ensure user exists
+                    await db.execute(
+                        "INSERT OR IGNORE INTO users (id, email) VALUES (?, ?)",
+                        (user.id, user.email),
+                    )
+                    await db.execute(
+                        "INSERT INTO files (id, user_id, original_filename, file_path, mp3_path, media_type, file_size, expires_at, has_video, origin, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (file_id, user.id, filename, file_path, mp3_path, media_type, file_size, expires_at, int(has_video), source, content_hash),
+                    )
+                    await db.commit()
+                except BaseException:
+                    await db.rollback()
+                    raise
+            break
+    finally:
+        # Whatever wasn't moved into storage
+        storage.discard(temp_path)
+        if converted is not None:
+            storage.discard(converted)
+    if existing is not None:
+        inc(file_uploads_deduplicated_total)
 
     inc(file_uploads_total, media_type, "success")
     observe(file_upload_size_bytes, file_size)
 
     return FileInfo(
         id=file_id,
-        original_filename=file.filename or "",
+        original_filename=filename,
         media_type=media_type,
         file_size=file_size,
         has_video=has_video,
     )
 
 
+def _session_info(session, offset: int | None = None) -> UploadSession:
+    return UploadSession(
+        id=session["id"], filename=session["filename"],
+        offset=session["size"] if offset is None else offset,
+        size=session["expected_size"], expires_at=upload_sessions.expires_at(session),
+    )
+
+
+async def _session_or_404(db, session_id: str, user_id: str):
+    session = await upload_sessions.get(db, session_id, user_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@router.post("/api/upload/sessions", response_model=UploadSession)
+async def create_upload_session(body: UploadSessionRequest, user: UserInfo = Depends(get_current_user)):
+    """Start an upload that arrives in chunks (services/upload_sessions.py).
+
+    `size` and `sha256`, when given, are checked before the file is accepted.
+    """
+    ext = _upload_extension(body.filename, body.source)
+    if body.size is not None:
+        if body.size <= 0:
+            raise HTTPException(status_code=400, detail="Invalid size")
+        if body.size > MAX_FILE_SIZE:
+            _reject_too_large(ext)
+    async with get_db() as db:
+        session = await upload_sessions.create(
+            db, user.id, body.filename, ext, has_video=body.has_video, source=body.source,
+            expected_size=body.size, expected_sha256=body.sha256,
+        )
+    return _session_info(session)
+
+
+@router.get("/api/upload/sessions/{session_id}", response_model=UploadSession)
+async def get_upload_session(session_id: str, response: Response, user: UserInfo = Depends(get_current_user)):
+    """Where to resume: `offset` (also in the `Upload-Offset` header) is the bytes received."""
+    async with get_db() as db:
+        session = await _session_or_404(db, session_id, user.id)
+    response.headers["Upload-Offset"] = str(session["size"])
+    return _session_info(session)
+
+
+@router.patch("/api/upload/sessions/{session_id}", response_model=UploadSession)
+async def append_upload_chunk(
+    session_id: str, offset: int, request: Request, user: UserInfo = Depends(get_current_user),
+):
+    """Append the raw request body at `offset`, which must be the bytes received so far.
+
+    A mismatch returns 409 with the expected offset in the `Upload-Offset`
+    header. If the connection drops mid-chunk, what arrived is kept.
+    """
+    async with get_db() as db:
+        session = await _session_or_404(db, session_id, user.id)
+        limit = min(MAX_FILE_SIZE, session["expected_size"] or MAX_FILE_SIZE)
+        try:
+            size = await upload_sessions.append(db, session, offset, request.stream(), limit)
+        except upload_sessions.OffsetMismatchError as e:
+            raise HTTPException(
+                status_code=409, detail=f"Chunk must start at offset {e.expected}",
+                headers={"Upload-Offset": str(e.expected)},
+            )
+        except upload_sessions.SessionClosedError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        except storage.UploadTooLargeError:
+            if limit < MAX_FILE_SIZE:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds its declared size of {limit} bytes")
+            _reject_too_large(session["ext"])
+        except ClientDisconnect:
+            # Nobody to answer; the client resumes from the stored offset
+            raise HTTPException(status_code=400, detail="Upload interrupted")
+    return _session_info(session, size)
+
+
+@router.post("/api/upload/sessions/{session_id}/finalize", response_model=FileInfo)
+async def finalize_upload_session(session_id: str, user: UserInfo = Depends(get_current_user)):
+    """Store the received file like a regular upload, converting it right away."""
+    async with get_db() as db:
+        session = await _session_or_404(db, session_id, user.id)
+        if session["size"] == 0:
+            raise HTTPException(status_code=400, detail="Nothing uploaded")
+        if session["expected_size"] and session["size"] != session["expected_size"]:
+            # Not an error yet: the client can still send the rest
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete: {session['size']} of {session['expected_size']} bytes",
+                headers={"Upload-Offset": str(session["size"])},
+            )
+        try:
+            content_hash = await upload_sessions.content_hash(session)
+        except FileNotFoundError:
+            # Aborted or expired while we were hashing
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if session["expected_sha256"] and content_hash != session["expected_sha256"]:
+            await upload_sessions.abort(db, session)
+            inc(upload_sessions_total, "invalid")
+            inc(file_uploads_total, session["ext"].lstrip("."), "rejected")
+            inc(errors_total, "checksum_mismatch", "upload")
+            raise HTTPException(status_code=400, detail="Checksum mismatch, upload discarded")
+        if not await upload_sessions.close(db, session):
+            # A chunk landed while hashing, or another request finalized it
+            raise HTTPException(status_code=409, detail="Upload changed while finalizing, try again")
+    inc(upload_sessions_total, "finalized")
+    has_video = None if session["has_video"] is None else bool(session["has_video"])
+    return await store_upload(
+        user, session["path"], session["size"], content_hash, session["ext"], session["filename"],
+        has_video=has_video, source=session["source"],
+    )
+
+
+@router.delete("/api/upload/sessions/{session_id}")
+async def abort_upload_session(session_id: str, user: UserInfo = Depends(get_current_user)):
+    async with get_db() as db:
+        session = await _session_or_404(db, session_id, user.id)
+        await upload_sessions.abort(db, session)
+    inc(upload_sessions_total, "aborted")
+    return {"status": "ok"}
+
+
 @router.get("/api/media/{file_id}")
 async def get_media(
     file_id: str,
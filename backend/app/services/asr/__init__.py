@@ -1,10 +1,12 @@
 from app.config import settings
 from app.services.asr.base import ASRBackend
 
-def get_asr_backend() -> ASRBackend:
+def get_asr_backend(model: str | None = None) -> ASRBackend:
+    """The backend for `model`, bound to the endpoint pool that serves it."""
+    pool = settings.asr_pool_for_model(model)
     if settings.ASR_BACKEND == "whisperx":
         from app.services.asr.whisperx import WhisperXBackend
-        return WhisperXBackend()
+        return WhisperXBackend(pool.urls)
     else:
         from app.services.asr.murmurai import MurmurAIBackend
-        return MurmurAIBackend()
+        return MurmurAIBackend(pool.urls)
@@ -0,0 +1,343 @@
+"""Client-side load balancing across several ASR endpoints.
+
+ASR_URL may list several base URLs, comma-separated. Each new job goes to the
+endpoint with the fewest outstanding audio-seconds (submitted but not yet
+collected), which tracks actual GPU load far better than request counts when
+job lengths range from seconds to hours. Follow-up calls for a job go back
+to the endpoint that accepted it: job ids handed out to the pipeline carry
+the endpoint (`<id>@<url>`) so the affinity survives restarts and works
+across the API and worker processes.
+
+Each endpoint has a circuit breaker. ASR_EJECT_FAILURES consecutive failed
+requests (or health probes) open it for ASR_EJECT_SECONDS. During that time
+the endpoint gets no traffic. After that it is half-open: one trial request
+goes through, and its outcome closes the breaker or opens it again. When no
+endpoint of a pool can take a request, `ASRUnavailableError` is raised. The
+pipeline then puts the job back in the queue instead of failing it, and the
+job queue stops claiming jobs for that pool until a breaker lets traffic
+through again. Pools with several endpoints are also health-checked in the
+background (ASR_HEALTH_CHECK_PATH every ASR_HEALTH_CHECK_INTERVAL_SECONDS).
+
+Idempotent calls (status, result, cancel) go through `EndpointPool.call`.
+It retries transport errors and 5xx up to ASR_RETRY_ATTEMPTS times with
+full-jitter exponential backoff. Submissions are not retried: a retry could
+start the same job twice.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+
+from app.config import settings
+from app.metrics import (
+    inc, observe, gauge_set,
+    asr_endpoint_inflight, asr_endpoint_outstanding_audio_seconds,
+    asr_endpoint_healthy, asr_endpoint_circuit_state, asr_endpoint_request_duration_seconds,
+    asr_endpoint_retries_total,
+)
+from app.services.http_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Audio-seconds assumed per byte when a caller can't say how long a file is
+# (about 128 kbit/s mp3).
+_BYTES_PER_SECOND = 16000
+_JOB_SEPARATOR = "@"
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+T = TypeVar("T")
+
+
+class ASRUnavailableError(Exception):
+    """No endpoint of the pool can take a request right now (breakers open)."""
+
+    def __init__(self, message: str, retry_after: float = 0.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class Endpoint:
+    url: str
+    inflight: int = 0  # requests currently open against the endpoint
+    outstanding_seconds: float = 0.0  # audio submitted and not yet collected
+    failures: int = 0  # consecutive failed probes/requests
+    ejected_until: float = 0.0  # monotonic time the breaker is open until; 0 = closed
+    trial: bool = False  # the half-open trial request is in flight
+
+    def state(self, now: float) -> str:
+        if not self.ejected_until:
+            return CLOSED
+        return OPEN if now < self.ejected_until else HALF_OPEN
+
+    def available(self, now: float) -> bool:
+        """Whether a request may go to the endpoint now."""
+        state = self.state(now)
+        return state == CLOSED or (state == HALF_OPEN and not self.trial)
+
+
+def parse_urls(value: str) -> list[str]:
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+def _is_endpoint_failure(exc: BaseException) -> bool:
+    """Connection problems and 5xx count against the endpoint; 4xx are the caller's."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Failures worth holding a job for: unreachable endpoints, connection errors, 5xx."""
+    return isinstance(exc, ASRUnavailableError) or _is_endpoint_failure(exc)
+
+
+def is_outage(exc: BaseException) -> bool:
+    """Whether a transient failure is down to the backend rather than the job.
+
+    True when breakers turned the request away before it was sent, or the
+    connection could not be made. Jobs held for these reasons keep their
+    attempts, so an outage of any length doesn't fail queued work. A 5xx
+    counts: the backend answered, and the file itself may be the cause.
+    """
+    return isinstance(exc, (ASRUnavailableError, httpx.ConnectError, httpx.ConnectTimeout))
+
+
+class EndpointPool:
+    def __init__(self, urls: list[str]) -> None:
+        if not urls:
+            raise ValueError("At least one ASR endpoint URL is required")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._by_url = {e.url: e for e in self.endpoints}
+        # job id -> (endpoint, audio seconds counted as outstanding for it)
+        self._jobs: dict[str, tuple[Endpoint, float]] = {}
+        for endpoint in self.endpoints:
+            self._report(endpoint)
+
+    @property
+    def multi(self) -> bool:
+        return len(self.endpoints) > 1
+
+    def pick(self) -> Endpoint:
+        """The available endpoint with the least outstanding audio.
+
+        Closed breakers are preferred over half-open ones. Raises
+        ASRUnavailableError when every breaker is open or on trial.
+        """
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.available(now)]
+        if not candidates:
+            raise self._unavailable(now)
+        return min(candidates, key=lambda e: (e.state(now) != CLOSED, e.outstanding_seconds, e.inflight))
+
+    def accepting(self) -> bool:
+        """Whether any endpoint can take a new job now."""
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            # Open -> half-open happens with time, not on an event
+            self._report(endpoint)
+        return any(e.available(now) for e in self.endpoints)
+
+    def _unavailable(self, now: float) -> ASRUnavailableError:
+        retry_after = min(max(0.0, e.ejected_until - now) for e in self.endpoints)
+        return ASRUnavailableError(
+            f"ASR backend unavailable ({', '.join(e.url for e in self.endpoints)})",
+            retry_after=retry_after,
+        )
+
+    # --- job affinity ---
+
+    def job_id(self, endpoint: Endpoint, raw_id: str) -> str:
+        """The id handed to callers for a job `endpoint` accepted."""
+        return f"{raw_id}{_JOB_SEPARATOR}{endpoint.url}" if self.multi else raw_id
+
+    def resolve(self, job_id: str) -> tuple[Endpoint, str]:
+        """(endpoint, endpoint-local id) for a job id from `job_id()`."""
+        raw_id, sep, url = job_id.partition(_JOB_SEPARATOR)
+        if sep:
+            endpoint = self._by_url.get(url)
+            if endpoint is None:
+                # Removed from ASR_URL since; keep talking to it for this job
+                endpoint = Endpoint(url)
+            return endpoint, raw_id
+        return self.endpoints[0], raw_id
+
+    def assign(self, job_id: str, endpoint: Endpoint, audio_seconds: float) -> None:
+        """Count an accepted job's audio against its endpoint until released."""
+        self._jobs[job_id] = (endpoint, audio_seconds)
+        endpoint.outstanding_seconds += audio_seconds
+        self._report(endpoint)
+
+    def release(self, job_id: str) -> None:
+        """The job finished, failed or was cancelled. Unknown ids are ignored."""
+        entry = self._jobs.pop(job_id, None)
+        if entry is None:
+            return
+        endpoint, audio_seconds = entry
+        endpoint.outstanding_seconds = max(0.0, endpoint.outstanding_seconds - audio_seconds)
+        self._report(endpoint)
+
+    # --- request accounting ---
+
+    @asynccontextmanager
+    async def request(self, endpoint: Endpoint, operation: str):
+        """Wrap one HTTP call to `endpoint`: breaker, in-flight count, latency, failures.
+
+        Raises ASRUnavailableError without calling out while the endpoint's
+        breaker is open or its half-open trial is already in flight.
+        """
+        now = time.monotonic()
+        if not endpoint.available(now):
+            raise ASRUnavailableError(f"ASR endpoint {endpoint.url} is unavailable",
+                                      retry_after=max(0.0, endpoint.ejected_until - now))
+        trial = endpoint.state(now) == HALF_OPEN
+        endpoint.trial = endpoint.trial or trial
+        endpoint.inflight += 1
+        self._report(endpoint)
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            if _is_endpoint_failure(e):
+                self.record_failure(endpoint)
+            raise
+        else:
+            self.record_success(endpoint)
+        finally:
+            if trial:
+                endpoint.trial = False
+            endpoint.inflight -= 1
+            observe(asr_endpoint_request_duration_seconds, time.monotonic() - start, endpoint.url, operation)
+            self._report(endpoint)
+
+    async def call(self, endpoint: Endpoint, operation: str, send: Callable[[], Awaitable[T]]) -> T:
+        """Run an idempotent request, retrying endpoint failures with jittered backoff."""
+        attempt = 1
+        while True:
+            try:
+                async with self.request(endpoint, operation):
+                    return await send()
+            except Exception as e:
+                if not _is_endpoint_failure(e) or attempt >= settings.ASR_RETRY_ATTEMPTS:
+                    raise
+                logger.info("Retrying ASR %s on %s after %s", operation, endpoint.url, e)
+            inc(asr_endpoint_retries_total, endpoint.url, operation)
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def record_success(self, endpoint: Endpoint) -> None:
+        endpoint.failures = 0
+        if endpoint.ejected_until:
+            logger.info("ASR endpoint %s is back in rotation", endpoint.url)
+        endpoint.ejected_until = 0.0
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        endpoint.failures += 1
+        now = time.monotonic()
+        state = endpoint.state(now)
+        # A failed half-open trial re-opens the breaker straight away
+        if state == HALF_OPEN or endpoint.failures >= settings.ASR_EJECT_FAILURES:
+            if state != OPEN:
+                logger.warning(
+                    "Opening the circuit breaker of ASR endpoint %s for %ss after %d failures",
+                    endpoint.url, settings.ASR_EJECT_SECONDS, endpoint.failures,
+                )
+            endpoint.ejected_until = now + settings.ASR_EJECT_SECONDS
+
+    # --- health checks ---
+
+    async def probe(self, endpoint: Endpoint) -> bool:
+        try:
+            response = await get_client("asr").get(
+                f"{endpoint.url}{settings.ASR_HEALTH_CHECK_PATH}",
+                timeout=settings.ASR_HEALTH_CHECK_TIMEOUT_SECONDS,
+            )
+            healthy = response.status_code < 500
+        except httpx.HTTPError:
+            healthy = False
+        if healthy:
+            self.record_success(endpoint)
+        else:
+            self.record_failure(endpoint)
+        self._report(endpoint)
+        return healthy
+
+    async def run_health_checks(self, stop: asyncio.Event) -> None:
+        """Probe every endpoint each ASR_HEALTH_CHECK_INTERVAL_SECONDS until `stop` is set."""
+        while not stop.is_set():
+            await asyncio.gather(*(self.probe(e) for e in self.endpoints))
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.ASR_HEALTH_CHECK_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _report(self, endpoint: Endpoint) -> None:
+        state = endpoint.state(time.monotonic())
+        gauge_set(asr_endpoint_inflight, endpoint.inflight, endpoint.url)
+        gauge_set(asr_endpoint_outstanding_audio_seconds, endpoint.outstanding_seconds, endpoint.url)
+        gauge_set(asr_endpoint_healthy, int(state != OPEN), endpoint.url)
+        gauge_set(asr_endpoint_circuit_state, _STATE_VALUES[state], endpoint.url)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    ceiling = min(settings.ASR_RETRY_MAX_SECONDS, settings.ASR_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+def estimate_audio_seconds(file_path: str) -> float:
+    try:
+        return os.path.getsize(file_path) / _BYTES_PER_SECOND
+    except OSError:
+        return 0.0
+
+
+def raw_job_id(job_id: str) -> str:
+    """The endpoint-local part of an id from `EndpointPool.job_id()`."""
+    return job_id.partition(_JOB_SEPARATOR)[0]
+
+
+_pools: dict[str, EndpointPool] = {}
+
+
+def get_endpoint_pool(urls: str | None = None) -> EndpointPool:
+    """The shared pool for a comma-separated URL list (default: ASR_URL)."""
+    urls = settings.ASR_URL if urls is None else urls
+    pool = _pools.get(urls)
+    if pool is None:
+        pool = _pools[urls] = EndpointPool(parse_urls(urls))
+    return pool
+
+
+def unavailable_pools() -> set[str]:
+    """Names of configured pools that cannot take a new job right now."""
+    return {
+        name for name, pool in settings.asr_pools.items()
+        if not get_endpoint_pool(pool.urls).accepting()
+    }
+
+
+def start_health_checks(stop: asyncio.Event) -> asyncio.Task | None:
+    """Background health probing for every configured pool with several endpoints.
+
+    Returns None when there is nothing to probe.
+    """
+    if settings.ASR_HEALTH_CHECK_INTERVAL_SECONDS <= 0:
+        return None
+    pools = [get_endpoint_pool(p.urls) for p in settings.asr_pools.values()]
+    checks = [pool.run_health_checks(stop) for pool in pools if pool.multi]
+    if not checks:
+        return None
+    return asyncio.create_task(_gather(checks))
+
+
+async def _gather(coros) -> None:
+    await asyncio.gather(*coros)
@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
 from app.models import TranscriptionStatus, TranscriptionResult
+from app.services.asr.callbacks import ASRCallback
+from app.services.asr.live import LiveTranscriber, WindowedTranscriber
+from app.services.asr.multipart import UploadProgress
+from app.services.asr.polling import AdaptivePolling, PollingStrategy
 
 
 class TranscriptionSettings:
@@ -13,9 +17,23 @@ class TranscriptionSettings:
 
 
 class ASRBackend(ABC):
+    # Whether a job id survives a restart of this process. When True, an
+    # orphaned job is resumed by polling its existing id instead of re-submitting.
+    resumable: bool = True
+    # Whether submit() can register a completion webhook (see asr/callbacks.py).
+    supports_callbacks: bool = False
+
     @abstractmethod
-    async def submit(self, file_path: str, settings: TranscriptionSettings) -> str:
-        """Submit a transcription job. Returns backend-specific job ID."""
+    async def submit(
+        self, file_path: str, settings: TranscriptionSettings, callback: ASRCallback | None = None,
+        audio_seconds: float | None = None, on_progress: UploadProgress | None = None,
+    ) -> str:
+        """Submit a transcription job. Returns backend-specific job ID.
+
+        `audio_seconds` is the file's duration when known, used to balance
+        load across ASR endpoints. `on_progress` is awaited as the audio is
+        uploaded.
+        """
 
     @abstractmethod
     async def get_status(self, job_id: str) -> TranscriptionStatus:
@@ -24,3 +42,18 @@ class ASRBackend(ABC):
     @abstractmethod
     async def get_result(self, job_id: str) -> TranscriptionResult:
         """Get the transcription result."""
+
+    async def cancel(self, job_id: str) -> None:
+        """Stop a running job and free its ASR capacity. Best effort; default no-op."""
+
+    def polling_strategy(self) -> PollingStrategy:
+        """How often the pipeline should call get_status while a job runs."""
+        return AdaptivePolling()
+
+    def live_transcriber(self, settings: TranscriptionSettings) -> LiveTranscriber:
+        """A transcriber for one live session (see asr/live.py).
+
+        The default submits each window as an ordinary job; backends with a
+        native streaming API override this.
+        """
+        return WindowedTranscriber(self, settings)
@@ -0,0 +1,93 @@
+"""Completion callbacks (webhooks) from the ASR backend.
+
+When ASR_CALLBACK_BASE_URL and ASR_CALLBACK_SECRET are set, backends that
+support it register a per-job callback URL on submit. The ASR server calls
+`/api/asr/callback/{transcription_id}` when the job finishes; the endpoint
+records the reported status on the row and wakes the pipeline waiting on that
+job, which then fetches the result once. Status polling continues on a slow
+schedule as a fallback for lost callbacks.
+"""
+import asyncio
+import hashlib
+import hmac
+from dataclasses import dataclass
+
+from app.config import settings
+
+CALLBACK_HEADER = "X-ASR-Callback-Token"
+
+_waiters: dict[str, asyncio.Event] = {}
+
+
+@dataclass
+class ASRCallback:
+    url: str
+    header_name: str
+    header_value: str
+
+
+def callbacks_enabled() -> bool:
+    return bool(settings.ASR_CALLBACK_BASE_URL and settings.ASR_CALLBACK_SECRET)
+
+
+def callback_token(transcription_id: str) -> str:
+    return hmac.new(
+        settings.ASR_CALLBACK_SECRET.encode(), transcription_id.encode(), hashlib.sha256,
+    ).hexdigest()
+
+
+def verify_callback_token(transcription_id: str, token: str | None) -> bool:
+    if not token or not callbacks_enabled():
+        return False
+    return hmac.compare_digest(callback_token(transcription_id), token)
+
+
+def build_callback(transcription_id: str) -> ASRCallback:
+    base = settings.ASR_CALLBACK_BASE_URL.rstrip("/")
+    return ASRCallback(
+        url=f"{base}/api/asr/callback/{transcription_id}",
+        header_name=CALLBACK_HEADER,
+        header_value=callback_token(transcription_id),
+    )
+
+
+def callback_status(raw: str | None) -> str | None:
+    """Map a webhook's reported status onto ours; None if it isn't terminal."""
+    raw = str(raw or "").lower()
+    if raw == "completed":
+        return "completed"
+    if raw in ("error", "failed"):
+        return "failed"
+    return None
+
+
+def register(transcription_id: str) -> asyncio.Event:
+    event = asyncio.Event()
+    _waiters[transcription_id] = event
+    return event
+
+
+def unregister(transcription_id: str) -> None:
+    _waiters.pop(transcription_id, None)
+
+
+def notify(transcription_id: str) -> bool:
+    """Wake the pipeline waiting on this job. Returns False if none is waiting here."""
+    event = _waiters.get(transcription_id)
+    if event is None:
+        return False
+    event.set()
+    return True
+
+
+async def sleep_or_wake(event: asyncio.Event | None, delay: float) -> bool:
+    """Sleep up to `delay` seconds; return True early if `event` fires."""
+    if event is None:
+        await asyncio.sleep(delay)
+        return False
+    try:
+        await asyncio.wait_for(event.wait(), timeout=delay)
+    except asyncio.TimeoutError:
+        return False
+    event.clear()
+    return True
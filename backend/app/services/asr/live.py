@@ -0,0 +1,60 @@
+"""Transcribing live audio one window at a time.
+
+A live session (services/live.py) repeatedly hands its transcriber the audio
+recorded since the last final utterance. `ASRBackend.live_transcriber()`
+returns a `LiveTranscriber`; the default, `WindowedTranscriber`, sends each
+window to the backend as an ordinary short job, so every backend can serve
+live sessions. A backend with a native streaming API can return its own
+transcriber instead.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from app.models import Utterance
+from app.services.asr.polling import FixedPolling
+
+if TYPE_CHECKING:
+    from app.services.asr.base import ASRBackend, TranscriptionSettings
+
+logger = logging.getLogger(__name__)
+
+# Windows are seconds long: poll far more eagerly than for whole files
+_WINDOW_POLL_SECONDS = 0.5
+
+
+class LiveTranscriber(ABC):
+    @abstractmethod
+    async def transcribe(self, window_path: str, window_seconds: float) -> list[Utterance]:
+        """Utterances in the audio at `window_path`, timed from its start."""
+
+    async def close(self) -> None:
+        """Release anything held for the session. Default no-op."""
+
+
+class WindowedTranscriber(LiveTranscriber):
+    """Transcribes each window with the backend's submit/poll/result cycle."""
+
+    def __init__(self, backend: "ASRBackend", settings: "TranscriptionSettings") -> None:
+        self.backend = backend
+        self.settings = settings
+
+    async def transcribe(self, window_path: str, window_seconds: float) -> list[Utterance]:
+        job_id = await self.backend.submit(window_path, self.settings, audio_seconds=window_seconds)
+        try:
+            for delay in FixedPolling(_WINDOW_POLL_SECONDS).delays(None):
+                await asyncio.sleep(delay)
+                status = await self.backend.get_status(job_id)
+                if status.status == "completed":
+                    return (await self.backend.get_result(job_id)).utterances
+                if status.status == "failed":
+                    raise RuntimeError(status.error or "ASR failed")
+        except asyncio.CancelledError:
+            # The session ended mid-window: don't leave the job running
+            try:
+                await self.backend.cancel(job_id)
+            except Exception as e:
+                logger.warning("Cancelling live window job %s failed: %s", job_id, e)
+            raise
+        return []
@@ -0,0 +1,93 @@
+"""Streaming multipart/form-data bodies for uploading audio to ASR.
+
+Handing httpx an open file in `files=` reads it synchronously on the event
+loop. With several large submissions in flight that stalls every other
+request and holds a lot of memory. `StreamingUpload` instead yields the body
+as an async iterator: the form fields, then the file in CHUNK_SIZE pieces
+read in a worker thread, then the closing boundary. It also sets an exact
+Content-Length up front. Per-request memory is bounded by one chunk whatever
+the file size. httpx has no sendfile path for request bodies, so chunked
+reads are as low-copy as it gets here.
+"""
+import asyncio
+import mimetypes
+import os
+import secrets
+import time
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.metrics import inc, observe, asr_upload_bytes, asr_upload_throughput_bytes_per_second
+
+CHUNK_SIZE = 256 * 1024
+
+# Called with (file bytes sent, file size) after each chunk
+UploadProgress = Callable[[int, int], Awaitable[None]]
+
+
+def _quote(value: str) -> str:
+    # Same escaping browsers (and httpx) apply to form-data names
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class StreamingUpload:
+    """A multipart body with text `fields` and one file part read from `file_path`."""
+
+    def __init__(
+        self, file_path: str, fields: dict[str, str], *, file_field: str = "file",
+        chunk_size: int = CHUNK_SIZE, on_progress: UploadProgress | None = None,
+    ) -> None:
+        self.file_path = file_path
+        self.fields = fields
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.boundary = secrets.token_hex(16)
+        filename = os.path.basename(file_path)
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'.encode()
+            + str(value).encode() + b"\r\n"
+            for name, value in fields.items()
+        )
+        self._head = head + (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(file_field)}"; '
+            f'filename="{_quote(filename)}"\r\nContent-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self.file_size = os.path.getsize(file_path)
+        self.sent_bytes = 0
+        self.elapsed = 0.0
+
+    @property
+    def content_length(self) -> int:
+        return len(self._head) + self.file_size + len(self._tail)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(self.content_length),
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        start = time.monotonic()
+        yield self._head
+        with open(self.file_path, "rb") as f:
+            remaining = self.file_size
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    raise IOError(f"{self.file_path} shrank while it was being uploaded")
+                remaining -= len(chunk)
+                self.sent_bytes += len(chunk)
+                yield chunk
+                if self.on_progress is not None:
+                    await self.on_progress(self.sent_bytes, self.file_size)
+        yield self._tail
+        self.elapsed = time.monotonic() - start
+
+    def record(self, backend: str) -> None:
+        """Report the finished upload's size and throughput."""
+        inc(asr_upload_bytes, backend, amount=self.sent_bytes)
+        if self.elapsed > 0:
+            observe(asr_upload_throughput_bytes_per_second, self.sent_bytes / self.elapsed, backend)
@@ -1,6 +1,9 @@
-import httpx
 from app.config import settings
+from app.services.asr.balancer import Endpoint, estimate_audio_seconds, get_endpoint_pool
 from app.services.asr.base import ASRBackend, TranscriptionSettings
+from app.services.asr.callbacks import ASRCallback
+from app.services.asr.multipart import StreamingUpload, UploadProgress
+from app.services.http_clients import get_client
 from app.models import TranscriptionStatus, TranscriptionResult, Utterance
 
 STATUS_MAP = {
@@ -11,12 +14,24 @@ STATUS_MAP = {
     "failed": "failed",
 }
 
+def _progress(value) -> float | None:
+    # Reported as a fraction or a percentage, depending on the version
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return None
+    return value / 100 if value > 1 else float(value)
+
+
 class MurmurAIBackend(ASRBackend):
-    def __init__(self):
-        self.base_url = settings.ASR_URL
+    supports_callbacks = True
+
+    def __init__(self, urls: str | None = None):
+        self.pool = get_endpoint_pool(urls)
         self.headers = {"Authorization": settings.ASR_API_KEY}
 
-    async def submit(self, file_path: str, ts: TranscriptionSettings) -> str:
+    async def submit(
+        self, file_path: str, ts: TranscriptionSettings, callback: ASRCallback | None = None,
+        audio_seconds: float | None = None, on_progress: UploadProgress | None = None,
+    ) -> str:
         enable_diarization = ts.min_speakers > 0 or ts.max_speakers > 0
         data = {
             "speaker_labels": str(enable_diarization).lower(),
@@ -35,39 +50,68 @@ class MurmurAIBackend(ASRBackend):
             data["initial_prompt"] = ts.initial_prompt
         if ts.hotwords:
             data["hotwords"] = ts.hotwords
+        if callback:
+            # AssemblyAI-style webhook registration
+            data["webhook_url"] = callback.url
+            data["webhook_auth_header_name"] = callback.header_name
+            data["webhook_auth_header_value"] = callback.header_value
 
-        async with httpx.AsyncClient(timeout=300) as client:
-            with open(file_path, "rb") as f:
-                response = await client.post(
-                    f"{self.base_url}/v1/transcript",
-                    headers=self.headers,
-                    files={"file": f},
-                    data=data,
-                )
+        endpoint = self.pool.pick()
+        body = StreamingUpload(file_path, data, on_progress=on_progress)
+        async with self.pool.request(endpoint, "submit"):
+            response = await get_client("asr").post(
+                f"{endpoint.url}/v1/transcript",
+                headers={**self.headers, **body.headers},
+                content=body,
+                timeout=300,
+            )
             response.raise_for_status()
-            return response.json()["id"]
+        body.record("murmurai")
+        job_id = self.pool.job_id(endpoint, response.json()["id"])
+        if audio_seconds is None:
+            audio_seconds = estimate_audio_seconds(file_path)
+        self.pool.assign(job_id, endpoint, audio_seconds)
+        return job_id
+
+    async def _fetch(self, endpoint: Endpoint, raw_id: str) -> dict:
+        response = await get_client("asr").get(
+            f"{endpoint.url}/v1/transcript/{raw_id}",
+            headers=self.headers,
+        )
+        response.raise_for_status()
+        return response.json()
 
     async def get_status(self, job_id: str) -> TranscriptionStatus:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                f"{self.base_url}/v1/transcript/{job_id}",
-                headers=self.headers,
-            )
-            response.raise_for_status()
-            result = response.json()
+        endpoint, raw_id = self.pool.resolve(job_id)
+        result = await self.pool.call(endpoint, "status", lambda: self._fetch(endpoint, raw_id))
 
         raw_status = str(result.get("status", "")).lower()
         mapped = STATUS_MAP.get(raw_status, raw_status)
-        return TranscriptionStatus(id=job_id, status=mapped, error=result.get("error"))
+        if mapped == "failed":
+            self.pool.release(job_id)
+        return TranscriptionStatus(
+            id=job_id, status=mapped, error=result.get("error"), progress=_progress(result.get("progress")),
+        )
 
-    async def get_result(self, job_id: str) -> TranscriptionResult:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                f"{self.base_url}/v1/transcript/{job_id}",
+    async def cancel(self, job_id: str) -> None:
+        endpoint, raw_id = self.pool.resolve(job_id)
+        self.pool.release(job_id)
+
+        async def delete() -> None:
+            response = await get_client("asr").delete(
+                f"{endpoint.url}/v1/transcript/{raw_id}",
                 headers=self.headers,
             )
-            response.raise_for_status()
-            result = response.json()
+            # Already finished or gone: nothing left to free
+            if response.status_code != 404:
+                response.raise_for_status()
+
+        await self.pool.call(endpoint, "cancel", delete)
+
+    async def get_result(self, job_id: str) -> TranscriptionResult:
+        endpoint, raw_id = self.pool.resolve(job_id)
+        result = await self.pool.call(endpoint, "result", lambda: self._fetch(endpoint, raw_id))
+        self.pool.release(job_id)
 
         utterances = [
             Utterance(start=utt.get("start", 0), end=utt.get("end", 0),
@@ -0,0 +1,119 @@
+"""Status-polling strategies for asynchronous ASR jobs.
+
+A strategy yields the delay before each `get_status` call. The default,
+`AdaptivePolling`, waits until the job is expected to be nearly done (audio
+duration x the model's observed realtime factor) before the first poll, then
+backs off exponentially with jitter so a long tail of slow jobs doesn't turn
+into a steady stream of status requests. Backends pick their strategy via
+`ASRBackend.polling_strategy()`.
+
+The realtime factors behind those expectations are kept in the
+`rtf_estimates` table, so they survive restarts and are shared between the
+API and the workers (queue ETAs, see services/eta.py).
+"""
+import random
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Iterator
+
+from aiosqlite import Connection
+
+from app.config import settings
+
+# Fraction of the expected processing time to wait before the first poll.
+# Slightly under 1 so jobs that run a little faster than average aren't held back.
+_FIRST_POLL_FRACTION = 0.8
+# Weight of the newest observation in the realtime-factor moving average.
+_RTF_ALPHA = 0.2
+
+
+class PollingStrategy(ABC):
+    @abstractmethod
+    def delays(self, expected_seconds: float | None) -> Iterator[float]:
+        """Yield the number of seconds to wait before each status poll."""
+
+
+class FixedPolling(PollingStrategy):
+    def __init__(self, interval: float, first: float | None = None) -> None:
+        self.interval = interval
+        self.first = interval if first is None else first
+
+    def delays(self, expected_seconds: float | None) -> Iterator[float]:
+        yield self.first
+        while True:
+            yield self.interval
+
+
+class AdaptivePolling(PollingStrategy):
+    def __init__(
+        self, *, min_delay: float | None = None, max_delay: float | None = None,
+        factor: float = 1.5, jitter: float = 0.2, rng: random.Random | None = None,
+    ) -> None:
+        self.min_delay = settings.ASR_POLL_MIN_SECONDS if min_delay is None else min_delay
+        self.max_delay = settings.ASR_POLL_MAX_SECONDS if max_delay is None else max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+
+    def _jittered(self, delay: float) -> float:
+        return delay * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    def delays(self, expected_seconds: float | None) -> Iterator[float]:
+        first = (expected_seconds or 0) * _FIRST_POLL_FRACTION
+        yield max(self.min_delay, first)
+        delay = self.min_delay
+        while True:
+            yield self._jittered(min(delay, self.max_delay))
+            delay *= self.factor
+
+
+class RealtimeFactorEstimator:
+    """Exponential moving average of processing time / audio duration per model.
+
+    `observe()` updates this process's copy; `persist()` folds an observation
+    into the DB row that every process shares, and `load()` refreshes the copy
+    from it.
+    """
+
+    def __init__(self) -> None:
+        self._rtf: dict[tuple[str, str], float] = {}
+
+    def observe(self, backend: str, model: str, rtf: float) -> None:
+        key = (backend, model)
+        previous = self._rtf.get(key)
+        self._rtf[key] = rtf if previous is None else previous + _RTF_ALPHA * (rtf - previous)
+
+    async def persist(self, db: Connection, backend: str, model: str, rtf: float) -> None:
+        """Fold `rtf` into the stored average and adopt the result locally."""
+        await db.execute(
+            """INSERT INTO rtf_estimates (backend, model, rtf, samples, updated_at)
+               VALUES (?, ?, ?, 1, ?)
+               ON CONFLICT (backend, model) DO UPDATE SET
+                   rtf = rtf + ? * (excluded.rtf - rtf),
+                   samples = samples + 1, updated_at = excluded.updated_at""",
+            (backend, model, rtf, datetime.now(timezone.utc).isoformat(), _RTF_ALPHA),
+        )
+        await db.commit()
+        cursor = await db.execute(
+            "SELECT rtf FROM rtf_estimates WHERE backend = ? AND model = ?", (backend, model),
+        )
+        row = await cursor.fetchone()
+        if row is not None:
+            self._rtf[(backend, model)] = row[0]
+
+    async def load(self, db: Connection) -> None:
+        """Replace the local averages with the stored ones."""
+        cursor = await db.execute("SELECT backend, model, rtf FROM rtf_estimates")
+        for backend, model, rtf in await cursor.fetchall():
+            self._rtf[(backend, model)] = rtf
+
+    def get(self, backend: str, model: str) -> float:
+        return self._rtf.get((backend, model), settings.ASR_DEFAULT_RTF)
+
+    def expected_seconds(self, backend: str, model: str, audio_duration: float | None) -> float | None:
+        if not audio_duration:
+            return None
+        return audio_duration * self.get(backend, model)
+
+
+rtf_estimator = RealtimeFactorEstimator()
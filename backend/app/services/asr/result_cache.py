@@ -0,0 +1,114 @@
+"""Cache of ASR results for identical audio and settings.
+
+Entries are keyed on the audio's content hash (see services/storage.py), the
+ASR backend and the normalized transcription settings, so re-running a file
+after deleting it, or several users uploading the same recording, costs one
+ASR pass. Only the raw utterances are stored: titles, edits, refinements and
+translations live on each user's transcription row and are never shared.
+
+The cache is a table in the main DB. Reads bump `last_used_at`; writes evict
+least recently used entries beyond ASR_RESULT_CACHE_MAX_ENTRIES or
+ASR_RESULT_CACHE_MB.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+
+from aiosqlite import Connection
+
+from app.config import settings
+from app.models import Utterance
+from app.services.asr.base import TranscriptionSettings
+
+logger = logging.getLogger(__name__)
+
+
+def cache_enabled() -> bool:
+    return settings.ASR_RESULT_CACHE_MB > 0 and settings.ASR_RESULT_CACHE_MAX_ENTRIES > 0
+
+
+def _now_str() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _text(value: str | None) -> str | None:
+    value = (value or "").strip()
+    return value or None
+
+
+def normalize_settings(ts: TranscriptionSettings) -> dict:
+    """The settings that affect the ASR output, in canonical form.
+
+    Empty prompts and hotwords equal none, "auto" equals no language, and
+    speaker bounds of 0 or less mean "unbounded".
+    """
+    language = (_text(ts.language) or "").lower()
+    return {
+        "language": None if language in ("", "auto") else language,
+        "model": _text(ts.model) or "base",
+        "min_speakers": max(0, int(ts.min_speakers or 0)),
+        "max_speakers": max(0, int(ts.max_speakers or 0)),
+        "initial_prompt": _text(ts.initial_prompt),
+        "hotwords": _text(ts.hotwords),
+    }
+
+
+def cache_key(content_hash: str, backend: str, ts: TranscriptionSettings) -> str:
+    normalized = json.dumps(normalize_settings(ts), sort_keys=True)
+    return hashlib.sha256(f"{content_hash}\0{backend}\0{normalized}".encode()).hexdigest()
+
+
+async def lookup(db: Connection, content_hash: str, backend: str, ts: TranscriptionSettings) -> list[Utterance] | None:
+    """Return the cached utterances for this audio and settings, or None."""
+    key = cache_key(content_hash, backend, ts)
+    cursor = await db.execute("SELECT result_json FROM asr_result_cache WHERE cache_key = ?", (key,))
+    row = await cursor.fetchone()
+    if row is None:
+        return None
+    await db.execute(
+        "UPDATE asr_result_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+        (_now_str(), key),
+    )
+    await db.commit()
+    return [Utterance(**u) for u in json.loads(row["result_json"])]
+
+
+async def store(
+    db: Connection, content_hash: str, backend: str, ts: TranscriptionSettings,
+    utterances: list[Utterance],
+) -> None:
+    """Cache a finished result, then evict down to the configured limits."""
+    result_json = json.dumps([u.model_dump() for u in utterances])
+    now = _now_str()
+    await db.execute(
+        """INSERT OR REPLACE INTO asr_result_cache
+           (cache_key, content_hash, backend, settings_json, result_json, size_bytes, created_at, last_used_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (cache_key(content_hash, backend, ts), content_hash, backend,
+         json.dumps(normalize_settings(ts), sort_keys=True), result_json, len(result_json), now, now),
+    )
+    await evict(db)
+    await db.commit()
+
+
+async def evict(db: Connection) -> int:
+    """Drop least recently used entries beyond the entry and size limits."""
+    max_entries = settings.ASR_RESULT_CACHE_MAX_ENTRIES
+    max_bytes = int(settings.ASR_RESULT_CACHE_MB * 1024 * 1024)
+    cursor = await db.execute(
+        "SELECT cache_key, size_bytes FROM asr_result_cache ORDER BY last_used_at DESC, rowid DESC"
+    )
+    kept_entries = kept_bytes = 0
+    stale = []
+    for row in await cursor.fetchall():
+        # Once a limit is hit, everything used less recently goes too
+        if not stale and kept_entries < max_entries and kept_bytes + row["size_bytes"] <= max_bytes:
+            kept_entries += 1
+            kept_bytes += row["size_bytes"]
+        else:
+            stale.append((row["cache_key"],))
+    if stale:
+        await db.executemany("DELETE FROM asr_result_cache WHERE cache_key = ?", stale)
+        logger.info("Evicted %d ASR result cache entries", len(stale))
+    return len(stale)
@@ -0,0 +1,248 @@
+"""Segmented transcription: split long audio and fan it out to the ASR backend.
+
+A long recording sent as one request is bounded by a single ASR worker's
+speed. In segmented mode the file is cut near every ASR_SEGMENT_MINUTES at
+the closest silence, the segments are submitted concurrently through the
+regular `ASRBackend` interface (at most ASR_SEGMENT_MAX_PARALLEL at a time),
+and the utterance lists are stitched back together on the original timeline.
+The job's own scheduler slot covers one segment; every further segment in
+flight claims an extra slot (services/job_queue.py `asr_slot`), so the
+fan-out counts against ASR_MAX_CONCURRENT and the user and pool caps. When
+the caps are reached, the remaining segments take turns in the job's slot.
+Segments are stitched in order as they finish, so the start of a recording
+can be shown (see services/partial_results.py) before the end is done.
+
+Diarization runs per segment, so "A" in one segment need not be "A" in the
+next. Each segment after the first starts ASR_SEGMENT_OVERLAP_SECONDS before
+its cut; the speakers heard in that overlap are matched to the previous
+segment's by how long they talk over the same stretch, and utterances from
+the overlap are then dropped as duplicates.
+"""
+import asyncio
+import logging
+import os
+import shutil
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.config import settings
+from app.models import TranscriptionResult, Utterance
+from app.services.asr.base import ASRBackend, TranscriptionSettings
+from app.services.audio import choose_cut_points, detect_silences, extract_segment
+from app.services.job_queue import asr_slot
+
+
+@dataclass
+class Segment:
+    index: int
+    start: float  # where the audio sent to ASR begins (overlap included)
+    cut: float  # where this segment's own utterances begin
+    end: float | None  # None for the last segment
+
+
+def segmenting_enabled(audio_duration: float | None) -> bool:
+    """Whether a file of this length should be transcribed in segments."""
+    if settings.ASR_SEGMENT_MINUTES <= 0 or not audio_duration:
+        return False
+    # Not worth the split for files barely over one segment
+    return audio_duration > settings.ASR_SEGMENT_MINUTES * 60 * 1.5
+
+
+def plan_segments(duration: float, cuts: list[float], overlap: float) -> list[Segment]:
+    bounds = [0.0, *cuts]
+    segments = []
+    for i, cut in enumerate(bounds):
+        end = bounds[i + 1] if i + 1 < len(bounds) else None
+        segments.append(Segment(index=i, start=max(0.0, cut - overlap) if i else 0.0, cut=cut, end=end))
+    return segments
+
+
+def _speaker_overlap(a: list[Utterance], b: list[Utterance], window_start: int, window_end: int) -> dict:
+    """Milliseconds each (a-speaker, b-speaker) pair talk over the same time in the window."""
+    totals: dict[tuple[str, str], int] = {}
+    for ua in a:
+        if not ua.speaker or ua.end <= window_start or ua.start >= window_end:
+            continue
+        for ub in b:
+            if not ub.speaker:
+                continue
+            shared = min(ua.end, ub.end, window_end) - max(ua.start, ub.start, window_start)
+            if shared > 0:
+                totals[(ua.speaker, ub.speaker)] = totals.get((ua.speaker, ub.speaker), 0) + shared
+    return totals
+
+
+def match_speakers(
+    previous: list[Utterance], current: list[Utterance], window_start: int, window_end: int,
+    used: set[str], index: int,
+) -> dict[str, str]:
+    """Map `current`'s local speaker labels onto labels already in `previous`.
+
+    Greedy by shared talk time in the overlap window; speakers that don't
+    match anyone keep their label if it is still free, else get it suffixed
+    with the segment number.
+    """
+    mapping: dict[str, str] = {}
+    taken: set[str] = set()
+    pairs = _speaker_overlap(current, previous, window_start, window_end)
+    for (local, known), _ in sorted(pairs.items(), key=lambda kv: -kv[1]):
+        if local in mapping or known in taken:
+            continue
+        mapping[local] = known
+        taken.add(known)
+    for u in current:
+        if u.speaker and u.speaker not in mapping:
+            label = u.speaker if u.speaker not in used else f"{u.speaker}-{index + 1}"
+            mapping[u.speaker] = label
+            used.add(label)
+    return mapping
+
+
+class Stitcher:
+    """Merges segment results onto the original timeline, one segment at a time.
+
+    Segments must be added in order; each one's speakers are matched against
+    the one before it.
+    """
+
+    def __init__(self) -> None:
+        self.used: set[str] = set()
+        self.previous: list[Utterance] = []
+
+    def add(self, segment: Segment, utterances: list[Utterance]) -> list[Utterance]:
+        """Shift `utterances` onto the original timeline; returns the segment's own ones."""
+        offset = int(segment.start * 1000)
+        shifted = [u.model_copy(update={"start": u.start + offset, "end": u.end + offset}) for u in utterances]
+        cut_ms = int(segment.cut * 1000)
+        if segment.index == 0:
+            self.used.update(u.speaker for u in shifted if u.speaker)
+            mapping = {}
+        else:
+            mapping = match_speakers(self.previous, shifted, offset, cut_ms, self.used, segment.index)
+        own = []
+        for u in shifted:
+            if u.speaker in mapping:
+                u.speaker = mapping[u.speaker]
+            # The overlap was already transcribed by the previous segment
+            if segment.index and (u.start + u.end) / 2 < cut_ms:
+                continue
+            own.append(u)
+        self.previous = shifted
+        return own
+
+
+def stitch(segments: list[Segment], results: list[list[Utterance]]) -> list[Utterance]:
+    """Shift each segment's utterances onto the original timeline and merge them."""
+    stitcher = Stitcher()
+    merged: list[Utterance] = []
+    for segment, utterances in zip(segments, results):
+        merged.extend(stitcher.add(segment, utterances))
+    return merged
+
+
+@asynccontextmanager
+async def _segment_slot(own: asyncio.Lock, user_id: str, model: str | None) -> AsyncIterator[None]:
+    """A scheduler slot for one segment: the job's own, an extra one, or the own one after a wait."""
+    if not own.locked():
+        async with own:
+            yield
+        return
+    async with asr_slot(user_id, model) as granted:
+        if granted:
+            yield
+            return
+    async with own:
+        yield
+
+
+async def _transcribe_segment(
+    backend: ASRBackend, path: str, ts: TranscriptionSettings, job_ids: list[str],
+    audio_seconds: float,
+) -> TranscriptionResult:
+    job_id = await backend.submit(path, ts, audio_seconds=audio_seconds)
+    job_ids.append(job_id)
+    for delay in backend.polling_strategy().delays(None):
+        await asyncio.sleep(delay)
+        status = await backend.get_status(job_id)
+        if status.status == "completed":
+            break
+        if status.status == "failed":
+            raise RuntimeError(status.error or "Segment transcription failed")
+    return await backend.get_result(job_id)
+
+
+async def transcribe_segmented(
+    backend: ASRBackend, file_path: str, ts: TranscriptionSettings, duration: float,
+    *, user_id: str, work_dir: str, job_ids: list[str],
+    on_utterances: Callable[[list[Utterance]], Awaitable[None]] | None = None,
+) -> tuple[TranscriptionResult, int]:
+    """Transcribe `file_path` in parallel segments; returns (result, segment count).
+
+    Every submitted ASR job id is appended to `job_ids` as soon as it exists,
+    so the caller can cancel them if it is cancelled itself. Once a segment
+    and all before it are done, its stitched utterances are final and are
+    passed to `on_utterances`, in order.
+    """
+    segment_seconds = settings.ASR_SEGMENT_MINUTES * 60
+    silences = await detect_silences(
+        file_path, noise_db=settings.ASR_SILENCE_NOISE_DB,
+        min_silence=settings.ASR_SILENCE_MIN_SECONDS, duration=duration,
+    )
+    cuts = choose_cut_points(
+        duration, silences, segment_seconds=segment_seconds,
+        search_seconds=settings.ASR_SEGMENT_SEARCH_SECONDS,
+    )
+    segments = plan_segments(duration, cuts, settings.ASR_SEGMENT_OVERLAP_SECONDS)
+    logging.info("Transcribing %s in %d segments", file_path, len(segments))
+
+    os.makedirs(work_dir, exist_ok=True)
+    limit = asyncio.Semaphore(max(1, settings.ASR_SEGMENT_MAX_PARALLEL))
+    own_slot = asyncio.Lock()
+    ext = os.path.splitext(file_path)[1] or ".mp3"
+
+    async def run(segment: Segment) -> tuple[int, TranscriptionResult]:
+        async with limit:
+            path = os.path.join(work_dir, f"segment-{segment.index:04d}{ext}")
+            await extract_segment(file_path, path, segment.start, segment.end)
+            try:
+                async with _segment_slot(own_slot, user_id, ts.model):
+                    return segment.index, await _transcribe_segment(
+                        backend, path, ts, job_ids, (segment.end or duration) - segment.start,
+                    )
+            finally:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    stitcher = Stitcher()
+    results: dict[int, TranscriptionResult] = {}
+    utterances: list[Utterance] = []
+    stitched = 0
+    tasks = [asyncio.create_task(run(s)) for s in segments]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            results[index] = result
+            # Stitch every segment that now has all its predecessors done
+            while stitched < len(segments) and stitched in results:
+                own = stitcher.add(segments[stitched], results[stitched].utterances)
+                utterances.extend(own)
+                stitched += 1
+                if on_utterances is not None and own:
+                    await on_utterances(own)
+    except BaseException:
+        # One failed segment fails the job; don't leave the others running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    language = next((results[i].language for i in range(len(segments)) if results[i].language), ts.language)
+    return TranscriptionResult(
+        id=",".join(job_ids), status="completed", utterances=utterances,
+        text=" ".join(u.text for u in utterances), language=language,
+    ), len(segments)
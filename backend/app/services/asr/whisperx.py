@@ -1,43 +1,153 @@
+"""WhisperX backend (OpenAI-compatible `/v1/audio/transcriptions`).
+
+WhisperX has no job API: one HTTP request is the whole transcription. To
+still behave like an asynchronous backend, `submit()` records the job in the
+`asr_jobs` table, hands the request to a background task and returns at
+once. The task waits for a free slot on its endpoint (queued), then sends
+the audio and waits for the transcript (running), then stores the result in
+the row. `get_status()` and `get_result()` read the row. The request timeout
+grows with the audio's length, so long files no longer hit a fixed limit.
+
+The task lives in this process. A job whose task is gone (the process
+restarted) is reported as failed, so the backend is not resumable. The
+pipeline re-submits such jobs.
+"""
 import asyncio
+import json
+import logging
 import uuid
-import httpx
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
 from app.config import settings
+from app.database import get_db
+from app.metrics import gauge_set, whisperx_jobs
+from app.services.asr.balancer import Endpoint, estimate_audio_seconds, get_endpoint_pool
 from app.services.asr.base import ASRBackend, TranscriptionSettings
+from app.services.asr.multipart import StreamingUpload, UploadProgress
+from app.services.http_clients import get_client
 from app.models import TranscriptionStatus, TranscriptionResult, Utterance
 
-_semaphore = asyncio.Semaphore(settings.ASR_MAX_CONCURRENT)
+logger = logging.getLogger(__name__)
+
+# Background tasks owning the WhisperX requests, and whether each is
+# "pending" (waiting for an endpoint slot) or "processing".
+_tasks: dict[str, asyncio.Task] = {}
+_states: dict[str, str] = {}
+# Why a job failed, so get_status() can re-raise it and the pipeline can tell
+# an unreachable backend (hold the job) from a bad file (fail it).
+_errors: dict[str, Exception] = {}
+# Per-endpoint request limits (WHISPERX_MAX_CONCURRENT_PER_ENDPOINT)
+_slots: dict[str, asyncio.Semaphore] = {}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def request_timeout(audio_seconds: float | None) -> float:
+    """How long to wait for the transcript of `audio_seconds` of audio."""
+    return settings.WHISPERX_TIMEOUT_SECONDS + (audio_seconds or 0) * settings.WHISPERX_TIMEOUT_PER_AUDIO_SECOND
+
+
+@asynccontextmanager
+async def _slot(url: str):
+    limit = settings.WHISPERX_MAX_CONCURRENT_PER_ENDPOINT
+    if limit <= 0:
+        yield
+        return
+    semaphore = _slots.setdefault(url, asyncio.Semaphore(limit))
+    async with semaphore:
+        yield
+
+
+def _set_state(job_id: str, state: str | None) -> None:
+    if state is None:
+        _states.pop(job_id, None)
+    else:
+        _states[job_id] = state
+    states = list(_states.values())
+    gauge_set(whisperx_jobs, states.count("pending"), "queued")
+    gauge_set(whisperx_jobs, states.count("processing"), "running")
 
-# In-memory cache for WhisperX results. WhisperX is synchronous, so submit() blocks
-# until complete — the result is stored in the DB by _run_transcription() immediately
-# after submit() returns. These dicts are only used during the brief poll loop between
-# submit() returning and _run_transcription() reading get_result().
-_results: dict[str, TranscriptionResult] = {}
-_statuses: dict[str, str] = {}
+
+async def _update(job_id: str, **fields) -> None:
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    async with get_db() as db:
+        await db.execute(f"UPDATE asr_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        await db.commit()
+
+
+async def _forget(job_id: str) -> None:
+    _errors.pop(job_id, None)
+    async with get_db() as db:
+        await db.execute("DELETE FROM asr_jobs WHERE id = ?", (job_id,))
+        await db.commit()
 
 
 class WhisperXBackend(ASRBackend):
-    def __init__(self):
-        self.base_url = settings.ASR_URL
+    # Jobs run as tasks of this process and die with it.
+    resumable = False
 
-    async def submit(self, file_path: str, ts: TranscriptionSettings) -> str:
-        job_id = str(uuid.uuid4())
-        _statuses[job_id] = "processing"
-
-        async with _semaphore:
-            try:
-                result = await self._call_whisperx(file_path, ts)
-                _results[job_id] = result
-                _statuses[job_id] = "completed"
-            except Exception:
-                _statuses[job_id] = "failed"
-                _results[job_id] = TranscriptionResult(
-                    id=job_id, status="failed", text="", utterances=[], language=None
-                )
-                raise
+    def __init__(self, urls: str | None = None):
+        self.pool = get_endpoint_pool(urls)
 
+    async def submit(
+        self, file_path: str, ts: TranscriptionSettings, callback=None, audio_seconds: float | None = None,
+        on_progress: UploadProgress | None = None,
+    ) -> str:
+        # Raises ASRUnavailableError while every breaker is open
+        endpoint = self.pool.pick()
+        job_id = str(uuid.uuid4())
+        if audio_seconds is None:
+            audio_seconds = estimate_audio_seconds(file_path)
+        async with get_db() as db:
+            await db.execute(
+                """INSERT INTO asr_jobs (id, backend, endpoint, status, audio_seconds, created_at)
+                   VALUES (?, 'whisperx', ?, 'pending', ?, ?)""",
+                (job_id, endpoint.url, audio_seconds, _now()),
+            )
+            await db.commit()
+        # Concurrency is capped upstream by the job scheduler (ASR_MAX_CONCURRENT).
+        # The request is the whole job, so its audio is outstanding until it returns.
+        self.pool.assign(job_id, endpoint, audio_seconds)
+        _set_state(job_id, "pending")
+        _tasks[job_id] = asyncio.create_task(self._run(
+            job_id, endpoint, file_path, ts, audio_seconds, on_progress,
+        ))
         return job_id
 
-    async def _call_whisperx(self, file_path: str, ts: TranscriptionSettings) -> TranscriptionResult:
+    async def _run(
+        self, job_id: str, endpoint: Endpoint, file_path: str, ts: TranscriptionSettings,
+        audio_seconds: float, on_progress: UploadProgress | None,
+    ) -> None:
+        try:
+            async with _slot(endpoint.url):
+                _set_state(job_id, "processing")
+                await _update(job_id, status="processing", started_at=_now())
+                async with self.pool.request(endpoint, "transcribe"):
+                    result = await self._call_whisperx(
+                        endpoint.url, file_path, ts, request_timeout(audio_seconds), on_progress,
+                    )
+            await _update(
+                job_id, status="completed", completed_at=_now(),
+                result_json=json.dumps(result.model_dump()),
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("WhisperX job %s failed: %s: %s", job_id, type(e).__name__, e)
+            _errors[job_id] = e
+            await _update(job_id, status="failed", completed_at=_now(), error_message=str(e) or type(e).__name__)
+        finally:
+            _tasks.pop(job_id, None)
+            _set_state(job_id, None)
+            self.pool.release(job_id)
+
+    async def _call_whisperx(
+        self, base_url: str, file_path: str, ts: TranscriptionSettings, timeout: float,
+        on_progress: UploadProgress | None = None,
+    ) -> TranscriptionResult:
         data = {
             "response_format": "verbose_json",
             "diarize": str(ts.min_speakers > 0 or ts.max_speakers > 0).lower(),
@@ -51,15 +161,16 @@ class WhisperXBackend(ASRBackend):
         if ts.hotwords:
             data["hotwords"] = ts.hotwords
 
-        async with httpx.AsyncClient(timeout=600) as client:
-            with open(file_path, "rb") as f:
-                response = await client.post(
-                    f"{self.base_url}/v1/audio/transcriptions",
-                    files={"file": f},
-                    data=data,
-                )
-            response.raise_for_status()
-            result = response.json()
+        body = StreamingUpload(file_path, data, on_progress=on_progress)
+        response = await get_client("asr").post(
+            f"{base_url}/v1/audio/transcriptions",
+            headers=body.headers,
+            content=body,
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        body.record("whisperx")
+        result = response.json()
 
         segments = result.get("segments", [])
         utterances = [
@@ -78,15 +189,39 @@ class WhisperXBackend(ASRBackend):
         )
 
     async def get_status(self, job_id: str) -> TranscriptionStatus:
-        status = _statuses.get(job_id, "pending")
-        return TranscriptionStatus(id=job_id, status=status)
+        async with get_db() as db:
+            cursor = await db.execute("SELECT status, error_message FROM asr_jobs WHERE id = ?", (job_id,))
+            row = await cursor.fetchone()
+        if row is None:
+            return TranscriptionStatus(id=job_id, status="failed", error="WhisperX job not found")
+        status = row["status"]
+        if status in ("pending", "processing") and job_id not in _tasks:
+            await _forget(job_id)
+            return TranscriptionStatus(id=job_id, status="failed", error="WhisperX job was lost in a restart")
+        if status == "failed":
+            error = _errors.get(job_id)
+            await _forget(job_id)
+            if error is not None:
+                raise error
+        return TranscriptionStatus(id=job_id, status=status, error=row["error_message"])
+
+    async def cancel(self, job_id: str) -> None:
+        # WhisperX has no job API: closing the request connection is the only
+        # way to stop it, so cancel the task blocked on it (if still running).
+        task = _tasks.pop(job_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        await _forget(job_id)
 
     async def get_result(self, job_id: str) -> TranscriptionResult:
-        result = _results.get(job_id)
-        if not result:
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT result_json FROM asr_jobs WHERE id = ? AND status = 'completed'", (job_id,),
+            )
+            row = await cursor.fetchone()
+        if row is None:
             raise ValueError(f"No result for job {job_id}")
+        result = TranscriptionResult(**json.loads(row["result_json"]))
         result.id = job_id
-        # Clean up in-memory cache after retrieval
-        _results.pop(job_id, None)
-        _statuses.pop(job_id, None)
+        await _forget(job_id)
         return result
@@ -1,5 +1,8 @@
 import asyncio
+import json
 import os
+import re
+import wave
 from app.config import settings
 
 
@@ -18,7 +21,16 @@ async def convert_to_mp3(input_path: str) -> str:
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
-    _, stderr = await process.communicate()
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+            try:
+                await process.wait()
+            except Exception:
+                pass
+        raise
 
     if process.returncode != 0:
         error_msg = stderr.decode()[-500:] if stderr else "Unknown error"
@@ -73,3 +85,280 @@ async def has_video_stream(file_path: str) -> bool:
             except Exception:
                 pass
         raise
+
+
+async def _run_ffmpeg(*args: str) -> str:
+    """Run ffmpeg with `args`; return its stderr. Kills the child if cancelled."""
+    process = await asyncio.create_subprocess_exec(
+        settings.FFMPEG_PATH, "-hide_banner", "-nostdin", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+            try:
+                await process.wait()
+            except Exception:
+                pass
+        raise
+    output = stderr.decode(errors="replace") if stderr else ""
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {output[-500:] or 'Unknown error'}")
+    return output
+
+
+_SILENCE_START = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+
+def parse_silencedetect(output: str, duration: float | None = None) -> list[tuple[float, float]]:
+    """Extract (start, end) silent intervals in seconds from silencedetect output.
+
+    A silence still open at the end of the file is closed at `duration`
+    (or dropped if the duration is unknown).
+    """
+    silences = []
+    start = None
+    for line in output.splitlines():
+        if (m := _SILENCE_START.search(line)) is not None:
+            start = max(0.0, float(m.group(1)))
+        elif (m := _SILENCE_END.search(line)) is not None and start is not None:
+            silences.append((start, float(m.group(1))))
+            start = None
+    if start is not None and duration is not None and duration > start:
+        silences.append((start, duration))
+    return silences
+
+
+async def detect_silences(
+    file_path: str, *, noise_db: float, min_silence: float, duration: float | None = None,
+) -> list[tuple[float, float]]:
+    """Silent intervals (seconds) quieter than `noise_db` for at least `min_silence`."""
+    output = await _run_ffmpeg(
+        "-i", file_path, "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+        "-f", "null", "-",
+    )
+    return parse_silencedetect(output, duration)
+
+
+def choose_cut_points(
+    duration: float, silences: list[tuple[float, float]], *,
+    segment_seconds: float, search_seconds: float,
+) -> list[float]:
+    """Cut positions (seconds) near every `segment_seconds`, snapped to silence.
+
+    Each boundary moves to the midpoint of the silence closest to it within
+    `search_seconds`; with none in reach it stays a hard cut. Returns the
+    inner cut points only, in ascending order.
+    """
+    cuts: list[float] = []
+    target = segment_seconds
+    while target < duration - search_seconds:
+        best = None
+        for start, end in silences:
+            mid = (start + end) / 2
+            if abs(mid - target) <= search_seconds and (best is None or abs(mid - target) < abs(best - target)):
+                best = mid
+        cut = best if best is not None else target
+        if not cuts or cut > cuts[-1]:
+            cuts.append(cut)
+        target = cut + segment_seconds
+    return cuts
+
+
+async def extract_segment(file_path: str, output_path: str, start: float, end: float | None) -> str:
+    """Write [start, end) of `file_path` to `output_path` without re-encoding."""
+    args = ["-y", "-ss", f"{start:.3f}", "-i", file_path]
+    if end is not None:
+        args += ["-t", f"{end - start:.3f}"]
+    await _run_ffmpeg(*args, "-map", "0:a", "-c", "copy", output_path)
+    return output_path
+
+
+# Live recordings are decoded to 16 kHz mono 16-bit PCM, what ASR models take in
+PCM_SAMPLE_RATE = 16000
+_PCM_BYTES_PER_SECOND = PCM_SAMPLE_RATE * 2
+_PCM_CHUNK_SIZE = 64 * 1024
+
+
+class StreamDecoder:
+    """Decodes a recording to raw PCM while it is still being written.
+
+    One ffmpeg process per recording reads the chunks on stdin as they
+    arrive, and its output grows a PCM sidecar file at `pcm_path`. A window
+    of the recording is then a byte range of that file (`write_wav`), so a
+    pass costs as much as its window rather than the recording so far.
+    """
+
+    def __init__(self, pcm_path: str) -> None:
+        self.pcm_path = pcm_path
+        self.decoded = 0  # bytes of PCM in the sidecar
+        self.failed = False
+        self._process: asyncio.subprocess.Process | None = None
+        self._output: asyncio.Task | None = None
+
+    @property
+    def seconds(self) -> float:
+        return self.decoded / _PCM_BYTES_PER_SECOND
+
+    async def feed(self, chunk: bytes) -> None:
+        """Pass the next chunk of the recording to the decoder."""
+        if self.failed:
+            return
+        try:
+            if self._process is None:
+                open(self.pcm_path, "wb").close()
+                self._process = await asyncio.create_subprocess_exec(
+                    settings.FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+                    "-vn", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE), "-f", "s16le", "pipe:1",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+                self._output = asyncio.create_task(self._collect())
+            self._process.stdin.write(chunk)
+            await self._process.stdin.drain()
+        except (OSError, ConnectionError):
+            # ffmpeg gave up on the stream (or isn't there); stop feeding it
+            self.failed = True
+
+    async def _collect(self) -> None:
+        with open(self.pcm_path, "ab") as out:
+            while chunk := await self._process.stdout.read(_PCM_CHUNK_SIZE):
+                out.write(chunk)
+                out.flush()
+                self.decoded += len(chunk)
+
+    async def finish(self) -> None:
+        """Close the input and wait until everything fed has been decoded."""
+        if self._process is None or self._process.stdin.is_closing():
+            return
+        self._process.stdin.close()
+        await self._output
+        if await self._process.wait() != 0:
+            self.failed = True
+
+    def write_wav(self, output_path: str, start: float) -> float:
+        """Write the audio decoded so far from `start` seconds on as a WAV file.
+
+        Returns its length in seconds. Raises RuntimeError if decoding failed.
+        """
+        if self.failed:
+            raise RuntimeError("Decoding the live recording failed")
+        end = self.decoded - self.decoded % 2
+        begin = min(int(start * PCM_SAMPLE_RATE) * 2, end)
+        with wave.open(output_path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(PCM_SAMPLE_RATE)
+            if begin < end:
+                with open(self.pcm_path, "rb") as pcm:
+                    pcm.seek(begin)
+                    remaining = end - begin
+                    while remaining > 0 and (data := pcm.read(min(_PCM_CHUNK_SIZE, remaining))):
+                        wav.writeframes(data)
+                        remaining -= len(data)
+        return (end - begin) / _PCM_BYTES_PER_SECOND
+
+    async def close(self) -> None:
+        """Stop the decoder if it is still running and delete the sidecar."""
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+            try:
+                await self._process.wait()
+            except Exception:
+                pass
+        if self._output is not None:
+            self._output.cancel()
+            await asyncio.gather(self._output, return_exceptions=True)
+        try:
+            os.unlink(self.pcm_path)
+        except OSError:
+            pass
+
+
+class SpeechMap:
+    """Maps time in a silence-trimmed file back to the original recording.
+
+    `regions` are the (start, end) spans of the original, in seconds, that
+    were kept; the compacted file is those spans played back to back.
+    """
+
+    def __init__(self, regions: list[tuple[float, float]]) -> None:
+        self.regions = regions
+
+    @property
+    def kept_seconds(self) -> float:
+        return sum(end - start for start, end in self.regions)
+
+    def to_original(self, seconds: float, *, is_end: bool = False) -> float:
+        """Original-timeline position of `seconds` in the compacted file.
+
+        At a join between two regions, a start belongs to the later region
+        and an end to the earlier one, so no utterance spans a trimmed gap.
+        """
+        elapsed = 0.0
+        for start, end in self.regions:
+            length = end - start
+            if seconds < elapsed + length or (is_end and seconds <= elapsed + length):
+                return start + max(0.0, seconds - elapsed)
+            elapsed += length
+        if not self.regions:
+            return seconds
+        return self.regions[-1][1] + (seconds - elapsed)
+
+    def remap(self, utterances: list) -> list:
+        """Shift millisecond `start`/`end` of utterances onto the original timeline."""
+        return [
+            u.model_copy(update={
+                "start": round(self.to_original(u.start / 1000) * 1000),
+                "end": round(self.to_original(u.end / 1000, is_end=True) * 1000),
+            })
+            for u in utterances
+        ]
+
+    def to_json(self) -> str:
+        return json.dumps(self.regions)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "SpeechMap":
+        return cls([(float(s), float(e)) for s, e in json.loads(raw)])
+
+
+def speech_regions(
+    duration: float, silences: list[tuple[float, float]], *, padding: float,
+) -> list[tuple[float, float]]:
+    """Spans to keep when cutting `silences` out, leaving `padding` at each edge."""
+    regions = []
+    position = 0.0
+    for start, end in silences:
+        cut_start, cut_end = start + padding, end - padding
+        if cut_end <= cut_start or cut_end <= position:
+            continue
+        if cut_start > position:
+            regions.append((position, cut_start))
+        position = cut_end
+    if position < duration:
+        regions.append((position, duration))
+    return regions
+
+
+async def compact_audio(file_path: str, output_path: str, regions: list[tuple[float, float]]) -> str:
+    """Write only `regions` of `file_path`, back to back, to `output_path`."""
+    expr = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in regions)
+    # The expression grows with the number of regions; a filter script keeps
+    # it off the command line.
+    script_path = output_path + ".filter"
+    with open(script_path, "w") as f:
+        f.write(f"aselect='{expr}',asetpts=N/SR/TB")
+    try:
+        await _run_ffmpeg("-y", "-i", file_path, "-filter_script:a", script_path, "-vn", output_path)
+    finally:
+        try:
+            os.unlink(script_path)
+        except OSError:
+            pass
+    return output_path
@@ -0,0 +1,131 @@
+"""Queue position and expected start/completion times for transcriptions.
+
+Each job's ASR runtime is expected to be its audio duration x the model's
+realtime factor (the rolling average in `rtf_estimates`, see
+asr/polling.py). A pending job's start is found by replaying the queue ahead
+of it onto ASR_MAX_CONCURRENT slots: running jobs hold their slot for the
+rest of their expected runtime, then the pending jobs ahead of it take the
+first free slot. "Ahead" uses the scheduler's own order (priority classes,
+fair share, shortest job first with aging; see scheduler.py). Jobs whose
+duration is unknown count as the average of the known ones.
+
+Nothing is stored: estimates are recomputed on every read, so they move as
+jobs finish, new factors are observed or the queue ahead is cancelled.
+Per-user and per-pool caps, and jobs yet to arrive, can still reorder the
+queue, so these are guides, not promises.
+"""
+import heapq
+from datetime import datetime, timedelta, timezone
+
+from aiosqlite import Connection
+
+from app.config import settings
+from app.services.asr.polling import rtf_estimator
+from app.services.job_queue import seconds_since
+from app.services.scheduler import queue_key, running_by_user
+
+
+def _empty(position: int | None = None) -> dict:
+    return {"queue_position": position, "expected_start_at": None, "expected_completion_at": None}
+
+
+def _runtime(job, fallback_duration: float | None) -> float | None:
+    duration = job["audio_duration"] or fallback_duration
+    if not duration:
+        return None
+    return duration * rtf_estimator.get(
+        job["asr_backend"] or settings.ASR_BACKEND, job["model"] or "default",
+    )
+
+
+def _iso(ts: datetime) -> str:
+    return ts.isoformat(timespec="seconds")
+
+
+def project_start(running_remaining: list[float], queued_runtimes: list[float], slots: int) -> float:
+    """Seconds until a job queued behind `queued_runtimes` gets a slot.
+
+    `running_remaining` is the expected time left for each running job.
+    With more running jobs than `slots` (e.g. just after lowering the cap),
+    the next slot opens once enough of them have finished.
+    """
+    free_at = [0.0] * max(1, slots)
+    for runtime in sorted(running_remaining) + queued_runtimes:
+        heapq.heappush(free_at, heapq.heappop(free_at) + runtime)
+    return free_at[0]
+
+
+async def _queue_up_to(db: Connection, transcription_id: str) -> list[dict]:
+    """Pending jobs in the order the scheduler would pick them, up to and including this one."""
+    cursor = await db.execute(
+        """SELECT id, user_id, priority_class, audio_duration, asr_backend, model, created_at
+           FROM transcriptions WHERE status = 'pending' ORDER BY created_at, rowid""",
+    )
+    pending = [dict(job) for job in await cursor.fetchall()]
+    served = await running_by_user(db)
+    now = datetime.now(timezone.utc)
+    for job in pending:
+        job["wait_seconds"] = seconds_since(job["created_at"], now)
+    ranked = [
+        job for _, job in sorted(
+            enumerate(pending), key=lambda p: queue_key(p[1], served.get(p[1]["user_id"], 0), p[0]),
+        )
+    ]
+    for index, job in enumerate(ranked):
+        if job["id"] == transcription_id:
+            return ranked[:index + 1]
+    return []
+
+
+async def estimate(db: Connection, row) -> dict:
+    """{"queue_position", "expected_start_at", "expected_completion_at"} for a row.
+
+    `row` needs id, status, audio_duration, asr_backend, model and
+    started_at. Times are ISO 8601 UTC, or None when they can't be estimated
+    (finished jobs, no audio durations known at all).
+    """
+    status = row["status"]
+    if status not in ("pending", "processing"):
+        return _empty()
+    await rtf_estimator.load(db)
+    now = datetime.now(timezone.utc)
+
+    if status == "processing":
+        elapsed = seconds_since(row["started_at"])
+        runtime = _runtime(row, None)
+        if elapsed is None or runtime is None:
+            return _empty()
+        started = now - timedelta(seconds=elapsed)
+        # Overrunning jobs are expected to finish any moment, not in the past
+        completion = max(now, started + timedelta(seconds=runtime))
+        return {
+            "queue_position": None,
+            "expected_start_at": _iso(started),
+            "expected_completion_at": _iso(completion),
+        }
+
+    cursor = await db.execute(
+        """SELECT audio_duration, asr_backend, model, started_at FROM transcriptions
+           WHERE status = 'processing' AND lease_expires_at >= ?""",
+        (now.strftime("%Y-%m-%d %H:%M:%S"),),
+    )
+    running = await cursor.fetchall()
+    ahead = await _queue_up_to(db, row["id"])
+    position = len(ahead) or None
+
+    known = [j["audio_duration"] for j in [*running, *ahead] if j["audio_duration"]]
+    fallback = sum(known) / len(known) if known else None
+    own_runtime = _runtime(row, fallback)
+    if own_runtime is None:
+        return _empty(position)
+    running_remaining = [
+        max(0.0, _runtime(j, fallback) - (seconds_since(j["started_at"]) or 0.0)) for j in running
+    ]
+    queued = [_runtime(j, fallback) for j in ahead[:-1]]
+    wait = project_start(running_remaining, queued, settings.ASR_MAX_CONCURRENT)
+    start = now + timedelta(seconds=wait)
+    return {
+        "queue_position": position,
+        "expected_start_at": _iso(start),
+        "expected_completion_at": _iso(start + timedelta(seconds=own_runtime)),
+    }
@@ -0,0 +1,100 @@
+"""Shared HTTP clients for outbound calls, one pooled client per upstream.
+
+Creating an `httpx.AsyncClient` per call throws the connection away each
+time, so every ASR status poll or LLM request paid a fresh TCP (and TLS)
+handshake. Instead each upstream gets one keep-alive client for the life of
+the process: `open_clients()` builds them in the app's lifespan (and in the
+worker), `close_clients()` closes them on shutdown, and `get_client()` hands
+them out. Outside a lifespan (tests, scripts) a client is created on first
+use.
+
+Timeouts set here are defaults; calls that need longer (uploads, LLM
+completions) pass their own `timeout=` per request.
+"""
+import logging
+from dataclasses import dataclass
+
+import httpx
+
+from app.metrics import gauge_set, http_pool_connections
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _Upstream:
+    timeout: httpx.Timeout
+    limits: httpx.Limits
+
+
+UPSTREAMS = {
+    # Many concurrent jobs polling a few hosts: keep plenty of idle connections
+    "asr": _Upstream(
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+    ),
+    # Few, slow requests
+    "llm": _Upstream(
+        timeout=httpx.Timeout(300.0, connect=10.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=5, keepalive_expiry=60),
+    ),
+    # Occasional admin calls (invitations)
+    "idp": _Upstream(
+        timeout=httpx.Timeout(10.0),
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=2, keepalive_expiry=30),
+    ),
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build(upstream: str) -> httpx.AsyncClient:
+    config = UPSTREAMS[upstream]
+
+    async def report(_):
+        report_pool_stats(upstream)
+
+    return httpx.AsyncClient(
+        timeout=config.timeout, limits=config.limits,
+        event_hooks={"request": [report], "response": [report]},
+    )
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    """The shared client for `upstream` ("asr", "llm" or "idp")."""
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _clients[upstream] = _build(upstream)
+    return client
+
+
+def open_clients() -> None:
+    for upstream in UPSTREAMS:
+        get_client(upstream)
+
+
+async def close_clients() -> None:
+    clients = list(_clients.items())
+    _clients.clear()
+    for upstream, client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning("Closing the %s HTTP client failed: %s", upstream, e)
+        report_pool_stats(upstream)
+
+
+def pool_stats(upstream: str) -> tuple[int, int]:
+    """(active, idle) connections held by the upstream's pool."""
+    client = _clients.get(upstream)
+    # httpx has no public pool API; read httpcore's and degrade to zeros
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None) or []
+    idle = sum(1 for c in connections if c.is_idle())
+    return len(connections) - idle, idle
+
+
+def report_pool_stats(upstream: str) -> None:
+    active, idle = pool_stats(upstream)
+    gauge_set(http_pool_connections, active, upstream, "active")
+    gauge_set(http_pool_connections, idle, upstream, "idle")
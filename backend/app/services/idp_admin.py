@@ -3,6 +3,8 @@ from typing import Any
 
 import httpx
 
+from app.services.http_clients import get_client
+
 
 class KeycloakAdminError(Exception):
     """Raised for any non-success response from Keycloak Admin API."""
@@ -28,16 +30,15 @@ class KeycloakAdminClient:
             return self._token
         url = f"{self._base_url}/realms/{self._admin_realm}/protocol/openid-connect/token"
         try:
-            async with httpx.AsyncClient(timeout=10.0) as c:
-                resp = await c.post(
-                    url,
-                    data={
-                        "grant_type": "client_credentials",
-                        "client_id": self._client_id,
-                        "client_secret": self._client_secret,
-                    },
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                )
+            resp = await get_client("idp").post(
+                url,
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self._client_id,
+                    "client_secret": self._client_secret,
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
             if resp.status_code != 200:
                 raise KeycloakAdminError(f"Token acquire failed: {resp.status_code} {resp.text}")
             payload = resp.json()
@@ -62,11 +63,10 @@ class KeycloakAdminClient:
                 "enabled": True,
                 "emailVerified": False,
             }
-            async with httpx.AsyncClient(timeout=10.0) as c:
-                resp = await c.post(
-                    url, json=body,
-                    headers={"Authorization": f"Bearer {token}"},
-                )
+            resp = await get_client("idp").post(
+                url, json=body,
+                headers={"Authorization": f"Bearer {token}"},
+            )
             if resp.status_code == 409:
                 raise KeycloakAdminError(f"User already exists for {email}")
             if resp.status_code != 201:
@@ -93,11 +93,10 @@ class KeycloakAdminClient:
                 f"/users/{user_id}/execute-actions-email"
             )
             params = {"redirect_uri": redirect_uri, "client_id": "account"}
-            async with httpx.AsyncClient(timeout=10.0) as c:
-                resp = await c.put(
-                    url, json=actions, params=params,
-                    headers={"Authorization": f"Bearer {token}"},
-                )
+            resp = await get_client("idp").put(
+                url, json=actions, params=params,
+                headers={"Authorization": f"Bearer {token}"},
+            )
             if resp.status_code not in (200, 204):
                 raise KeycloakAdminError(f"execute-actions-email failed: {resp.status_code} {resp.text}")
         except KeycloakAdminError:
@@ -0,0 +1,406 @@
+"""Durable transcription job queue backed by the `transcriptions` table.
+
+A row is claimable when it is `pending`, or when it is `processing` but its
+lease has lapsed (or was never set, for rows created before leases existed).
+The second case is what makes the queue restart-safe: a worker that dies
+mid-job stops renewing its lease, and the next worker to poll picks the row
+up again and either resumes the ASR job or re-submits it.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable
+
+from aiosqlite import Connection
+
+from app.config import settings
+from app.database import get_db
+from app.metrics import gauge_set, transcription_queue_depth, transcription_queue_users
+from app.services.asr.balancer import unavailable_pools
+from app.services.asr.polling import rtf_estimator
+from app.services.scheduler import pick_next, running_by_pool, running_by_user
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+# How many of the oldest claimable rows the scheduler chooses among per claim.
+_CANDIDATE_WINDOW = 500
+
+_CLAIMABLE = (
+    "(t.status = 'pending' OR (t.status = 'processing' "
+    "AND (t.lease_expires_at IS NULL OR t.lease_expires_at < ?)))"
+)
+
+
+def _fmt(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def seconds_since(timestamp: str | None, now: datetime | None = None) -> float | None:
+    """Seconds elapsed since a SQLite UTC timestamp (until `now`), or None if unparseable."""
+    if not timestamp:
+        return None
+    try:
+        then = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if then.tzinfo is None:
+        then = then.replace(tzinfo=timezone.utc)
+    return max(0.0, ((now or datetime.now(timezone.utc)) - then).total_seconds())
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def claim_next_job(
+    db: Connection, *, worker_id: str, lease_seconds: int | None = None,
+) -> dict | None:
+    """Atomically claim the next job for `worker_id`, as chosen by the scheduler.
+
+    Returns the transcription row joined with its file's `mp3_path` and
+    `content_hash`, or None when nothing is claimable or the scheduler has no
+    free slot. Rows that have already been attempted JOB_MAX_ATTEMPTS times are
+    marked failed instead of being handed out again, so a job that crashes its
+    worker cannot take the queue down with it. Jobs for pools whose ASR
+    circuit breakers are all open stay queued, whatever their attempts: the
+    cut-off waits until their pool takes traffic again. The whole decision runs under
+    one write transaction so concurrent workers cannot overshoot the
+    scheduler's caps.
+    """
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    now_dt = datetime.now(timezone.utc)
+    now = _fmt(now_dt)
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = await db.execute(
+            f"""SELECT t.*, f.mp3_path, f.content_hash FROM transcriptions t
+                LEFT JOIN files f ON f.id = t.file_id
+                WHERE {_CLAIMABLE}
+                ORDER BY t.created_at, t.rowid LIMIT ?""",
+            (now, _CANDIDATE_WINDOW),
+        )
+        blocked = unavailable_pools()
+        candidates = []
+        for row in await cursor.fetchall():
+            attempts = row["attempts"] or 0
+            pool = settings.asr_pool_for_model(row["model"]).name
+            if attempts >= settings.JOB_MAX_ATTEMPTS and pool not in blocked:
+                await db.execute(
+                    """UPDATE transcriptions SET status = 'failed', error_message = ?,
+                       claimed_by = NULL, lease_expires_at = NULL WHERE id = ?""",
+                    (f"Transcription abandoned after {attempts} attempts", row["id"]),
+                )
+                logger.warning("Job %s exceeded %d attempts, marked failed", row["id"], attempts)
+            else:
+                candidate = dict(row)
+                # One clock for all, so jobs from the same second keep arrival order
+                candidate["wait_seconds"] = seconds_since(row["created_at"], now_dt)
+                candidates.append(candidate)
+
+        row = (
+            pick_next(
+                candidates, await running_by_user(db), await running_by_pool(db), blocked,
+            )
+            if candidates else None
+        )
+        if row is None:
+            await db.commit()
+            return None
+
+        attempts = (row["attempts"] or 0) + 1
+        await db.execute(
+            """UPDATE transcriptions SET status = 'processing', claimed_by = ?,
+               lease_expires_at = ?, heartbeat_at = ?, attempts = ?, started_at = ?,
+               stage = NULL, progress = NULL, stage_detail_json = NULL WHERE id = ?""",
+            (worker_id, _fmt(now_dt + timedelta(seconds=lease_seconds)), now,
+             attempts, now, row["id"]),
+        )
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+    job = dict(row)
+    job.pop("wait_seconds", None)
+    job.update(status="processing", claimed_by=worker_id, attempts=attempts)
+    return job
+
+
+async def renew_lease(
+    db: Connection, transcription_id: str, *, worker_id: str, lease_seconds: int | None = None,
+) -> bool:
+    """Extend the lease on a job this worker holds. Returns False if it was lost."""
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    now_dt = datetime.now(timezone.utc)
+    cursor = await db.execute(
+        """UPDATE transcriptions SET lease_expires_at = ?, heartbeat_at = ?
+           WHERE id = ? AND claimed_by = ? AND status = 'processing'""",
+        (_fmt(now_dt + timedelta(seconds=lease_seconds)), _fmt(now_dt),
+         transcription_id, worker_id),
+    )
+    await db.commit()
+    return cursor.rowcount == 1
+
+
+async def release_leases(db: Connection, *, worker_id: str) -> int:
+    """Expire every lease held by `worker_id` so another worker can take over now.
+
+    Used on graceful shutdown: the jobs stay `processing` with their ASR job
+    id, and whoever claims them next resumes instead of waiting out the lease.
+    """
+    cursor = await db.execute(
+        """UPDATE transcriptions SET lease_expires_at = ?
+           WHERE claimed_by = ? AND status = 'processing'""",
+        (_fmt(datetime.now(timezone.utc) - timedelta(seconds=1)), worker_id),
+    )
+    await db.commit()
+    return cursor.rowcount
+
+
+async def requeue_job(db: Connection, transcription_id: str, *, count_attempt: bool = True) -> bool:
+    """Put a processing job back in the queue, keeping its place and ASR job id.
+
+    With `count_attempt=False` the attempt does not count towards
+    JOB_MAX_ATTEMPTS (the job never reached the ASR backend). Returns False
+    if the row is no longer processing (cancelled or deleted).
+    """
+    cursor = await db.execute(
+        """UPDATE transcriptions SET status = 'pending', claimed_by = NULL,
+           lease_expires_at = NULL, attempts = MAX(0, attempts - ?)
+           WHERE id = ? AND status = 'processing'""",
+        (0 if count_attempt else 1, transcription_id),
+    )
+    await db.commit()
+    return cursor.rowcount == 1
+
+
+async def claim_slot(
+    db: Connection, slot_id: str, *, user_id: str, model: str | None, lease_seconds: int | None = None,
+) -> bool:
+    """Take a scheduler slot for ASR work that doesn't go through the queue.
+
+    The slot counts against the same caps as a running job (global, per user,
+    per pool) until it is released or its lease lapses. Returns False,
+    holding nothing, when the caps leave no room.
+    """
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    now_dt = datetime.now(timezone.utc)
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        # Slots of a process that died without releasing them
+        await db.execute("DELETE FROM asr_slots WHERE lease_expires_at < ?", (_fmt(now_dt),))
+        job = {"user_id": user_id, "model": model}
+        if pick_next([job], await running_by_user(db), await running_by_pool(db)) is None:
+            await db.commit()
+            return False
+        await db.execute(
+            "INSERT INTO asr_slots (id, user_id, model, lease_expires_at) VALUES (?, ?, ?, ?)",
+            (slot_id, user_id, model, _fmt(now_dt + timedelta(seconds=lease_seconds))),
+        )
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    return True
+
+
+async def renew_slot(db: Connection, slot_id: str, *, lease_seconds: int | None = None) -> bool:
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    cursor = await db.execute(
+        "UPDATE asr_slots SET lease_expires_at = ? WHERE id = ?",
+        (_fmt(datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)), slot_id),
+    )
+    await db.commit()
+    return cursor.rowcount == 1
+
+
+async def release_slot(db: Connection, slot_id: str) -> None:
+    await db.execute("DELETE FROM asr_slots WHERE id = ?", (slot_id,))
+    await db.commit()
+
+
+@asynccontextmanager
+async def asr_slot(user_id: str, model: str | None) -> AsyncIterator[bool]:
+    """Hold a scheduler slot (see `claim_slot`) for the duration of the block.
+
+    Yields whether one was granted. The lease is renewed every third of
+    JOB_LEASE_SECONDS while held; on release, this process's worker is woken
+    so a queued job can take the slot.
+    """
+    slot_id = str(uuid.uuid4())
+    async with get_db() as db:
+        granted = await claim_slot(db, slot_id, user_id=user_id, model=model)
+    if not granted:
+        yield False
+        return
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(max(1.0, settings.JOB_LEASE_SECONDS / 3))
+            try:
+                async with get_db() as db:
+                    await renew_slot(db, slot_id)
+            except Exception as e:
+                logger.warning("Renewing ASR slot %s failed: %s", slot_id, e)
+
+    renewing = asyncio.create_task(heartbeat())
+    try:
+        yield True
+    finally:
+        renewing.cancel()
+        async with get_db() as db:
+            await release_slot(db, slot_id)
+        notify_new_job()
+
+
+async def queue_stats(db: Connection) -> tuple[int, int]:
+    """Return (pending jobs, distinct users with pending jobs)."""
+    cursor = await db.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT user_id) FROM transcriptions WHERE status = 'pending'",
+    )
+    row = await cursor.fetchone()
+    return row[0], row[1]
+
+
+class JobWorker:
+    """Claims jobs from the queue and runs them with a bounded number of tasks.
+
+    JOB_WORKER_CONCURRENCY bounds this process's tasks; how many of them may be
+    in the ASR phase at once is the scheduler's call (see app.services.scheduler).
+
+    Each running job gets a heartbeat task that renews its lease every third of
+    the lease period. `notify()` wakes the claim loop immediately; otherwise it
+    re-checks the table every JOB_POLL_INTERVAL_SECONDS, which is also how it
+    discovers work enqueued by another process.
+    """
+
+    def __init__(
+        self, handler: JobHandler, *,
+        concurrency: int | None = None, worker_id: str | None = None,
+    ) -> None:
+        self._handler = handler
+        self._concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.worker_id = worker_id or default_worker_id()
+        self._wake = asyncio.Event()
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._loop_task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> set[str]:
+        return set(self._tasks)
+
+    def start(self) -> None:
+        global _active_worker
+        _active_worker = self
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        global _active_worker
+        if _active_worker is self:
+            _active_worker = None
+        if self._loop_task:
+            self._loop_task.cancel()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            async with get_db() as db:
+                await release_leases(db, worker_id=self.worker_id)
+        except Exception as e:
+            logger.warning("Releasing leases for %s failed: %s", self.worker_id, e)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def cancel(self, transcription_id: str) -> bool:
+        """Cancel the task running this job here. Returns False if it isn't ours."""
+        task = self._tasks.get(transcription_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def run_once(self) -> int:
+        """Claim jobs until the queue is empty or all slots are busy."""
+        claimed = 0
+        while len(self._tasks) < self._concurrency:
+            async with get_db() as db:
+                job = await claim_next_job(db, worker_id=self.worker_id)
+            if job is None:
+                break
+            self._spawn(job)
+            claimed += 1
+        async with get_db() as db:
+            depth, users = await queue_stats(db)
+            # Pick up realtime factors observed by other workers for scheduling
+            await rtf_estimator.load(db)
+        gauge_set(transcription_queue_depth, depth)
+        gauge_set(transcription_queue_users, users)
+        return claimed
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Job queue poll failed: %s: %s", type(e).__name__, e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _spawn(self, job: dict) -> None:
+        self._tasks[job["id"]] = asyncio.create_task(self._run_job(job))
+
+    async def _run_job(self, job: dict) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            await self._handler(job)
+        except Exception:
+            logger.exception("Job %s raised out of its handler", job["id"])
+        finally:
+            heartbeat.cancel()
+            self._tasks.pop(job["id"], None)
+            self._wake.set()
+
+    async def _heartbeat(self, transcription_id: str) -> None:
+        interval = max(1.0, settings.JOB_LEASE_SECONDS / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with get_db() as db:
+                    held = await renew_lease(db, transcription_id, worker_id=self.worker_id)
+                if not held:
+                    # Cancelled through another process, or re-claimed after
+                    # a stall: either way this copy must stop.
+                    logger.warning("Lost lease on job %s, stopping it", transcription_id)
+                    self.cancel(transcription_id)
+                    return
+            except Exception as e:
+                logger.warning("Heartbeat for %s failed: %s", transcription_id, e)
+
+
+_active_worker: JobWorker | None = None
+
+
+def notify_new_job() -> None:
+    """Wake this process's worker, if it runs one, so new jobs start at once."""
+    if _active_worker is not None:
+        _active_worker.notify()
+
+
+def cancel_local_job(transcription_id: str) -> bool:
+    """Cancel the job's task if this process runs it.
+
+    Workers in other processes notice at their next heartbeat, when renewing
+    the lease of a no-longer-processing row fails.
+    """
+    return _active_worker is not None and _active_worker.cancel(transcription_id)
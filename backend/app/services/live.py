@@ -0,0 +1,118 @@
+"""Live transcription sessions (see routers/live.py).
+
+The recorder streams MediaRecorder chunks (WebM/Opus) while it records. A
+`LiveSession` appends them to one file, hashing as it goes, and feeds them
+to a `StreamDecoder` that keeps a PCM copy of the audio. The router calls
+`advance()` every LIVE_INTERVAL_SECONDS to transcribe the "window": the
+audio after the last final utterance, cut from the PCM copy. Utterances ending at least
+LIVE_FINALIZE_SECONDS before the end of the window won't change with more
+context, so they become final and the window moves past them. The rest are
+partial and are transcribed again on the next pass. A window that grows
+past LIVE_MAX_WINDOW_SECONDS (long speech without a pause) finalizes all
+but its last utterance, so passes stay short.
+
+When the stream stops, a last pass finalizes everything, and the recording
+is stored like an upload with a completed transcription.
+"""
+import hashlib
+import time
+
+from app.config import settings
+from app.metrics import observe, live_window_duration_seconds
+from app.models import Utterance
+from app.services import storage
+from app.services.asr.live import LiveTranscriber
+from app.services.audio import StreamDecoder
+
+
+class LiveSession:
+    def __init__(self, transcriber: LiveTranscriber, *, backend_name: str, ext: str, max_bytes: int) -> None:
+        self.transcriber = transcriber
+        self.backend_name = backend_name
+        self.ext = ext
+        self.max_bytes = max_bytes
+        self.path = storage.incoming_path(ext)
+        self._file = open(self.path, "wb")
+        self._digest = hashlib.sha256()
+        self._decoder = StreamDecoder(storage.incoming_path(".pcm"))
+        self.size = 0
+        self._transcribed_size = 0
+        self.final: list[Utterance] = []
+        self.partial: list[Utterance] = []
+        # Audio before this point (ms) is covered by final utterances
+        self.final_until_ms = 0
+        self.duration: float | None = None
+
+    async def append(self, chunk: bytes) -> None:
+        """Write a chunk of the recording. Raises UploadTooLargeError past `max_bytes`."""
+        if self.size + len(chunk) > self.max_bytes:
+            raise storage.UploadTooLargeError(f"Recording exceeds {self.max_bytes} bytes")
+        self._file.write(chunk)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        await self._decoder.feed(chunk)
+
+    @property
+    def has_new_audio(self) -> bool:
+        return self.size > self._transcribed_size
+
+    async def advance(self, *, final: bool = False) -> list[Utterance]:
+        """Transcribe the current window; return the utterances that became final.
+
+        `partial` is replaced with the window's unfinished utterances. With
+        `final`, everything transcribed is final.
+        """
+        self._transcribed_size = self.size
+        if final:
+            await self._decoder.finish()
+        offset = self.final_until_ms
+        window_path = storage.incoming_path(".wav")
+        try:
+            seconds = self._decoder.write_wav(window_path, offset / 1000)
+            if not seconds:
+                self.partial = []
+                return []
+            start = time.monotonic()
+            utterances = await self.transcriber.transcribe(window_path, seconds)
+            observe(live_window_duration_seconds, time.monotonic() - start, self.backend_name)
+        finally:
+            storage.discard(window_path)
+
+        self.duration = offset / 1000 + seconds
+        shifted = sorted(
+            (u.model_copy(update={"start": u.start + offset, "end": u.end + offset}) for u in utterances),
+            key=lambda u: u.start,
+        )
+        window_end = offset + int(seconds * 1000)
+        if final:
+            cutoff = window_end
+        elif seconds >= settings.LIVE_MAX_WINDOW_SECONDS and shifted:
+            cutoff = shifted[-1].start
+        else:
+            cutoff = window_end - int(settings.LIVE_FINALIZE_SECONDS * 1000)
+
+        # Only a prefix can be final: the window restarts after its last utterance
+        done = []
+        for u in shifted:
+            if u.end > cutoff:
+                break
+            done.append(u)
+        self.partial = shifted[len(done):]
+        if done:
+            self.final_until_ms = max(u.end for u in done)
+        elif not shifted and cutoff > offset:
+            # Nothing said: don't transcribe this silence again
+            self.final_until_ms = cutoff
+        self.final.extend(done)
+        return done
+
+    async def close(self) -> tuple[str, int, str]:
+        """Finish writing; returns (path, size, sha256 hex) for storage."""
+        self._file.close()
+        await self._decoder.close()
+        return self.path, self.size, self._digest.hexdigest()
+
+    async def discard(self) -> None:
+        self._file.close()
+        await self._decoder.close()
+        storage.discard(self.path)
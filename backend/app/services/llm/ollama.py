@@ -1,9 +1,8 @@
 import json
 
-import httpx
-
 from app.config import settings
 from app.metrics import track_llm_tokens
+from app.services.http_clients import get_client
 from app.services.llm.base import LLMProvider
 from app.services.llm.prompt import REFINEMENT_CONSOLIDATION_PROMPT
 
@@ -14,23 +13,22 @@ class OllamaProvider(LLMProvider):
         self._model = settings.LLM_MODEL or "llama3"
 
     async def _chat(self, system: str, user: str, operation: str = "analysis") -> str:
-        async with httpx.AsyncClient(timeout=300) as client:
-            response = await client.post(
-                f"{self._base_url}/api/chat",
-                json={
-                    "model": self._model,
-                    "messages": [
-                        {"role": "system", "content": system},
-                        {"role": "user", "content": user},
-                    ],
-                    "stream": False,
-                    "format": "json",
-                },
-            )
-            response.raise_for_status()
-            payload = response.json()
-            track_llm_tokens("ollama", self._model, operation, payload)
-            return payload["message"]["content"]
+        response = await get_client("llm").post(
+            f"{self._base_url}/api/chat",
+            json={
+                "model": self._model,
+                "messages": [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+                "stream": False,
+                "format": "json",
+            },
+        )
+        response.raise_for_status()
+        payload = response.json()
+        track_llm_tokens("ollama", self._model, operation, payload)
+        return payload["message"]["content"]
 
     async def _json_chat(self, system: str, user: str, operation: str) -> dict:
         return json.loads(await self._chat(system, user, operation))
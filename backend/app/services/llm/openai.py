@@ -4,6 +4,7 @@ from openai import AsyncOpenAI
 
 from app.config import settings
 from app.metrics import track_llm_tokens
+from app.services.http_clients import get_client
 from app.services.llm.base import LLMProvider
 from app.services.llm.prompt import REFINEMENT_CONSOLIDATION_PROMPT
 
@@ -13,6 +14,7 @@ class OpenAIProvider(LLMProvider):
         self._client = AsyncOpenAI(
             api_key=settings.LLM_API_KEY,
             base_url=settings.LLM_BASE_URL or None,
+            http_client=get_client("llm"),
         )
         self._model = settings.LLM_MODEL or "gpt-4o"
 
@@ -0,0 +1,66 @@
+"""Utterances finalized while a transcription is still running.
+
+Segmented transcriptions (asr/segmented.py) settle the start of a recording
+long before the end: once a segment and every one before it are done, its
+utterances won't change. The pipeline appends each such batch here, in
+order, so `GET /api/transcription/{id}?partial=true` can serve them and the
+status WebSocket can announce them while the rest is processed.
+
+The store is append-only per transcription. It is cleared when a run starts
+over and when the full result is stored; cleanup drops whatever is left for
+jobs that are no longer running.
+"""
+import json
+from datetime import datetime, timezone
+
+from aiosqlite import Connection
+
+from app.models import Utterance
+
+
+async def append(db: Connection, transcription_id: str, utterances: list[Utterance]) -> None:
+    """Add the next batch of final utterances (on the original timeline)."""
+    if not utterances:
+        return
+    await db.execute(
+        """INSERT INTO partial_results
+           (transcription_id, seq, utterances_json, utterance_count, end_ms, created_at)
+           SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ?
+           FROM partial_results WHERE transcription_id = ?""",
+        (transcription_id, json.dumps([u.model_dump() for u in utterances]), len(utterances),
+         max(u.end for u in utterances), datetime.now(timezone.utc).isoformat(), transcription_id),
+    )
+    await db.commit()
+
+
+async def load(db: Connection, transcription_id: str) -> list[Utterance]:
+    cursor = await db.execute(
+        "SELECT utterances_json FROM partial_results WHERE transcription_id = ? ORDER BY seq",
+        (transcription_id,),
+    )
+    return [Utterance(**u) for row in await cursor.fetchall() for u in json.loads(row[0])]
+
+
+async def summary(db: Connection, transcription_id: str) -> dict:
+    """{"utterances": count so far, "until_ms": end of the last one (or None)}."""
+    cursor = await db.execute(
+        """SELECT COALESCE(SUM(utterance_count), 0), MAX(end_ms)
+           FROM partial_results WHERE transcription_id = ?""",
+        (transcription_id,),
+    )
+    count, until = await cursor.fetchone()
+    return {"utterances": count, "until_ms": until}
+
+
+async def clear(db: Connection, transcription_id: str) -> None:
+    """Drop the partial results; the caller commits."""
+    await db.execute("DELETE FROM partial_results WHERE transcription_id = ?", (transcription_id,))
+
+
+async def drop_stale(db: Connection) -> int:
+    """Remove partial results of jobs that are no longer pending or running; the caller commits."""
+    cursor = await db.execute(
+        """DELETE FROM partial_results WHERE transcription_id NOT IN
+           (SELECT id FROM transcriptions WHERE status IN ('pending', 'processing'))"""
+    )
+    return cursor.rowcount
@@ -0,0 +1,473 @@
+"""Transcription orchestration: everything that happens to a job after it is claimed.
+
+Runs inside whichever process hosts a JobWorker — the API server by default,
+or a dedicated `python -m app.worker` process when JOB_WORKER_ENABLED=false
+on the API tier.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import traceback
+from datetime import datetime, timezone
+
+from app.config import settings
+from app.database import get_db
+from app.models import TranscriptionResult, TranscriptionSettings as TranscriptionSettingsModel
+from app.services.asr import callbacks, get_asr_backend
+from app.services.asr.balancer import is_outage, is_transient
+from app.services.asr.base import TranscriptionSettings
+from app.services.asr import result_cache
+from app.services.asr.polling import AdaptivePolling, rtf_estimator
+from app.services.asr.segmented import segmenting_enabled, transcribe_segmented
+from app.services.audio import (
+    SpeechMap, compact_audio, detect_silences, get_media_duration, speech_regions,
+)
+from app.services.job_queue import requeue_job, seconds_since
+from app.services import partial_results
+from app.services import progress as stages
+from app.services.progress import JobProgress
+from app.services.scheduler import DEFAULT_PRIORITY_CLASS
+from app.metrics import (
+    inc, observe, gauge_inc, gauge_dec,
+    transcriptions_total, transcription_duration_seconds, active_transcriptions,
+    transcription_audio_duration_seconds, transcription_realtime_factor,
+    transcription_queue_wait_seconds, transcription_asr_polls, transcription_segments,
+    transcription_trimmed_audio_seconds,
+    diarization_speakers_total, errors_total, transcriptions_held_total,
+)
+
+# Longest a finished transcription waits for its title
+_TITLE_TIMEOUT_SECONDS = 60
+
+
+async def run_transcription_job(job: dict) -> None:
+    """Job-queue handler: rebuild the request from a claimed row and run it.
+
+    A row that already carries an `asr_job_id` was orphaned mid-run (worker
+    restart or crash); backends that keep jobs server-side resume polling that
+    job instead of paying for a second ASR pass.
+    """
+    req = TranscriptionSettingsModel(
+        file_id=job["file_id"], language=job["language"], model=job["model"] or "base",
+        min_speakers=job["min_speakers"] or 0, max_speakers=job["max_speakers"] or 0,
+        initial_prompt=job["initial_prompt"], hotwords=job["hotwords"],
+    )
+    if not job.get("mp3_path"):
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE transcriptions SET status = ?, error_message = ? WHERE id = ?",
+                ("failed", "Source file no longer exists", job["id"]),
+            )
+            await db.commit()
+        return
+    queue_wait = seconds_since(job["created_at"]) if job["attempts"] == 1 else None
+    speech_map = job.get("speech_map_json")
+    await _run_transcription(
+        job["id"], job["mp3_path"], req, queue_wait, resume_asr_job_id=job["asr_job_id"],
+        priority=job.get("priority_class") or DEFAULT_PRIORITY_CLASS,
+        audio_duration=job.get("audio_duration"),
+        speech_map=SpeechMap.from_json(speech_map) if speech_map else None,
+        content_hash=job.get("content_hash"), user_id=job["user_id"],
+    )
+
+
+async def _run_transcription(
+    transcription_id: str, file_path: str, req: TranscriptionSettingsModel,
+    queue_wait: float | None, resume_asr_job_id: str | None = None,
+    priority: str = DEFAULT_PRIORITY_CLASS, audio_duration: float | None = None,
+    speech_map: SpeechMap | None = None, content_hash: str | None = None, *, user_id: str,
+):
+    backend = get_asr_backend(req.model)
+    backend_name = settings.ASR_BACKEND
+    ts = TranscriptionSettings(
+        language=req.language, model=req.model,
+        min_speakers=req.min_speakers, max_speakers=req.max_speakers,
+        initial_prompt=req.initial_prompt, hotwords=req.hotwords,
+    )
+
+    if queue_wait is not None:
+        observe(transcription_queue_wait_seconds, queue_wait, backend_name, priority)
+    gauge_inc(active_transcriptions)
+    start_time = time.monotonic()
+
+    if audio_duration is None:
+        try:
+            audio_duration = await asyncio.wait_for(get_media_duration(file_path), timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            audio_duration = None
+    if audio_duration is not None:
+        observe(transcription_audio_duration_seconds, audio_duration, backend_name)
+
+    # Every ASR job submitted for this transcription, for cancellation
+    asr_job_ids: list[str] = []
+    progress = JobProgress(transcription_id)
+    resumed = bool(resume_asr_job_id and backend.resumable)
+    use_cache = bool(content_hash) and result_cache.cache_enabled()
+    cached = None
+    try:
+        if use_cache and not resumed:
+            async with get_db() as db:
+                cached = await result_cache.lookup(db, content_hash, backend_name, ts)
+        if cached is not None:
+            # Same audio, same settings: no need to ask the ASR backend again
+            result = TranscriptionResult(id=transcription_id, status="completed", utterances=cached)
+            whole = False
+            logging.info("Transcription %s served from the ASR result cache", transcription_id)
+        else:
+            result, whole = await _transcribe(
+                backend, transcription_id, file_path, ts, audio_duration,
+                resume_asr_job_id=resume_asr_job_id if resumed else None,
+                speech_map=speech_map, job_ids=asr_job_ids, progress=progress, user_id=user_id,
+            )
+            if use_cache:
+                await _cache_result(content_hash, backend_name, ts, result)
+
+        duration = time.monotonic() - start_time
+        lang_label = req.language or "auto"
+        model_label = req.model or "default"
+        cache_label = "true" if cached is not None else "false"
+        inc(transcriptions_total, backend_name, lang_label, model_label, "completed", cache_label)
+        if cached is None:
+            # Cache hits say nothing about ASR speed
+            observe(transcription_duration_seconds, duration, backend_name, lang_label, model_label)
+            # Only a plain run over the whole file says how fast ASR is on it;
+            # segments run side by side and trimmed audio is shorter
+            if whole and audio_duration and audio_duration > 0 and not resumed:
+                rtf = duration / audio_duration
+                observe(transcription_realtime_factor, rtf, backend_name, model_label)
+                rtf_estimator.observe(backend_name, model_label, rtf)
+                await _persist_rtf(backend_name, model_label, rtf)
+
+        speakers = {u.speaker for u in result.utterances if u.speaker}
+        if speakers:
+            inc(diarization_speakers_total, str(min(len(speakers), 20)))
+
+        # Titled before completing, so the result arrives with its title
+        title = await _generate_title(transcription_id, result, progress)
+        async with get_db() as db:
+            await partial_results.clear(db, transcription_id)
+            cursor = await db.execute(
+                """UPDATE transcriptions SET status = ?, result_json = ?, completed_at = ?,
+                   title = COALESCE(?, title), stage = NULL, progress = NULL, stage_detail_json = NULL
+                   WHERE id = ? AND status = 'processing'""",
+                ("completed", json.dumps([u.model_dump() for u in result.utterances]),
+                 datetime.now(timezone.utc).isoformat(), title, transcription_id),
+            )
+            await db.commit()
+        if cursor.rowcount == 0:
+            logging.info("Transcription %s was cancelled before its result was stored", transcription_id)
+
+    except asyncio.CancelledError:
+        # Cancelled by the user, or by a worker shutting down. Only the former
+        # should stop the ASR job; after a shutdown it is resumed elsewhere.
+        if await _is_cancelled(transcription_id):
+            await _cancel_asr_jobs(backend, asr_job_ids, transcription_id)
+        raise
+    except Exception as e:
+        if is_transient(e):
+            # The ASR backend is down or flaky, not this job: wait in the queue
+            await _hold(transcription_id, e)
+            return
+        logging.error("Transcription %s failed: %s: %s", transcription_id, type(e).__name__, e)
+        logging.error("Traceback: %s", traceback.format_exc())
+        inc(transcriptions_total, backend_name, req.language or "auto", req.model or "default", "failed", "false")
+        inc(errors_total, "transcription_failed", "asr")
+
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE transcriptions SET status = ?, error_message = ? WHERE id = ? AND status = 'processing'",
+                ("failed", str(e), transcription_id),
+            )
+            await db.commit()
+    finally:
+        gauge_dec(active_transcriptions)
+
+
+async def _transcribe(
+    backend, transcription_id: str, file_path: str, ts: TranscriptionSettings,
+    audio_duration: float | None, *, resume_asr_job_id: str | None,
+    speech_map: SpeechMap | None, job_ids: list[str], progress: JobProgress, user_id: str,
+) -> tuple[TranscriptionResult, bool]:
+    """Get the result from ASR: trimmed or not, whole or segmented, fresh or resumed.
+
+    Utterances come back on the original file's timeline. The flag is True
+    when the untrimmed file went to ASR in one piece.
+    """
+    # What is actually sent to ASR: the original, or a silence-trimmed copy
+    submit_path, submit_duration = file_path, audio_duration
+    wake = None
+    try:
+        if not resume_asr_job_id:
+            speech_map = None
+            if settings.ASR_TRIM_SILENCE and audio_duration:
+                await progress.stage(stages.CONVERTING)
+                trimmed = await _trim_silence(transcription_id, file_path, audio_duration)
+                if trimmed is not None:
+                    submit_path, speech_map = trimmed
+                    submit_duration = speech_map.kept_seconds
+                    inc(transcription_trimmed_audio_seconds, settings.ASR_BACKEND,
+                        amount=audio_duration - submit_duration)
+        elif speech_map is not None:
+            # The resumed ASR job was submitted with the trimmed audio
+            submit_duration = speech_map.kept_seconds
+        segmented = not resume_asr_job_id and segmenting_enabled(submit_duration)
+        if not segmented and callbacks.callbacks_enabled() and backend.supports_callbacks is True:
+            wake = callbacks.register(transcription_id)
+        if segmented:
+            # Parts run side by side, so expect a fraction of the whole
+            expected = rtf_estimator.expected_seconds(settings.ASR_BACKEND, ts.model or "default", submit_duration)
+            await progress.stage(
+                stages.TRANSCRIBING, expected_seconds=expected / max(1, settings.ASR_SEGMENT_MAX_PARALLEL),
+            )
+            # A retried run starts over, and so do its partial results
+            async with get_db() as db:
+                await partial_results.clear(db, transcription_id)
+                await db.commit()
+
+            async def publish(utterances):
+                await _publish_partial(transcription_id, speech_map, utterances)
+
+            result, segment_count = await transcribe_segmented(
+                backend, submit_path, ts, submit_duration, user_id=user_id,
+                work_dir=os.path.join(settings.TEMP_PATH, "segments", transcription_id),
+                job_ids=job_ids, on_utterances=publish,
+            )
+            observe(transcription_segments, segment_count, settings.ASR_BACKEND)
+        else:
+            result = await _transcribe_whole(
+                backend, transcription_id, submit_path, ts, submit_duration,
+                resume_asr_job_id=resume_asr_job_id, wake=wake, job_ids=job_ids,
+                progress=progress,
+            )
+        if speech_map is not None:
+            result.utterances = speech_map.remap(result.utterances)
+        return result, not segmented and speech_map is None
+    finally:
+        if wake is not None:
+            callbacks.unregister(transcription_id)
+        if submit_path != file_path:
+            try:
+                os.unlink(submit_path)
+            except OSError:
+                pass
+
+
+async def _cache_result(content_hash: str, backend_name: str, ts: TranscriptionSettings, result) -> None:
+    # A full or broken cache must never fail the transcription itself
+    try:
+        async with get_db() as db:
+            await result_cache.store(db, content_hash, backend_name, ts, result.utterances)
+    except Exception as e:
+        logging.warning("Caching the ASR result for %s failed: %s", content_hash, e)
+
+
+async def _publish_partial(
+    transcription_id: str, speech_map: SpeechMap | None, utterances: list,
+) -> None:
+    # Partial results are a preview; losing one must not fail the job
+    if speech_map is not None:
+        utterances = speech_map.remap(utterances)
+    try:
+        async with get_db() as db:
+            await partial_results.append(db, transcription_id, utterances)
+    except Exception as e:
+        logging.warning("Storing partial results for %s failed: %s", transcription_id, e)
+
+
+async def _persist_rtf(backend_name: str, model: str, rtf: float) -> None:
+    # Only feeds estimates; the local average is already updated
+    try:
+        async with get_db() as db:
+            await rtf_estimator.persist(db, backend_name, model, rtf)
+    except Exception as e:
+        logging.warning("Storing the realtime factor for %s/%s failed: %s", backend_name, model, e)
+
+
+async def _trim_silence(
+    transcription_id: str, file_path: str, duration: float,
+) -> tuple[str, SpeechMap] | None:
+    """Write a copy of the audio with long silences cut out.
+
+    Returns (path, map back to the original) and records the map on the row
+    so a resumed job can still remap its result, or None when there is too
+    little silence to bother or trimming fails (the original is used then).
+    """
+    try:
+        silences = await detect_silences(
+            file_path, noise_db=settings.ASR_SILENCE_NOISE_DB,
+            min_silence=settings.ASR_TRIM_MIN_SILENCE_SECONDS, duration=duration,
+        )
+        speech_map = SpeechMap(speech_regions(duration, silences, padding=settings.ASR_TRIM_PADDING_SECONDS))
+        if not speech_map.regions or duration - speech_map.kept_seconds < settings.ASR_TRIM_MIN_SAVED_SECONDS:
+            return None
+        trimmed_dir = os.path.join(settings.TEMP_PATH, "trimmed")
+        os.makedirs(trimmed_dir, exist_ok=True)
+        path = await compact_audio(file_path, os.path.join(trimmed_dir, f"{transcription_id}.mp3"), speech_map.regions)
+    except Exception as e:
+        logging.warning("Silence trimming failed for %s, sending full audio: %s", transcription_id, e)
+        return None
+    async with get_db() as db:
+        await db.execute(
+            "UPDATE transcriptions SET speech_map_json = ? WHERE id = ?",
+            (speech_map.to_json(), transcription_id),
+        )
+        await db.commit()
+    logging.info(
+        "Trimmed %.0fs of silence from %s (%.0fs kept)",
+        duration - speech_map.kept_seconds, transcription_id, speech_map.kept_seconds,
+    )
+    return path, speech_map
+
+
+async def _transcribe_whole(
+    backend, transcription_id: str, file_path: str, ts: TranscriptionSettings,
+    audio_duration: float | None, *, resume_asr_job_id: str | None,
+    wake: asyncio.Event | None, job_ids: list[str], progress: JobProgress,
+) -> TranscriptionResult:
+    """Run the file as a single ASR job (or resume one) and return its result.
+
+    `wake` is the callback event when webhooks are in use, else None.
+    """
+    expected = rtf_estimator.expected_seconds(settings.ASR_BACKEND, ts.model or "default", audio_duration)
+    if resume_asr_job_id:
+        asr_job_id = resume_asr_job_id
+        job_ids.append(asr_job_id)
+        logging.info("Resuming transcription %s on ASR job %s", transcription_id, asr_job_id)
+    else:
+        if wake is not None:
+            # Clear state from any earlier attempt first: the webhook can
+            # arrive before submit() has even returned for short files.
+            async with get_db() as db:
+                await db.execute(
+                    "UPDATE transcriptions SET asr_job_id = NULL, asr_callback_status = NULL WHERE id = ?",
+                    (transcription_id,),
+                )
+                await db.commit()
+        await progress.stage(stages.UPLOADING, 0.0, bytes_sent=0, bytes_total=_file_size(file_path))
+        if wake is not None:
+            asr_job_id = await backend.submit(
+                file_path, ts, callback=callbacks.build_callback(transcription_id), audio_seconds=audio_duration,
+                on_progress=progress.upload,
+            )
+        else:
+            asr_job_id = await backend.submit(
+                file_path, ts, audio_seconds=audio_duration, on_progress=progress.upload,
+            )
+        job_ids.append(asr_job_id)
+
+        async with get_db() as db:
+            await db.execute("UPDATE transcriptions SET asr_job_id = ? WHERE id = ?", (asr_job_id, transcription_id))
+            await db.commit()
+
+    await progress.stage(stages.TRANSCRIBING, expected_seconds=expected)
+    if wake is not None:
+        # The webhook is the primary signal; polling is only a safety net
+        fallback = settings.ASR_CALLBACK_FALLBACK_POLL_SECONDS
+        strategy = AdaptivePolling(min_delay=fallback, max_delay=fallback * 4)
+    else:
+        strategy = backend.polling_strategy()
+    polls = 0
+    for delay in strategy.delays(expected):
+        if wake is not None:
+            if await _wait_for_callback(transcription_id, wake, delay) == "completed":
+                break
+        else:
+            await asyncio.sleep(delay)
+        status = await backend.get_status(asr_job_id)
+        polls += 1
+        if status.status == "completed":
+            break
+        elif status.status == "failed":
+            raise RuntimeError(status.error or "Transcription failed")
+        await progress.reported(status.progress)
+    observe(transcription_asr_polls, polls, settings.ASR_BACKEND)
+
+    return await backend.get_result(asr_job_id)
+
+
+async def _hold(transcription_id: str, error: Exception) -> None:
+    """Return a job that hit an unreachable ASR backend to the queue.
+
+    While the backend is down (breakers open, connections refused) the
+    attempt is not counted. Other transient failures count
+    towards JOB_MAX_ATTEMPTS, so a job that keeps failing the same way
+    against a healthy backend is still given up eventually.
+    """
+    outage = is_outage(error)
+    logging.warning(
+        "ASR backend unavailable for transcription %s, returning it to the queue: %s: %s",
+        transcription_id, type(error).__name__, error,
+    )
+    inc(transcriptions_held_total, "breaker_open" if outage else "transient_error")
+    async with get_db() as db:
+        await requeue_job(db, transcription_id, count_attempt=not outage)
+
+
+def _file_size(path: str) -> int | None:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+async def _generate_title(transcription_id: str, result: TranscriptionResult, progress: JobProgress) -> str | None:
+    """A title from the LLM, if one is configured. Failures only cost the title."""
+    try:
+        from app.services.llm import get_llm_provider
+        provider = get_llm_provider()
+        if not provider or not result.utterances:
+            return None
+        await progress.stage(stages.GENERATING_TITLE)
+        transcript_text = " ".join(u.text for u in result.utterances)
+        return await asyncio.wait_for(provider.generate_title(transcript_text), timeout=_TITLE_TIMEOUT_SECONDS) or None
+    except Exception as e:
+        logging.warning("Title generation failed for %s: %s", transcription_id, e)
+        return None
+
+
+async def _is_cancelled(transcription_id: str) -> bool:
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status FROM transcriptions WHERE id = ?", (transcription_id,))
+        row = await cursor.fetchone()
+    # A deleted row is as good as cancelled
+    return row is None or row["status"] == "cancelled"
+
+
+async def _cancel_asr_jobs(backend, asr_job_ids: list[str], transcription_id: str) -> None:
+    # Jobs still in submit() have no id yet; cancelling the task already
+    # aborted their upload.
+    for asr_job_id in asr_job_ids:
+        try:
+            await backend.cancel(asr_job_id)
+            logging.info("Cancelled ASR job %s for transcription %s", asr_job_id, transcription_id)
+        except Exception as e:
+            logging.warning("Cancelling ASR job %s failed: %s", asr_job_id, e)
+
+
+async def _wait_for_callback(transcription_id: str, wake: asyncio.Event, timeout: float) -> str | None:
+    """Wait up to `timeout` for the job's webhook; return the status it reported.
+
+    The local event fires when the callback lands in this process. When the
+    API and the worker are separate processes it lands elsewhere, so the row
+    is also re-read every JOB_POLL_INTERVAL_SECONDS — a local SQLite read,
+    far cheaper than an ASR status request.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        remaining = deadline - loop.time()
+        await callbacks.sleep_or_wake(wake, max(0.0, min(remaining, settings.JOB_POLL_INTERVAL_SECONDS)))
+        status = await _callback_status(transcription_id)
+        if status or remaining <= settings.JOB_POLL_INTERVAL_SECONDS:
+            return status
+
+
+async def _callback_status(transcription_id: str) -> str | None:
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT asr_callback_status FROM transcriptions WHERE id = ?", (transcription_id,),
+        )
+        row = await cursor.fetchone()
+    return row["asr_callback_status"] if row else None
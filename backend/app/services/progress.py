@@ -0,0 +1,110 @@
+"""Stage and progress reporting for transcriptions.
+
+While a job runs, the pipeline records its stage on the transcriptions row:
+`converting` (silence trimming), `uploading` (bytes sent to ASR),
+`transcribing`, then `generating_title`. A pending job is `queued`, and its
+position is computed when read. `describe()` turns a row into what the
+status endpoint and the WebSocket report.
+
+The transcribing percentage comes from the backend when it reports one.
+Otherwise it is estimated when read, from the time spent transcribing over
+the expected time (audio length x the model's observed realtime factor). So
+a long job keeps moving without the worker writing the row every few
+seconds.
+"""
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from app.database import get_db
+from app.services.job_queue import seconds_since
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+CONVERTING = "converting"
+UPLOADING = "uploading"
+TRANSCRIBING = "transcribing"
+GENERATING_TITLE = "generating_title"
+
+# Upload progress arrives per chunk; write it at most this often.
+_UPLOAD_WRITE_INTERVAL = 1.0
+# An estimate never claims to be done: the job may still run long.
+_MAX_ESTIMATE = 0.99
+
+
+class JobProgress:
+    """Records the stages of one running transcription.
+
+    Write failures are logged and swallowed: progress is informational and
+    must never fail the job itself.
+    """
+
+    def __init__(self, transcription_id: str) -> None:
+        self.transcription_id = transcription_id
+        self.current: str | None = None
+        self._detail: dict = {}
+        self._last_upload_write = 0.0
+
+    async def stage(self, stage: str, progress: float | None = None, **detail) -> None:
+        self.current = stage
+        self._detail = detail
+        await self._write(
+            "stage = ?, progress = ?, stage_detail_json = ?, stage_started_at = ?",
+            stage, progress, json.dumps(detail) if detail else None,
+            datetime.now(timezone.utc).isoformat(),
+        )
+
+    async def upload(self, sent: int, total: int) -> None:
+        """Upload callback for the ASR backend (see asr/multipart.py)."""
+        if self.current != UPLOADING:
+            return
+        now = time.monotonic()
+        if sent < total and now - self._last_upload_write < _UPLOAD_WRITE_INTERVAL:
+            return
+        self._last_upload_write = now
+        self._detail = {**self._detail, "bytes_sent": sent, "bytes_total": total}
+        await self._write(
+            "progress = ?, stage_detail_json = ?",
+            sent / total if total else None, json.dumps(self._detail),
+        )
+
+    async def reported(self, progress: float | None) -> None:
+        """A fraction done reported by the ASR backend while transcribing."""
+        if progress is None or self.current != TRANSCRIBING:
+            return
+        await self._write("progress = ?", max(0.0, min(1.0, progress)))
+
+    async def _write(self, assignments: str, *values) -> None:
+        try:
+            async with get_db() as db:
+                await db.execute(
+                    f"UPDATE transcriptions SET {assignments} WHERE id = ? AND status = 'processing'",
+                    (*values, self.transcription_id),
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Recording progress for %s failed: %s", self.transcription_id, e)
+
+
+def describe(row, position: int | None = None) -> dict:
+    """{"stage", "progress", "detail"} for a transcriptions row.
+
+    `row` needs status, stage, progress, stage_detail_json and
+    stage_started_at. Finished jobs have no stage.
+    """
+    status = row["status"]
+    if status == "pending":
+        detail = {"position": position} if position else {}
+        return {"stage": QUEUED, "progress": None, "detail": detail}
+    if status != "processing" or not row["stage"]:
+        return {"stage": None, "progress": None, "detail": {}}
+    detail = json.loads(row["stage_detail_json"]) if row["stage_detail_json"] else {}
+    progress = row["progress"]
+    if row["stage"] == TRANSCRIBING and progress is None:
+        expected = detail.get("expected_seconds")
+        elapsed = seconds_since(row["stage_started_at"])
+        if expected and elapsed is not None:
+            progress = min(_MAX_ESTIMATE, elapsed / expected)
+    return {"stage": row["stage"], "progress": progress, "detail": detail}
@@ -0,0 +1,204 @@
+"""Fair-share scheduling for the transcription queue.
+
+The scheduler decides *which* claimable job a worker takes next and *whether*
+it may take one at all, so every ASR backend sits behind the same limits:
+
+- a global cap (ASR_MAX_CONCURRENT) on jobs in the ASR phase, counted across
+  all workers from the live leases in the DB. ASR work outside the queue
+  (live windows) holds leased rows in `asr_slots`, which count the same;
+- an optional per-user cap (ASR_MAX_CONCURRENT_PER_USER);
+- optional per-pool caps (ASR_POOL_MAX_CONCURRENT) when models are routed to
+  separate endpoint pools (ASR_MODEL_POOLS). A full pool only holds back jobs
+  for its own models, so small-model jobs keep flowing while the large-model
+  pool is busy;
+- priority classes: recorder clips first, then interactive uploads, then
+  jobs submitted with an API token (batch). A job is promoted one class for
+  every ASR_QUEUE_PROMOTE_SECONDS it has waited, so batch work still drains
+  under constant interactive load;
+- least-attained-service ordering between users within a class: the next
+  slot goes to the user with the fewest running jobs. A user who bulk-submits
+  200 files gets one slot at a time like everyone else instead of 200 slots
+  in a row;
+- shortest-expected-job-first after that, using the audio duration probed at
+  submit time and the model's realtime factor. Each second waited offsets
+  ASR_QUEUE_AGING_RATE seconds of expected runtime, so long files age their
+  way to the front instead of starving behind a stream of short ones.
+
+Admission is bounded separately by queue length limits; callers that exceed
+them get a QueueFullError carrying a Retry-After hint. A request for more
+jobs than a limit allows at all gets a QueueLimitError instead, since no
+amount of waiting would let it in.
+"""
+from datetime import datetime, timezone
+
+from aiosqlite import Connection
+
+from app.config import settings
+from app.services.asr.polling import rtf_estimator
+
+# Lower rank is served first.
+PRIORITY_CLASSES = {"recorder": 0, "interactive": 1, "batch": 2}
+DEFAULT_PRIORITY_CLASS = "interactive"
+# Expected-runtime stand-in for files whose duration couldn't be probed.
+_UNKNOWN_DURATION_SECONDS = 3600.0
+
+
+class QueueFullError(Exception):
+    """Raised when accepting more jobs would exceed a queue length limit."""
+
+    def __init__(self, message: str, *, scope: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.scope = scope  # "user" | "global"
+        self.retry_after = retry_after
+
+
+class QueueLimitError(Exception):
+    """Raised when more jobs are submitted at once than a queue limit allows."""
+
+
+def _now_str() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Everything holding an ASR slot: processing jobs and out-of-queue slots,
+# each with a live lease
+_RUNNING = """
+    SELECT user_id, model FROM transcriptions WHERE status = 'processing' AND lease_expires_at >= ?
+    UNION ALL
+    SELECT user_id, model FROM asr_slots WHERE lease_expires_at >= ?
+"""
+
+
+async def running_by_user(db: Connection) -> dict[str, int]:
+    """Jobs currently in the ASR phase per user (processing with a live lease)."""
+    now = _now_str()
+    cursor = await db.execute(f"SELECT user_id, COUNT(*) FROM ({_RUNNING}) GROUP BY user_id", (now, now))
+    return {row[0]: row[1] for row in await cursor.fetchall()}
+
+
+async def running_by_pool(db: Connection) -> dict[str, int]:
+    """Jobs currently in the ASR phase per endpoint pool, by their model's routing."""
+    now = _now_str()
+    cursor = await db.execute(f"SELECT model, COUNT(*) FROM ({_RUNNING}) GROUP BY model", (now, now))
+    counts: dict[str, int] = {}
+    for model, count in await cursor.fetchall():
+        pool = settings.asr_pool_for_model(model).name
+        counts[pool] = counts.get(pool, 0) + count
+    return counts
+
+
+def priority_class_for(*, via_api_token: bool, origin: str | None) -> str:
+    if via_api_token:
+        return "batch"
+    if origin == "recorder":
+        return "recorder"
+    return DEFAULT_PRIORITY_CLASS
+
+
+def effective_rank(job: dict) -> int:
+    """The job's class rank after promotion for time spent waiting."""
+    rank = PRIORITY_CLASSES.get(job.get("priority_class"), PRIORITY_CLASSES[DEFAULT_PRIORITY_CLASS])
+    promote = settings.ASR_QUEUE_PROMOTE_SECONDS
+    if promote > 0:
+        rank -= int((job.get("wait_seconds") or 0) // promote)
+    return max(0, rank)
+
+
+def job_score(job: dict) -> float:
+    """Expected runtime minus the aging credit; lower runs sooner."""
+    duration = job.get("audio_duration") or _UNKNOWN_DURATION_SECONDS
+    expected = duration * rtf_estimator.get(
+        job.get("asr_backend") or settings.ASR_BACKEND, job.get("model") or "default",
+    )
+    return expected - (job.get("wait_seconds") or 0) * settings.ASR_QUEUE_AGING_RATE
+
+
+def queue_key(job: dict, served: int, position: int) -> tuple:
+    """Where `job` stands in the scheduler's order; lower runs sooner.
+
+    `served` is how many jobs its user has running, `position` its place in
+    arrival order.
+    """
+    return (effective_rank(job), served, job_score(job), position)
+
+
+def pick_next(
+    candidates: list[dict], running: dict[str, int], running_pools: dict[str, int] | None = None,
+    blocked_pools: set[str] | None = None,
+):
+    """Choose the next job from `candidates` (oldest first) or None.
+
+    Candidates may carry `priority_class`, `audio_duration` and `wait_seconds`;
+    missing values fall back to the default class, an unknown duration and no
+    wait. `running_pools` counts running jobs per endpoint pool;
+    `blocked_pools` are pools whose ASR endpoints are unreachable. Returns None
+    when the global cap is reached or every waiting job is held back by its
+    user's or its pool's cap, or by a blocked pool.
+    """
+    if sum(running.values()) >= settings.ASR_MAX_CONCURRENT:
+        return None
+    per_user_cap = settings.ASR_MAX_CONCURRENT_PER_USER
+    running_pools = running_pools or {}
+    blocked_pools = blocked_pools or set()
+    best = None
+    best_key = None
+    for position, job in enumerate(candidates):
+        served = running.get(job["user_id"], 0)
+        if per_user_cap > 0 and served >= per_user_cap:
+            continue
+        pool = settings.asr_pool_for_model(job.get("model"))
+        if pool.name in blocked_pools:
+            continue
+        if pool.max_concurrent > 0 and running_pools.get(pool.name, 0) >= pool.max_concurrent:
+            continue
+        key = queue_key(job, served, position)
+        if best_key is None or key < best_key:
+            best, best_key = job, key
+    return best
+
+
+async def queued_counts(db: Connection, user_id: str) -> tuple[int, int]:
+    """Return (jobs pending for this user, jobs pending overall)."""
+    cursor = await db.execute(
+        """SELECT COALESCE(SUM(user_id = ?), 0), COUNT(*)
+           FROM transcriptions WHERE status = 'pending'""",
+        (user_id,),
+    )
+    row = await cursor.fetchone()
+    return row[0], row[1]
+
+
+async def pool_queue_depths(db: Connection) -> tuple[dict[str, int], dict[str, int]]:
+    """Return (pending jobs per endpoint pool, running jobs per endpoint pool)."""
+    cursor = await db.execute(
+        """SELECT model, COUNT(*) FROM transcriptions WHERE status = 'pending' GROUP BY model"""
+    )
+    queued: dict[str, int] = {}
+    for model, count in await cursor.fetchall():
+        pool = settings.asr_pool_for_model(model).name
+        queued[pool] = queued.get(pool, 0) + count
+    return queued, await running_by_pool(db)
+
+
+async def check_admission(db: Connection, user_id: str, count: int = 1) -> None:
+    """Raise QueueFullError if queueing `count` more jobs would exceed a limit.
+
+    Raises QueueLimitError if `count` alone exceeds one.
+    """
+    per_user = settings.ASR_QUEUE_MAX_PER_USER
+    total = settings.ASR_QUEUE_MAX_LENGTH
+    if per_user > 0 and count > per_user:
+        raise QueueLimitError(f"Too many transcriptions at once (limit {per_user} queued per user)")
+    if total > 0 and count > total:
+        raise QueueLimitError(f"Too many transcriptions at once (queue limit {total})")
+    user_queued, total_queued = await queued_counts(db, user_id)
+    retry_after = settings.ASR_QUEUE_RETRY_AFTER_SECONDS
+    if per_user > 0 and user_queued + count > per_user:
+        raise QueueFullError(
+            f"Too many queued transcriptions (limit {per_user} per user)",
+            scope="user", retry_after=retry_after,
+        )
+    if total > 0 and total_queued + count > total:
+        raise QueueFullError(
+            "Transcription queue is full", scope="global", retry_after=retry_after,
+        )
@@ -0,0 +1,168 @@
+"""Content-addressed storage for uploaded media.
+
+Uploads are hashed (SHA-256) while they stream to disk and stored once per
+content under a sharded path, `TEMP_PATH/blobs/ab/cd/<hash><ext>`, with the
+converted mp3 next to them as `<hash>.converted.mp3`, apart from an original
+.mp3 of the same bytes. Every `files` row carries its `content_hash`, so
+the rows themselves are the reference count: identical uploads with the same
+extension reuse the stored original and mp3 without transcoding again, and a
+stored file is unlinked only when the last row pointing at it is deleted.
+The same bytes uploaded under another extension get an original of their
+own (served with its own Content-Type) but share the mp3.
+
+The API may run as several processes, so "reuse or place, then add a row"
+and "count references, then unlink" each run in one SQLite write
+transaction (`BEGIN IMMEDIATE`). Whichever comes second sees the other's
+outcome: an upload never records a blob that is being unlinked, and a blob
+is never unlinked while an upload is adding a row for it.
+
+Rows from before content addressing have no hash and own their paths
+exclusively; they are deleted as before.
+"""
+import hashlib
+import os
+import uuid
+from typing import AsyncIterator
+
+from aiosqlite import Connection
+from fastapi import UploadFile
+
+from app.config import settings
+
+_CHUNK_SIZE = 1024 * 1024
+# Blob suffix of the mp3 converted from an original in another format
+CONVERTED_EXT = ".converted.mp3"
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the size limit while streaming."""
+
+
+def blob_dir(content_hash: str) -> str:
+    return os.path.join(settings.TEMP_PATH, "blobs", content_hash[:2], content_hash[2:4])
+
+
+def blob_path(content_hash: str, ext: str) -> str:
+    return os.path.join(blob_dir(content_hash), f"{content_hash}{ext}")
+
+
+def incoming_path(ext: str) -> str:
+    directory = os.path.join(settings.TEMP_PATH, "incoming")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{uuid.uuid4()}{ext}")
+
+
+def discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+async def receive_upload(file: UploadFile, ext: str, max_size: int) -> tuple[str, int, str]:
+    """Stream a multipart upload to a temporary file; see receive_stream()."""
+    async def chunks():
+        while chunk := await file.read(_CHUNK_SIZE):
+            yield chunk
+    return await receive_stream(chunks(), ext, max_size)
+
+
+async def receive_stream(chunks: AsyncIterator[bytes], ext: str, max_size: int) -> tuple[str, int, str]:
+    """Write `chunks` to a temporary file, hashing them on the way.
+
+    Returns (temp path, size, sha256 hex). Raises UploadTooLargeError (after
+    removing the partial file) once more than `max_size` bytes arrive.
+    """
+    path = incoming_path(ext)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        discard(path)
+        raise
+    return path, size, digest.hexdigest()
+
+
+async def find_blob(db: Connection, content_hash: str, ext: str):
+    """A `files` row already holding this content as `ext` whose files are still on disk.
+
+    Only reliable inside a write transaction that also adds the reusing row.
+    """
+    cursor = await db.execute(
+        """SELECT file_path, mp3_path, has_video FROM files
+           WHERE content_hash = ? AND media_type = ? ORDER BY created_at DESC""",
+        (content_hash, ext.lstrip(".")),
+    )
+    for row in await cursor.fetchall():
+        if row["file_path"] and os.path.exists(row["file_path"]) and (
+            not row["mp3_path"] or os.path.exists(row["mp3_path"])
+        ):
+            return row
+    return None
+
+
+def place_blob(temp_path: str, content_hash: str, ext: str) -> str:
+    """Move a received upload to its content address; returns the new path.
+
+    If that address is taken, it already holds the same content, possibly
+    in use: `temp_path` is left for the caller to discard.
+    """
+    os.makedirs(blob_dir(content_hash), exist_ok=True)
+    path = blob_path(content_hash, ext)
+    if not os.path.exists(path):
+        os.replace(temp_path, path)
+    return path
+
+
+async def count_references(db: Connection, content_hash: str, path: str) -> int:
+    """`files` rows of this content still using `path` as original or mp3."""
+    cursor = await db.execute(
+        "SELECT COUNT(*) FROM files WHERE content_hash = ? AND (file_path = ? OR mp3_path = ?)",
+        (content_hash, path, path),
+    )
+    return (await cursor.fetchone())[0]
+
+
+async def release_files(db: Connection, rows) -> int:
+    """Unlink the media of already-deleted `files` rows nobody references anymore.
+
+    `rows` carry content_hash, file_path and mp3_path. Call after the rows'
+    deletion is committed. Returns the number of paths unlinked.
+    """
+    removed = 0
+    for row in rows:
+        content_hash = row["content_hash"]
+        paths = {p for p in (row["file_path"], row["mp3_path"]) if p}
+        if content_hash is None:
+            removed += _unlink_all(paths)
+            continue
+        # Holding the write lock until the files are gone keeps uploads of
+        # the same content from taking a reference in between
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            unused = [p for p in paths if await count_references(db, content_hash, p) == 0]
+            removed += _unlink_all(unused)
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    return removed
+
+
+def _unlink_all(paths) -> int:
+    removed = 0
+    for path in paths:
+        if os.path.exists(path):
+            try:
+                os.unlink(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
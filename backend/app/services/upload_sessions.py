@@ -0,0 +1,236 @@
+"""Upload sessions: a file that arrives in chunks (see routers/upload.py).
+
+The recorder sends its MediaRecorder timeslices while it records instead of
+one large POST at the end. A session is an `upload_sessions` row plus a file
+under `TEMP_PATH/incoming` that chunks are appended to. Every chunk names
+the offset it starts at, which must be the bytes received so far, so a
+repeated or out-of-order chunk is refused rather than corrupting the file.
+Finalizing hands the file to the regular upload path, which stores and
+converts it right away.
+
+Sessions also make large uploads resumable. When a connection drops, the
+bytes that arrived are kept; the client asks for the session's offset and
+continues from there. A client can declare the total size and SHA-256
+up front; finalizing checks them. Sessions idle for
+UPLOAD_SESSION_EXPIRY_HOURS are discarded by the hourly cleanup.
+
+Requests for one session may reach different API processes. A chunk first
+claims the session with a conditional UPDATE that checks the offset, so a
+chunk sent twice lands once. It is then written straight into the file,
+outside any transaction, and a second UPDATE advances the size and drops
+the claim. A claim expires if its writer stops renewing it. Finalizing
+hashes the received bytes and closes the session only if no chunk arrived
+or is being written in the meantime.
+"""
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from aiosqlite import Connection
+
+from app.config import settings
+from app.services import storage
+
+_CHUNK_SIZE = 1024 * 1024
+# A chunk's claim on its session lapses unless renewed this often
+_WRITE_LEASE_SECONDS = 60
+
+
+class OffsetMismatchError(Exception):
+    """A chunk doesn't start where the received data ends."""
+
+    def __init__(self, expected: int) -> None:
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class SessionClosedError(Exception):
+    """The session was finalized, aborted or expired while a chunk arrived."""
+
+
+async def create(
+    db: Connection, user_id: str, filename: str, ext: str, *, has_video: bool | None, source: str,
+    expected_size: int | None = None, expected_sha256: str | None = None,
+):
+    """Open a session with an empty file; returns its row."""
+    session_id = str(uuid.uuid4())
+    path = storage.incoming_path(ext)
+    open(path, "wb").close()
+    now = datetime.now(timezone.utc).isoformat()
+    await db.execute(
+        """INSERT INTO upload_sessions
+           (id, user_id, filename, ext, path, size, expected_size, expected_sha256,
+            has_video, source, created_at, updated_at)
+           VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?)""",
+        (session_id, user_id, filename, ext, path, expected_size,
+         expected_sha256.lower() if expected_sha256 else None,
+         None if has_video is None else int(has_video), source, now, now),
+    )
+    await db.commit()
+    return await get(db, session_id, user_id)
+
+
+async def get(db: Connection, session_id: str, user_id: str):
+    cursor = await db.execute(
+        "SELECT * FROM upload_sessions WHERE id = ? AND user_id = ?", (session_id, user_id),
+    )
+    return await cursor.fetchone()
+
+
+def expires_at(session) -> str:
+    return (
+        datetime.fromisoformat(session["updated_at"]) + timedelta(hours=settings.UPLOAD_SESSION_EXPIRY_HOURS)
+    ).isoformat()
+
+
+async def append(db: Connection, session, offset: int, chunks: AsyncIterator[bytes], max_size: int) -> int:
+    """Write `chunks` at `offset`; returns the new size.
+
+    Raises OffsetMismatchError when `offset` isn't the current size (or
+    another chunk is being written), SessionClosedError when the session is
+    gone, and UploadTooLargeError (with none of the chunk kept) once the
+    file would exceed `max_size`. If the chunk breaks off, what arrived of
+    it is kept and the client can go on from there.
+    """
+    writer = await _claim(db, session, offset)
+    received = 0
+    try:
+        with open(session["path"], "r+b") as f:
+            # Anything past the recorded size is left over from a failed write
+            f.seek(offset)
+            f.truncate()
+            renew_at = time.monotonic() + _WRITE_LEASE_SECONDS / 3
+            try:
+                async for chunk in chunks:
+                    if offset + received + len(chunk) > max_size:
+                        received = 0
+                        raise storage.UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+                    f.write(chunk)
+                    received += len(chunk)
+                    if time.monotonic() >= renew_at:
+                        await _renew(db, session, writer)
+                        renew_at = time.monotonic() + _WRITE_LEASE_SECONDS / 3
+            finally:
+                f.truncate(offset + received)
+    finally:
+        released = await _release(db, session, writer, offset + received)
+    if not released:
+        raise await _refusal(db, session)
+    return offset + received
+
+
+def _lease_times() -> tuple[str, str]:
+    """(now, when a claim taken now expires) as stored timestamps."""
+    now = datetime.now(timezone.utc)
+    return now.isoformat(), (now + timedelta(seconds=_WRITE_LEASE_SECONDS)).isoformat()
+
+
+async def _claim(db: Connection, session, offset: int) -> str:
+    """Reserve the session for a chunk at `offset`; returns the claim's id."""
+    writer = str(uuid.uuid4())
+    now, until = _lease_times()
+    cursor = await db.execute(
+        """UPDATE upload_sessions SET writer = ?, writer_expires_at = ?
+           WHERE id = ? AND size = ? AND (writer IS NULL OR writer_expires_at < ?)""",
+        (writer, until, session["id"], offset, now),
+    )
+    await db.commit()
+    if cursor.rowcount != 1:
+        raise await _refusal(db, session)
+    return writer
+
+
+async def _renew(db: Connection, session, writer: str) -> None:
+    _, until = _lease_times()
+    cursor = await db.execute(
+        "UPDATE upload_sessions SET writer_expires_at = ? WHERE id = ? AND writer = ?",
+        (until, session["id"], writer),
+    )
+    await db.commit()
+    if cursor.rowcount != 1:
+        raise await _refusal(db, session)
+
+
+async def _release(db: Connection, session, writer: str, size: int) -> bool:
+    """Record the new size and drop the claim; False if the claim was lost."""
+    cursor = await db.execute(
+        """UPDATE upload_sessions SET size = ?, updated_at = ?, writer = NULL, writer_expires_at = NULL
+           WHERE id = ? AND writer = ?""",
+        (size, datetime.now(timezone.utc).isoformat(), session["id"], writer),
+    )
+    await db.commit()
+    return cursor.rowcount == 1
+
+
+async def _refusal(db: Connection, session) -> Exception:
+    """Why a chunk can't be written to `session` now."""
+    cursor = await db.execute("SELECT size FROM upload_sessions WHERE id = ?", (session["id"],))
+    row = await cursor.fetchone()
+    if row is None:
+        return SessionClosedError(session["id"])
+    return OffsetMismatchError(row["size"])
+
+
+def _hash_file(path: str, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while size and (chunk := f.read(min(size, _CHUNK_SIZE))):
+            digest.update(chunk)
+            size -= len(chunk)
+    return digest.hexdigest()
+
+
+async def content_hash(session) -> str:
+    """SHA-256 hex of everything received.
+
+    Only the first `size` bytes: a chunk being written may already be past them.
+    """
+    return await asyncio.to_thread(_hash_file, session["path"], session["size"])
+
+
+async def close(db: Connection, session) -> bool:
+    """Forget the session; its file now belongs to the caller.
+
+    Returns False, changing nothing, if a chunk arrived since `session` was
+    read or is being written (or the session is already gone).
+    """
+    now, _ = _lease_times()
+    cursor = await db.execute(
+        """DELETE FROM upload_sessions
+           WHERE id = ? AND size = ? AND (writer IS NULL OR writer_expires_at < ?)""",
+        (session["id"], session["size"], now),
+    )
+    await db.commit()
+    if cursor.rowcount != 1:
+        return False
+    # A writer whose claim lapsed may have left bytes past the size
+    os.truncate(session["path"], session["size"])
+    return True
+
+
+async def abort(db: Connection, session) -> None:
+    """Drop the session and the data received."""
+    await db.execute("DELETE FROM upload_sessions WHERE id = ?", (session["id"],))
+    await db.commit()
+    storage.discard(session["path"])
+
+
+async def expire(db: Connection) -> int:
+    """Discard sessions idle for UPLOAD_SESSION_EXPIRY_HOURS; returns how many."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=settings.UPLOAD_SESSION_EXPIRY_HOURS)).isoformat()
+    cursor = await db.execute("SELECT id, path FROM upload_sessions WHERE updated_at < ?", (cutoff,))
+    expired = 0
+    for row in await cursor.fetchall():
+        # Unless a chunk landed since the SELECT
+        deleted = await db.execute(
+            "DELETE FROM upload_sessions WHERE id = ? AND updated_at < ?", (row["id"], cutoff),
+        )
+        await db.commit()
+        if deleted.rowcount:
+            storage.discard(row["path"])
+            expired += 1
+    return expired
@@ -0,0 +1,95 @@
+"""Standalone transcription worker: `python -m app.worker`.
+
+Claims jobs from the shared DB queue and runs the transcription pipeline
+without serving HTTP, so the API tier can be restarted or scaled on its own.
+Run the API with JOB_WORKER_ENABLED=false when workers are deployed
+separately; both must point at the same TEMP_PATH and DATABASE_PATH.
+
+Metrics are exposed on WORKER_METRICS_PORT when ENABLE_METRICS is on. For
+the container health check the worker touches a heartbeat file every few
+seconds; `python -m app.worker --check` exits non-zero once it goes stale.
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+
+from prometheus_client import start_http_server
+
+from app.config import settings
+from app.database import init_db
+from app.metrics import init_label_series
+from app.services.asr.balancer import start_health_checks
+from app.services.http_clients import close_clients, open_clients
+from app.services.job_queue import JobWorker
+from app.services.pipeline import run_transcription_job
+
+
+# Local to the container: TEMP_PATH is shared with the API and other workers
+HEARTBEAT_PATH = os.path.join(tempfile.gettempdir(), "transcription-worker.alive")
+_HEARTBEAT_SECONDS = 15
+
+
+async def _beat(stop: asyncio.Event) -> None:
+    """Touch HEARTBEAT_PATH while the event loop is responsive."""
+    while not stop.is_set():
+        try:
+            with open(HEARTBEAT_PATH, "a"):
+                os.utime(HEARTBEAT_PATH)
+        except OSError as e:
+            logging.warning("Writing the worker heartbeat failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def healthy() -> bool:
+    """Whether a worker in this container touched its heartbeat recently."""
+    try:
+        age = time.time() - os.path.getmtime(HEARTBEAT_PATH)
+    except OSError:
+        return False
+    return age < _HEARTBEAT_SECONDS * 4
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    os.makedirs(settings.TEMP_PATH, exist_ok=True)
+    await init_db(settings.db_path)
+    init_label_series()
+    open_clients()
+    worker = JobWorker(run_transcription_job)
+    worker.start()
+    health_checks = start_health_checks(stop)
+    beat = asyncio.create_task(_beat(stop))
+    logging.info("Transcription worker %s started", worker.worker_id)
+    try:
+        await stop.wait()
+    finally:
+        await beat
+        if health_checks is not None:
+            await health_checks
+        # Releases leases on unfinished jobs so another worker resumes them now
+        await worker.stop()
+        await close_clients()
+        logging.info("Transcription worker %s stopped", worker.worker_id)
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    if settings.ENABLE_METRICS:
+        start_http_server(settings.WORKER_METRICS_PORT)
+    await run_worker(stop)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check"]:
+        sys.exit(0 if healthy() else 1)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
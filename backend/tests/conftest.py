@@ -1,15 +1,25 @@
 import os
+import tempfile
 os.environ.setdefault("ENABLE_API_TOKENS", "true")
 os.environ.setdefault("DEV_MODE", "true")
 os.environ.setdefault("ENABLE_METRICS", "true")
+# Uploads, blobs and the default database stay out of the source tree
+_TEMP_ROOT = tempfile.mkdtemp(prefix="transcription-tests-")
+os.environ.setdefault("TEMP_PATH", _TEMP_ROOT)
 
 import asyncio
-import tempfile
+import shutil
 import pytest
 import pytest_asyncio
 from app.database import init_db
 
 
+@pytest.fixture(scope="session", autouse=True)
+def remove_temp_root():
+    yield
+    shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
 @pytest.fixture
 def tmp_db_path():
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -28,3 +38,19 @@ async def init_test_db(tmp_path):
     """Initialize a fresh DB for each async test."""
     db_path = str(tmp_path / "test.db")
     await init_db(db_path)
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def close_http_clients():
+    """Shared HTTP clients must not outlive the test's event loop."""
+    yield
+    from app.services.http_clients import close_clients
+    await close_clients()
+
+
+@pytest.fixture(autouse=True)
+def reset_endpoint_pools():
+    """Breaker state and outstanding audio must not leak between tests."""
+    yield
+    from app.services.asr import balancer
+    balancer._pools.clear()
@@ -0,0 +1,206 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import respx
+from httpx import AsyncClient, ASGITransport, Response
+
+from app.database import get_db
+from app.main import app
+from app.models import TranscriptionResult, TranscriptionStatus, Utterance
+from app.services.asr import callbacks
+from app.services.asr.balancer import EndpointPool, parse_urls
+from app.services.asr.base import TranscriptionSettings
+from app.services.asr.murmurai import MurmurAIBackend
+
+
+@pytest.fixture
+def callbacks_on(monkeypatch):
+    monkeypatch.setattr(callbacks.settings, "ASR_CALLBACK_BASE_URL", "http://app.internal:8000/")
+    monkeypatch.setattr(callbacks.settings, "ASR_CALLBACK_SECRET", "s3cret")
+    monkeypatch.setattr(callbacks.settings, "ASR_CALLBACK_FALLBACK_POLL_SECONDS", 60)
+
+
+async def _insert_transcription(tid: str = "t1", asr_job_id: str | None = "job-1") -> None:
+    async with get_db() as db:
+        await db.execute("INSERT OR IGNORE INTO users (id) VALUES ('dev-user')")
+        await db.execute("INSERT OR IGNORE INTO files (id, user_id, mp3_path) VALUES ('f1', 'dev-user', '/tmp/x.mp3')")
+        await db.execute(
+            """INSERT INTO transcriptions (id, user_id, file_id, status, model, asr_job_id)
+               VALUES (?, 'dev-user', 'f1', 'processing', 'base', ?)""",
+            (tid, asr_job_id),
+        )
+        await db.commit()
+
+
+def test_build_callback_signs_transcription_id(callbacks_on):
+    cb = callbacks.build_callback("t1")
+    assert cb.url == "http://app.internal:8000/api/asr/callback/t1"
+    assert callbacks.verify_callback_token("t1", cb.header_value)
+    assert not callbacks.verify_callback_token("t2", cb.header_value)
+
+
+@pytest.mark.asyncio
+async def test_callback_disabled_returns_404():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        r = await c.post("/api/asr/callback/t1", json={"status": "completed"})
+    assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_callback_rejects_bad_token(callbacks_on):
+    await _insert_transcription()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        r = await c.post(
+            "/api/asr/callback/t1", json={"status": "completed"},
+            headers={callbacks.CALLBACK_HEADER: "nope"},
+        )
+    assert r.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_callback_records_status_and_wakes_waiter(callbacks_on):
+    await _insert_transcription()
+    event = callbacks.register("t1")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            r = await c.post(
+                "/api/asr/callback/t1", json={"transcript_id": "job-1", "status": "completed"},
+                headers={callbacks.CALLBACK_HEADER: callbacks.callback_token("t1")},
+            )
+        assert r.status_code == 200
+        assert event.is_set()
+    finally:
+        callbacks.unregister("t1")
+    async with get_db() as db:
+        cursor = await db.execute("SELECT asr_callback_status FROM transcriptions WHERE id = 't1'")
+        assert (await cursor.fetchone())[0] == "completed"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", ["[1, 2]", '"completed"', "null", "not json"])
+async def test_callback_without_json_object_still_wakes_waiter(callbacks_on, body):
+    await _insert_transcription()
+    event = callbacks.register("t1")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            r = await c.post(
+                "/api/asr/callback/t1", content=body,
+                headers={callbacks.CALLBACK_HEADER: callbacks.callback_token("t1"),
+                         "Content-Type": "application/json"},
+            )
+        assert r.status_code == 200
+        assert event.is_set()
+    finally:
+        callbacks.unregister("t1")
+    async with get_db() as db:
+        cursor = await db.execute("SELECT asr_callback_status FROM transcriptions WHERE id = 't1'")
+        assert (await cursor.fetchone())[0] is None
+
+
+@pytest.mark.asyncio
+async def test_callback_matches_job_on_one_of_several_endpoints(callbacks_on):
+    # The balancer's job id names the endpoint; MurmurAI reports only its own id
+    pool = EndpointPool(parse_urls("http://gpu1:8880,http://gpu2:8880"))
+    await _insert_transcription(asr_job_id=pool.job_id(pool.endpoints[1], "job-1"))
+    event = callbacks.register("t1")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            stale = await c.post(
+                "/api/asr/callback/t1", json={"transcript_id": "job-0", "status": "completed"},
+                headers={callbacks.CALLBACK_HEADER: callbacks.callback_token("t1")},
+            )
+            assert stale.json() == {"status": "ignored"}
+            assert not event.is_set()
+            r = await c.post(
+                "/api/asr/callback/t1", json={"transcript_id": "job-1", "status": "completed"},
+                headers={callbacks.CALLBACK_HEADER: callbacks.callback_token("t1")},
+            )
+        assert r.json() == {"status": "ok"}
+        assert event.is_set()
+    finally:
+        callbacks.unregister("t1")
+
+
+@pytest.mark.asyncio
+async def test_callback_for_stale_job_is_ignored(callbacks_on):
+    await _insert_transcription(asr_job_id="job-2")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        r = await c.post(
+            "/api/asr/callback/t1", json={"transcript_id": "job-1", "status": "completed"},
+            headers={callbacks.CALLBACK_HEADER: callbacks.callback_token("t1")},
+        )
+    assert r.json() == {"status": "ignored"}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_murmurai_submit_registers_webhook(callbacks_on, tmp_path):
+    route = respx.post("http://localhost:8880/v1/transcript").mock(
+        return_value=Response(200, json={"id": "job-1"}),
+    )
+    audio = tmp_path / "a.mp3"
+    audio.write_bytes(b"fake")
+    backend = MurmurAIBackend()
+    await backend.submit(str(audio), TranscriptionSettings(), callback=callbacks.build_callback("t1"))
+
+    body = route.calls.last.request.content
+    assert b"http://app.internal:8000/api/asr/callback/t1" in body
+    assert callbacks.CALLBACK_HEADER.encode() in body
+
+
+@pytest.mark.asyncio
+async def test_pipeline_completes_on_callback_without_polling(callbacks_on):
+    from app.services.pipeline import run_transcription_job
+
+    await _insert_transcription(asr_job_id=None)
+    backend = AsyncMock()
+    backend.resumable = True
+    backend.supports_callbacks = True
+    backend.polling_strategy = MagicMock()
+    backend.submit.return_value = "job-1"
+    backend.get_status.return_value = TranscriptionStatus(id="job-1", status="processing")
+    backend.get_result.return_value = TranscriptionResult(
+        id="job-1", status="completed", utterances=[Utterance(start=0, end=1, text="Hi")],
+    )
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT t.*, f.mp3_path FROM transcriptions t JOIN files f ON f.id = t.file_id WHERE t.id = 't1'",
+        )
+        job = dict(await cursor.fetchone())
+    job["attempts"] = 1
+
+    with patch("app.services.pipeline.get_asr_backend", return_value=backend):
+        task = asyncio.create_task(run_transcription_job(job))
+        for _ in range(100):
+            if backend.submit.await_count:
+                break
+            await asyncio.sleep(0.01)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            await c.post(
+                "/api/asr/callback/t1", json={"transcript_id": "job-1", "status": "completed"},
+                headers={callbacks.CALLBACK_HEADER: callbacks.callback_token("t1")},
+            )
+        await asyncio.wait_for(task, timeout=5)
+
+    assert backend.submit.call_args.kwargs["callback"].url.endswith("/api/asr/callback/t1")
+    backend.get_status.assert_not_awaited()
+    backend.get_result.assert_awaited_once_with("job-1")
+
+
+@pytest.mark.asyncio
+async def test_pipeline_sees_callback_recorded_by_another_process(callbacks_on, monkeypatch):
+    from app.services import pipeline
+
+    monkeypatch.setattr(pipeline.settings, "JOB_POLL_INTERVAL_SECONDS", 0.01)
+    await _insert_transcription()
+    wake = callbacks.register("t1")
+    try:
+        # No local notify(): the API process only wrote the row
+        async with get_db() as db:
+            await db.execute("UPDATE transcriptions SET asr_callback_status = 'completed' WHERE id = 't1'")
+            await db.commit()
+        status = await asyncio.wait_for(pipeline._wait_for_callback("t1", wake, 60), timeout=5)
+    finally:
+        callbacks.unregister("t1")
+    assert status == "completed"
@@ -20,3 +20,43 @@ async def test_convert_mp3_returns_same_path():
 async def test_convert_nonexistent_file_raises():
     with pytest.raises(FileNotFoundError):
         await convert_to_mp3("/nonexistent/file.wav")
+
+
+def test_parse_silencedetect_closes_trailing_silence_at_duration():
+    from app.services.audio import parse_silencedetect
+    output = (
+        "[silencedetect @ 0x1] silence_start: 4.5\n"
+        "[silencedetect @ 0x1] silence_end: 6.25 | silence_duration: 1.75\n"
+        "size=N/A time=00:00:10.00\n"
+        "[silencedetect @ 0x1] silence_start: 9\n"
+    )
+    assert parse_silencedetect(output, duration=10.0) == [(4.5, 6.25), (9.0, 10.0)]
+    assert parse_silencedetect(output) == [(4.5, 6.25)]
+
+
+def test_choose_cut_points_snaps_to_nearest_silence():
+    from app.services.audio import choose_cut_points
+    silences = [(590.0, 592.0), (1230.0, 1232.0)]
+    cuts = choose_cut_points(2000.0, silences, segment_seconds=600, search_seconds=60)
+    # 591 snapped; next target 1191 -> 1231 snapped; next target 1831 has no silence
+    assert cuts == [591.0, 1231.0, 1831.0]
+
+
+def test_speech_regions_cut_long_silences_with_padding():
+    from app.services.audio import speech_regions
+    regions = speech_regions(100.0, [(10.0, 40.0), (90.0, 100.0)], padding=0.5)
+    assert regions == [(0.0, 10.5), (39.5, 90.5), (99.5, 100.0)]
+
+
+def test_speech_map_remaps_utterances_to_original_time():
+    from app.models import Utterance
+    from app.services.audio import SpeechMap
+    speech_map = SpeechMap([(0.0, 10.0), (40.0, 60.0)])
+    assert speech_map.kept_seconds == 30.0
+    utterances = [
+        Utterance(start=2000, end=10000, text="before the gap"),
+        Utterance(start=10000, end=15000, text="after the gap"),
+    ]
+    remapped = speech_map.remap(utterances)
+    assert [(u.start, u.end) for u in remapped] == [(2000, 10000), (40000, 45000)]
+    assert SpeechMap.from_json(speech_map.to_json()).regions == speech_map.regions
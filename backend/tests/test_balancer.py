@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import respx
+from httpx import Response
+
+from app.services.asr import balancer
+from app.services.asr.balancer import ASRUnavailableError, EndpointPool, parse_urls
+from app.services.asr.base import TranscriptionSettings
+from app.services.asr.murmurai import MurmurAIBackend
+
+URLS = "http://gpu1:8880, http://gpu2:8880/"
+
+
+def test_parse_urls_splits_and_strips():
+    assert parse_urls(URLS) == ["http://gpu1:8880", "http://gpu2:8880"]
+
+
+def test_pick_routes_to_least_outstanding_audio():
+    pool = EndpointPool(parse_urls(URLS))
+    gpu1, gpu2 = pool.endpoints
+    pool.assign("long", gpu1, 3600)
+    assert pool.pick() is gpu2
+    pool.assign("short-1", gpu2, 600)
+    pool.assign("short-2", gpu2, 600)
+    assert pool.pick() is gpu2
+    pool.release("long")
+    assert pool.pick() is gpu1
+
+
+def test_job_ids_carry_endpoint_affinity():
+    pool = EndpointPool(parse_urls(URLS))
+    job_id = pool.job_id(pool.endpoints[1], "abc")
+    assert pool.resolve(job_id) == (pool.endpoints[1], "abc")
+    # A fresh pool (another process, or after a restart) resolves it the same way
+    assert EndpointPool(parse_urls(URLS)).resolve(job_id)[0].url == "http://gpu2:8880"
+
+    single = EndpointPool(["http://asr:8880"])
+    assert single.job_id(single.endpoints[0], "abc") == "abc"
+    assert single.resolve("abc") == (single.endpoints[0], "abc")
+
+
+def test_failing_endpoint_is_ejected_until_all_are_unavailable(monkeypatch):
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_FAILURES", 2)
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_SECONDS", 60)
+    pool = EndpointPool(parse_urls(URLS))
+    gpu1, gpu2 = pool.endpoints
+    pool.record_failure(gpu1)
+    assert pool.pick() is gpu1
+    pool.record_failure(gpu1)
+    assert pool.pick() is gpu2
+    # Every breaker open: callers hold their jobs instead of hammering a dead host
+    pool.record_failure(gpu2)
+    pool.record_failure(gpu2)
+    with pytest.raises(ASRUnavailableError) as exc:
+        pool.pick()
+    assert 0 < exc.value.retry_after <= 60
+    assert not pool.accepting()
+    pool.record_success(gpu1)
+    assert pool.pick() is gpu1
+
+
+@pytest.mark.asyncio
+async def test_half_open_breaker_lets_one_trial_through(monkeypatch):
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_FAILURES", 1)
+    # Open for no time at all: straight to half-open
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_SECONDS", 0)
+    pool = EndpointPool(["http://asr:8880"])
+    (endpoint,) = pool.endpoints
+    pool.record_failure(endpoint)
+    assert endpoint.state(time.monotonic()) == balancer.HALF_OPEN
+
+    async with pool.request(endpoint, "status"):
+        # Only the trial request may go through
+        assert not pool.accepting()
+        with pytest.raises(ASRUnavailableError):
+            async with pool.request(endpoint, "status"):
+                pass
+    assert endpoint.state(time.monotonic()) == balancer.CLOSED
+
+    pool.record_failure(endpoint)
+    with pytest.raises(httpx.ConnectError):
+        async with pool.request(endpoint, "status"):
+            raise httpx.ConnectError("down")
+    # The failed trial re-opened the breaker
+    assert endpoint.failures == 2 and endpoint.ejected_until
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_idempotent_calls_retry_transient_failures(monkeypatch, tmp_path):
+    monkeypatch.setattr(balancer.settings, "ASR_URL", "http://retry:8880")
+    monkeypatch.setattr(balancer.settings, "ASR_RETRY_BASE_SECONDS", 0)
+    backend = MurmurAIBackend()
+    route = respx.get("http://retry:8880/v1/transcript/j1").mock(side_effect=[
+        httpx.ConnectError("reset"),
+        Response(502),
+        Response(200, json={"status": "processing"}),
+    ])
+
+    status = await backend.get_status("j1")
+
+    assert status.status == "processing"
+    assert route.call_count == 3
+    assert backend.pool.endpoints[0].failures == 0
+
+    respx.get("http://retry:8880/v1/transcript/j2").mock(return_value=Response(404))
+    with pytest.raises(httpx.HTTPStatusError):
+        await backend.get_status("j2")
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(balancer.settings, "ASR_RETRY_BASE_SECONDS", 1)
+    monkeypatch.setattr(balancer.settings, "ASR_RETRY_MAX_SECONDS", 5)
+    delays = [balancer.backoff_delay(10) for _ in range(50)]
+    assert all(0 <= d <= 5 for d in delays)
+    assert len(set(delays)) > 1
+    assert all(0 <= balancer.backoff_delay(1) <= 1 for _ in range(20))
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_health_probe_ejects_and_readmits(monkeypatch):
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_FAILURES", 1)
+    pool = EndpointPool(parse_urls(URLS))
+    gpu1, gpu2 = pool.endpoints
+    respx.get("http://gpu1:8880/health").mock(side_effect=httpx.ConnectError("down"))
+    respx.get("http://gpu2:8880/health").mock(return_value=Response(200))
+    assert not await pool.probe(gpu1)
+    assert await pool.probe(gpu2)
+    assert pool.pick() is gpu2
+
+    respx.get("http://gpu1:8880/health").mock(return_value=Response(200))
+    assert await pool.probe(gpu1)
+    assert not gpu1.ejected_until
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_murmurai_follows_job_back_to_accepting_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(balancer.settings, "ASR_URL", URLS)
+    audio = tmp_path / "a.mp3"
+    audio.write_bytes(b"fake")
+    backend = MurmurAIBackend()
+    gpu1 = backend.pool.endpoints[0]
+    backend.pool.assign("busy", gpu1, 7200)
+
+    respx.post("http://gpu2:8880/v1/transcript").mock(return_value=Response(200, json={"id": "j1"}))
+    status_route = respx.get("http://gpu2:8880/v1/transcript/j1").mock(
+        return_value=Response(200, json={"status": "completed", "utterances": []}),
+    )
+
+    job_id = await backend.submit(str(audio), TranscriptionSettings(), audio_seconds=120)
+    assert backend.pool.endpoints[1].outstanding_seconds == 120
+    assert (await backend.get_status(job_id)).status == "completed"
+    await backend.get_result(job_id)
+
+    assert status_route.call_count == 2
+    assert backend.pool.endpoints[1].outstanding_seconds == 0
+    backend.pool.release("busy")
+
+
+@pytest.mark.asyncio
+async def test_start_health_checks_only_for_several_endpoints(monkeypatch):
+    monkeypatch.setattr(balancer.settings, "ASR_URL", "http://only:8880")
+    assert balancer.start_health_checks(asyncio.Event()) is None
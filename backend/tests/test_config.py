@@ -94,3 +94,45 @@ def test_admin_emails_lowercased_and_trimmed(monkeypatch):
     importlib.reload(config_module)
     s = config_module.settings
     assert s.ADMIN_EMAILS == ["alice@example.com", "bob@example.com"]
+
+
+def test_asr_model_pools(monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, "ASR_URL", "http://asr:8880")
+    monkeypatch.setattr(settings, "ASR_POOLS", "gpu=http://gpu1:8880,http://gpu2:8880; cpu=http://cpu:8880")
+    monkeypatch.setattr(settings, "ASR_MODEL_POOLS", "large-v3=gpu, base=cpu, tiny=missing")
+    monkeypatch.setattr(settings, "ASR_POOL_MAX_CONCURRENT", "gpu=4")
+
+    assert settings.asr_pool_for_model("large-v3").urls == "http://gpu1:8880,http://gpu2:8880"
+    assert settings.asr_pool_for_model("large-v3").max_concurrent == 4
+    assert settings.asr_pool_for_model("base").name == "cpu"
+    assert settings.asr_pool_for_model("base").max_concurrent == 0
+    # Unmapped models and unknown pool names fall back to ASR_URL
+    assert settings.asr_pool_for_model("medium").urls == "http://asr:8880"
+    assert settings.asr_pool_for_model("tiny").name == "default"
+
+
+@pytest.mark.asyncio
+async def test_config_reports_queue_depth_per_model(monkeypatch):
+    from app.database import get_db
+    from app.routers.config_router import settings
+    monkeypatch.setattr(settings, "WHISPER_MODELS", ["base", "large-v3", "large-v3-turbo"])
+    monkeypatch.setattr(settings, "ASR_POOLS", "gpu=http://gpu1:8880")
+    monkeypatch.setattr(settings, "ASR_MODEL_POOLS", "large-v3=gpu,large-v3-turbo=gpu")
+    monkeypatch.setattr(settings, "ASR_POOL_MAX_CONCURRENT", "gpu=2")
+    async with get_db() as db:
+        await db.execute("INSERT INTO users (id) VALUES ('u1')")
+        for tid, model in (("t1", "large-v3"), ("t2", "large-v3-turbo"), ("t3", "base")):
+            await db.execute(
+                "INSERT INTO transcriptions (id, user_id, status, model) VALUES (?, 'u1', 'pending', ?)",
+                (tid, model),
+            )
+        await db.commit()
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        queues = (await client.get("/api/config")).json()["model_queues"]
+
+    assert queues["large-v3"] == {"pool": "gpu", "queued": 2, "running": 0, "max_concurrent": 2}
+    assert queues["base"]["pool"] == "default"
+    assert queues["base"]["queued"] == 1
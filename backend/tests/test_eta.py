@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.database import get_db
+from app.main import app
+from app.services import eta
+from app.services.asr.polling import rtf_estimator
+
+
+def _ts(seconds_ago: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _seconds_from_now(iso: str) -> float:
+    return (datetime.fromisoformat(iso) - datetime.now(timezone.utc)).total_seconds()
+
+
+def test_project_start_fills_earliest_free_slot():
+    # Two slots free up at 10s and 30s; the 40s job ahead takes the first one
+    assert eta.project_start([30, 10], [40], slots=2) == 30
+    assert eta.project_start([], [], slots=3) == 0
+    # More running jobs than slots: a slot opens once enough have finished
+    assert eta.project_start([5, 10, 20], [], slots=2) == 10
+
+
+async def _insert(db, tid, status, *, created, duration=None, started=None, priority="interactive"):
+    await db.execute(
+        """INSERT INTO transcriptions (id, user_id, status, model, asr_backend, audio_duration,
+           created_at, started_at, lease_expires_at, priority_class)
+           VALUES (?, 'dev-user', ?, 'eta', 'murmurai', ?, ?, ?, ?, ?)""",
+        (tid, status, duration, _ts(created), started and _ts(started),
+         _ts(-600) if status == "processing" else None, priority),
+    )
+
+
+@pytest.mark.asyncio
+async def test_status_reports_expected_times():
+    async with get_db() as db:
+        await db.execute("INSERT OR IGNORE INTO users (id, email) VALUES ('dev-user', 'dev@localhost')")
+        await rtf_estimator.persist(db, "murmurai", "eta", 0.5)
+        await _insert(db, "run", "processing", created=500, duration=200, started=40)
+        await _insert(db, "ahead", "pending", created=300, duration=100)
+        await _insert(db, "mine", "pending", created=200, duration=None)
+        await db.commit()
+
+    transport = ASGITransport(app=app)
+    with patch("app.services.eta.settings.ASR_MAX_CONCURRENT", 1):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            running = (await client.get("/api/status/run")).json()
+            mine = (await client.get("/api/status/mine")).json()
+
+    # 200s of audio at RTF 0.5, started 40s ago: 60s to go
+    assert running["queue_position"] is None
+    assert _seconds_from_now(running["expected_completion_at"]) == pytest.approx(60, abs=2)
+    # Waits for the running job (60s), then the one ahead (50s). Its own
+    # duration is unknown, so it counts as the average of the known ones.
+    assert mine["queue_position"] == 2
+    assert mine["stage_detail"] == {"position": 2}
+    assert _seconds_from_now(mine["expected_start_at"]) == pytest.approx(110, abs=2)
+    assert _seconds_from_now(mine["expected_completion_at"]) == pytest.approx(185, abs=2)
+
+    # Recomputed as the queue moves: once the running job is done, it starts sooner
+    async with get_db() as db:
+        await db.execute("UPDATE transcriptions SET status = 'completed' WHERE id = 'run'")
+        await db.commit()
+        row = await (await db.execute("SELECT * FROM transcriptions WHERE id = 'mine'")).fetchone()
+        with patch("app.services.eta.settings.ASR_MAX_CONCURRENT", 1):
+            times = await eta.estimate(db, row)
+    assert times["queue_position"] == 2
+    assert _seconds_from_now(times["expected_start_at"]) == pytest.approx(50, abs=2)
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_have_no_estimate():
+    async with get_db() as db:
+        row = {"id": "x", "status": "completed"}
+        assert await eta.estimate(db, row) == {
+            "queue_position": None, "expected_start_at": None, "expected_completion_at": None,
+        }
+
+
+@pytest.mark.asyncio
+async def test_queue_position_follows_the_scheduler_order():
+    async with get_db() as db:
+        await db.execute("INSERT OR IGNORE INTO users (id, email) VALUES ('dev-user', 'dev@localhost')")
+        await rtf_estimator.persist(db, "murmurai", "eta", 0.5)
+        await _insert(db, "batch-1", "pending", created=300, duration=600, priority="batch")
+        await _insert(db, "batch-2", "pending", created=200, duration=600, priority="batch")
+        await _insert(db, "clip", "pending", created=10, duration=20, priority="recorder")
+        await db.commit()
+        rows = {
+            r["id"]: r for r in await (await db.execute("SELECT * FROM transcriptions")).fetchall()
+        }
+        with patch("app.services.eta.settings.ASR_MAX_CONCURRENT", 1):
+            times = {tid: await eta.estimate(db, row) for tid, row in rows.items()}
+
+    # The recorder clip arrived last but is served first, as the scheduler would
+    assert times["clip"]["queue_position"] == 1
+    assert _seconds_from_now(times["clip"]["expected_start_at"]) == pytest.approx(0, abs=2)
+    assert times["batch-1"]["queue_position"] == 2
+    assert times["batch-2"]["queue_position"] == 3
@@ -0,0 +1,37 @@
+import pytest
+import respx
+from httpx import Response
+
+from app.services import http_clients
+
+
+@pytest.mark.asyncio
+async def test_client_is_shared_until_closed():
+    client = http_clients.get_client("asr")
+    assert http_clients.get_client("asr") is client
+    assert http_clients.get_client("llm") is not client
+
+    await http_clients.close_clients()
+    assert client.is_closed
+    assert http_clients.get_client("asr") is not client
+
+
+@pytest.mark.asyncio
+async def test_open_clients_builds_one_per_upstream():
+    http_clients.open_clients()
+    assert set(http_clients._clients) == set(http_clients.UPSTREAMS)
+    limits = http_clients.UPSTREAMS["asr"].limits
+    assert limits.max_keepalive_connections > 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_pool_stats_reported_after_requests():
+    from app.metrics import http_pool_connections
+    respx.get("http://asr:8880/health").mock(return_value=Response(200))
+
+    await http_clients.get_client("asr").get("http://asr:8880/health")
+
+    active, idle = http_clients.pool_stats("asr")
+    assert active >= 0 and idle >= 0
+    assert http_pool_connections.labels("asr", "idle")._value.get() == idle
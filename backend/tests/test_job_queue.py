@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from app.database import get_db
+from app.services.job_queue import (
+    JobWorker, asr_slot, claim_next_job, claim_slot, release_leases, renew_lease,
+)
+
+
+async def _insert_job(tid: str, *, status: str = "pending", created_at: str = "2026-01-01 00:00:00",
+                      lease_expires_at: str | None = None, attempts: int = 0,
+                      asr_job_id: str | None = None) -> None:
+    async with get_db() as db:
+        await db.execute("INSERT OR IGNORE INTO users (id) VALUES ('u1')")
+        await db.execute(
+            "INSERT OR IGNORE INTO files (id, user_id, mp3_path) VALUES ('f1', 'u1', '/tmp/f1.mp3')",
+        )
+        await db.execute(
+            """INSERT INTO transcriptions (id, user_id, file_id, status, created_at,
+               lease_expires_at, attempts, asr_job_id) VALUES (?, 'u1', 'f1', ?, ?, ?, ?, ?)""",
+            (tid, status, created_at, lease_expires_at, attempts, asr_job_id),
+        )
+        await db.commit()
+
+
+async def _row(tid: str):
+    async with get_db() as db:
+        cursor = await db.execute("SELECT * FROM transcriptions WHERE id = ?", (tid,))
+        return await cursor.fetchone()
+
+
+@pytest.mark.asyncio
+async def test_claim_returns_oldest_pending_job_with_file_path():
+    await _insert_job("newer", created_at="2026-01-01 00:00:05")
+    await _insert_job("older", created_at="2026-01-01 00:00:01")
+
+    async with get_db() as db:
+        job = await claim_next_job(db, worker_id="w1")
+
+    assert job["id"] == "older"
+    assert job["mp3_path"] == "/tmp/f1.mp3"
+    assert job["attempts"] == 1
+    row = await _row("older")
+    assert row["status"] == "processing"
+    assert row["claimed_by"] == "w1"
+    assert row["lease_expires_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_claim_skips_processing_job_with_live_lease():
+    await _insert_job("busy", status="processing", lease_expires_at="2999-01-01 00:00:00", attempts=1)
+    async with get_db() as db:
+        assert await claim_next_job(db, worker_id="w1") is None
+
+
+@pytest.mark.asyncio
+async def test_claim_recovers_orphaned_processing_job():
+    await _insert_job("orphan", status="processing", lease_expires_at="2000-01-01 00:00:00",
+                      attempts=1, asr_job_id="asr-1")
+    async with get_db() as db:
+        job = await claim_next_job(db, worker_id="w2")
+    assert job["id"] == "orphan"
+    assert job["asr_job_id"] == "asr-1"
+    assert job["attempts"] == 2
+
+
+@pytest.mark.asyncio
+async def test_claim_fails_job_after_max_attempts(monkeypatch):
+    from app.services import job_queue
+    monkeypatch.setattr(job_queue.settings, "JOB_MAX_ATTEMPTS", 2)
+    await _insert_job("crashy", status="processing", lease_expires_at="2000-01-01 00:00:00", attempts=2)
+
+    async with get_db() as db:
+        assert await claim_next_job(db, worker_id="w1") is None
+
+    row = await _row("crashy")
+    assert row["status"] == "failed"
+    assert "2 attempts" in row["error_message"]
+
+
+@pytest.mark.asyncio
+async def test_claim_keeps_exhausted_job_while_its_pool_is_down(monkeypatch):
+    from app.services import job_queue
+    monkeypatch.setattr(job_queue.settings, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(job_queue, "unavailable_pools", lambda: {"default"})
+    await _insert_job("waiting", attempts=2)
+
+    async with get_db() as db:
+        assert await claim_next_job(db, worker_id="w1") is None
+
+    assert (await _row("waiting"))["status"] == "pending"
+
+
+@pytest.mark.asyncio
+async def test_renew_and_release_lease():
+    await _insert_job("j1")
+    async with get_db() as db:
+        await claim_next_job(db, worker_id="w1")
+        assert await renew_lease(db, "j1", worker_id="w1") is True
+        assert await renew_lease(db, "j1", worker_id="other") is False
+        assert await release_leases(db, worker_id="w1") == 1
+        # Released lease makes the job immediately claimable by another worker
+        job = await claim_next_job(db, worker_id="w2")
+    assert job["id"] == "j1"
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_claimed_jobs_up_to_concurrency():
+    for i in range(3):
+        await _insert_job(f"j{i}", created_at=f"2026-01-01 00:00:0{i}")
+
+    release = asyncio.Event()
+    started: list[str] = []
+
+    async def handler(job: dict) -> None:
+        started.append(job["id"])
+        await release.wait()
+
+    worker = JobWorker(handler, concurrency=2, worker_id="w1")
+    assert await worker.run_once() == 2
+    await asyncio.sleep(0)
+    assert started == ["j0", "j1"]
+    assert (await _row("j2"))["status"] == "pending"
+
+    release.set()
+    await asyncio.sleep(0.05)
+    assert worker.running == set()
+    assert await worker.run_once() == 1
+    await asyncio.sleep(0.05)
+    assert started == ["j0", "j1", "j2"]
+
+
+@pytest.mark.asyncio
+async def test_asr_slots_count_against_scheduler_caps(monkeypatch):
+    from app.services import job_queue
+    monkeypatch.setattr(job_queue.settings, "ASR_MAX_CONCURRENT", 1)
+    await _insert_job("queued")
+
+    async with asr_slot("u2", None) as granted:
+        assert granted
+        # The live slot fills the global cap: neither jobs nor more slots fit
+        async with get_db() as db:
+            assert await claim_next_job(db, worker_id="w1") is None
+            assert not await claim_slot(db, "other", user_id="u3", model=None)
+
+    async with get_db() as db:
+        assert (await claim_next_job(db, worker_id="w1"))["id"] == "queued"
+    async with asr_slot("u2", None) as granted:
+        assert not granted
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.database import get_db
+from app.main import app
+from app.models import TranscriptionResult, TranscriptionStatus, Utterance
+from app.routers import live as live_router
+from app.services import live
+from app.services.asr import live as asr_live
+from app.services.asr.base import TranscriptionSettings
+from app.services.asr.live import LiveTranscriber, WindowedTranscriber
+
+
+class FakeTranscriber(LiveTranscriber):
+    """Replays scripted windows: each call returns the next list of utterances."""
+
+    def __init__(self, windows: list[list[Utterance]]) -> None:
+        self.windows = list(windows)
+        self.calls: list[float] = []
+        self.closed = False
+
+    async def transcribe(self, window_path: str, window_seconds: float) -> list[Utterance]:
+        self.calls.append(window_seconds)
+        return self.windows.pop(0) if self.windows else []
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _u(start: float, end: float, text: str) -> Utterance:
+    return Utterance(start=int(start * 1000), end=int(end * 1000), text=text)
+
+
+class FakeDecoder:
+    """Stands in for ffmpeg: every window is `seconds[0]` long."""
+
+    def __init__(self, seconds: list[float]) -> None:
+        self.seconds = seconds
+        self.fed = b""
+
+    async def feed(self, chunk: bytes) -> None:
+        self.fed += chunk
+
+    async def finish(self) -> None:
+        pass
+
+    def write_wav(self, output_path: str, start: float) -> float:
+        return self.seconds[0]
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def window_audio():
+    seconds = [10.0]
+    with patch("app.services.live.StreamDecoder", lambda _: FakeDecoder(seconds)):
+        yield seconds
+
+
+def _session(transcriber, max_bytes=1024):
+    return live.LiveSession(transcriber, backend_name="fake", ext=".webm", max_bytes=max_bytes)
+
+
+@pytest.mark.asyncio
+async def test_advance_finalizes_settled_prefix(window_audio):
+    transcriber = FakeTranscriber([
+        [_u(0, 2, "hello"), _u(2.5, 6, "there"), _u(6.5, 9.5, "wor")],
+        [_u(4, 5.5, "world")],
+    ])
+    session = _session(transcriber)
+    await session.append(b"chunk")
+
+    done = await session.advance()
+    # "wor" ends within LIVE_FINALIZE_SECONDS of the window's end: still partial
+    assert [u.text for u in done] == ["hello", "there"]
+    assert [u.text for u in session.partial] == ["wor"]
+    assert session.final_until_ms == 6000
+    assert not session.has_new_audio
+
+    # The next window starts after the last final utterance
+    done = await session.advance(final=True)
+    assert [(u.text, u.start) for u in done] == [("world", 10000)]
+    assert session.partial == []
+    assert [u.text for u in session.final] == ["hello", "there", "world"]
+    await session.discard()
+
+
+@pytest.mark.asyncio
+async def test_advance_skips_silence_and_caps_window(window_audio):
+    transcriber = FakeTranscriber([[], [_u(0, 20, "long"), _u(20, 39, "speech")]])
+    session = _session(transcriber)
+    await session.append(b"chunk")
+
+    assert await session.advance() == []
+    assert session.final_until_ms == 7000  # silence up to the finalize margin is done
+
+    # A window past LIVE_MAX_WINDOW_SECONDS keeps only its last utterance open
+    window_audio[0] = 40.0
+    done = await session.advance()
+    assert [u.text for u in done] == ["long"]
+    assert [u.text for u in session.partial] == ["speech"]
+    await session.discard()
+
+
+@pytest.mark.asyncio
+async def test_append_enforces_size_limit(window_audio):
+    session = _session(FakeTranscriber([]), max_bytes=4)
+    await session.append(b"1234")
+    with pytest.raises(live.storage.UploadTooLargeError):
+        await session.append(b"5")
+    await session.discard()
+
+
+def test_stream_decoder_cuts_windows_from_the_pcm_sidecar(tmp_path):
+    import wave
+    from app.services.audio import PCM_SAMPLE_RATE, StreamDecoder
+
+    decoder = StreamDecoder(str(tmp_path / "live.pcm"))
+    # Three seconds decoded, each second's samples holding its own number
+    pcm = b"".join(bytes([i, 0]) * PCM_SAMPLE_RATE for i in range(3))
+    (tmp_path / "live.pcm").write_bytes(pcm)
+    decoder.decoded = len(pcm)
+
+    window = str(tmp_path / "window.wav")
+    assert decoder.write_wav(window, 1.5) == 1.5
+    with wave.open(window) as wav:
+        assert wav.getframerate() == PCM_SAMPLE_RATE
+        frames = wav.readframes(wav.getnframes())
+    assert frames == bytes([1, 0]) * (PCM_SAMPLE_RATE // 2) + bytes([2, 0]) * PCM_SAMPLE_RATE
+    # Past the end: an empty window
+    assert decoder.write_wav(window, 5) == 0
+
+    decoder.failed = True
+    with pytest.raises(RuntimeError):
+        decoder.write_wav(window, 0)
+
+
+@pytest.mark.asyncio
+async def test_windowed_transcriber_uses_submit_and_poll():
+    backend = MagicMock()
+    backend.submit = AsyncMock(return_value="job-1")
+    backend.get_status = AsyncMock(side_effect=[
+        TranscriptionStatus(id="job-1", status="processing"),
+        TranscriptionStatus(id="job-1", status="completed"),
+    ])
+    backend.get_result = AsyncMock(return_value=TranscriptionResult(
+        id="job-1", status="completed", utterances=[_u(0, 1, "hi")],
+    ))
+    transcriber = WindowedTranscriber(backend, TranscriptionSettings(model="base"))
+    with patch.object(asr_live, "_WINDOW_POLL_SECONDS", 0):
+        utterances = await transcriber.transcribe("/tmp/window.mp3", 3.0)
+    assert [u.text for u in utterances] == ["hi"]
+    backend.submit.assert_awaited_once()
+    assert backend.submit.call_args.kwargs["audio_seconds"] == 3.0
+
+
+def test_live_socket_streams_and_persists(monkeypatch, window_audio):
+    monkeypatch.setattr(live_router.settings, "LIVE_TRANSCRIPTION_ENABLED", True)
+    monkeypatch.setattr(live_router.settings, "LIVE_INTERVAL_SECONDS", 0.01)
+    transcriber = FakeTranscriber([
+        [_u(0, 2, "hello"), _u(8, 9.5, "wor")],
+        [_u(6, 7.5, "world")],
+    ])
+    backend = MagicMock()
+    backend.live_transcriber.return_value = transcriber
+
+    client = TestClient(app)
+    with patch("app.routers.live.get_asr_backend", return_value=backend), \
+            patch("app.routers.upload.convert_to_mp3", AsyncMock(side_effect=lambda path: path)):
+        with client.websocket_connect(
+            "/api/ws/live?language=en", headers={"x-auth-request-user": "dev-user"},
+        ) as ws:
+            ws.send_bytes(b"webm header and first cluster")
+            update = ws.receive_json()
+            assert update == {
+                "type": "transcript",
+                "final": [_u(0, 2, "hello").model_dump()],
+                "partial": [_u(8, 9.5, "wor").model_dump()],
+            }
+            ws.send_text(json.dumps({"type": "stop"}))
+            last = ws.receive_json()
+            while last["type"] == "transcript" and last["final"] == []:
+                last = ws.receive_json()  # a periodic pass can slip in before stop
+            assert [u["text"] for u in last["final"]] == ["world"]
+            done = ws.receive_json()
+
+    assert done["type"] == "done"
+    assert done["status"] == "completed"
+    assert done["file"]["original_filename"].startswith("recording-")
+    assert transcriber.closed
+
+    async def stored():
+        async with get_db() as db:
+            cursor = await db.execute(
+                """SELECT t.status, t.result_json, t.language, f.origin FROM transcriptions t
+                   JOIN files f ON f.id = t.file_id WHERE t.id = ?""",
+                (done["transcription_id"],),
+            )
+            return await cursor.fetchone()
+
+    row = asyncio.run(stored())
+    assert row["status"] == "completed"
+    assert row["origin"] == "recorder"
+    assert row["language"] == "en"
+    assert [u["text"] for u in json.loads(row["result_json"])] == ["hello", "world"]
+
+
+def test_live_socket_queues_recording_when_no_asr_slot_is_free(monkeypatch, window_audio):
+    monkeypatch.setattr(live_router.settings, "LIVE_TRANSCRIPTION_ENABLED", True)
+    monkeypatch.setattr(live_router.settings, "LIVE_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(live_router.settings, "ASR_MAX_CONCURRENT", 0)
+    transcriber = FakeTranscriber([[_u(0, 2, "hello")]])
+    backend = MagicMock()
+    backend.live_transcriber.return_value = transcriber
+
+    client = TestClient(app)
+    with patch("app.routers.live.get_asr_backend", return_value=backend), \
+            patch("app.routers.upload.convert_to_mp3", AsyncMock(side_effect=lambda path: path)):
+        with client.websocket_connect(
+            "/api/ws/live", headers={"x-auth-request-user": "dev-user"},
+        ) as ws:
+            ws.send_bytes(b"webm header and first cluster")
+            ws.send_text(json.dumps({"type": "stop"}))
+            done = ws.receive_json()
+
+    # Every slot taken: no window reached ASR, the recording waits in the queue
+    assert done["type"] == "done"
+    assert done["status"] == "pending"
+    assert transcriber.calls == []
+
+
+def test_live_session_is_discarded_when_the_run_fails(monkeypatch, window_audio):
+    monkeypatch.setattr(live_router.settings, "LIVE_TRANSCRIPTION_ENABLED", True)
+    backend = MagicMock()
+    backend.live_transcriber.return_value = FakeTranscriber([])
+    sessions = []
+
+    class TrackedSession(live.LiveSession):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            sessions.append(self)
+
+    client = TestClient(app)
+    with patch("app.routers.live.get_asr_backend", return_value=backend), \
+            patch("app.routers.live.LiveSession", TrackedSession), \
+            patch("app.routers.live._save", AsyncMock(side_effect=RuntimeError("disk full"))):
+        with pytest.raises(Exception):
+            with client.websocket_connect(
+                "/api/ws/live", headers={"x-auth-request-user": "dev-user"},
+            ) as ws:
+                ws.send_bytes(b"webm header and first cluster")
+                ws.send_text(json.dumps({"type": "stop"}))
+                ws.receive_json()
+
+    assert sessions[0]._file.closed
+    assert not os.path.exists(sessions[0].path)
+
+
+def test_live_socket_disabled_by_default():
+    client = TestClient(app)
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/ws/live", headers={"x-auth-request-user": "dev-user"}) as ws:
+            ws.receive_json()
+    assert exc.value.code == 4004
@@ -22,7 +22,7 @@ async def test_generate_summary():
     }
     mock_response.raise_for_status = MagicMock()
 
-    with patch("app.services.llm.ollama.httpx.AsyncClient") as MockClient:
+    with patch("app.services.llm.ollama.get_client") as MockClient:
         mock_client = AsyncMock()
         mock_client.post.return_value = mock_response
         mock_client.__aenter__ = AsyncMock(return_value=mock_client)
@@ -56,7 +56,7 @@ async def test_generate_protocol():
     }
     mock_response.raise_for_status = MagicMock()
 
-    with patch("app.services.llm.ollama.httpx.AsyncClient") as MockClient:
+    with patch("app.services.llm.ollama.get_client") as MockClient:
         mock_client = AsyncMock()
         mock_client.post.return_value = mock_response
         mock_client.__aenter__ = AsyncMock(return_value=mock_client)
@@ -93,7 +93,7 @@ async def test_generate_refinement():
     }
     mock_response.raise_for_status = MagicMock()
 
-    with patch("app.services.llm.ollama.httpx.AsyncClient") as MockClient:
+    with patch("app.services.llm.ollama.get_client") as MockClient:
         mock_client = AsyncMock()
         mock_client.post.return_value = mock_response
         mock_client.__aenter__ = AsyncMock(return_value=mock_client)
@@ -0,0 +1,73 @@
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import pytest
+import respx
+from httpx import AsyncClient, Response
+
+from app.services.asr.multipart import StreamingUpload
+
+
+async def _collect(body: StreamingUpload) -> list[bytes]:
+    return [chunk async for chunk in body]
+
+
+@pytest.mark.asyncio
+async def test_body_is_valid_multipart_with_exact_length(tmp_path):
+    audio = tmp_path / "talk.mp3"
+    audio.write_bytes(b"\x00\x01" * 5000)
+    body = StreamingUpload(str(audio), {"language_code": "de", "prompt": 'say "hi"'})
+
+    raw = b"".join(await _collect(body))
+
+    assert len(raw) == body.content_length == int(body.headers["Content-Length"])
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {body.headers['Content-Type']}\r\n\r\n".encode() + raw,
+    )
+    parts = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+    assert parts["language_code"].get_content() == "de"
+    assert parts["file"].get_filename() == "talk.mp3"
+    assert parts["file"].get_payload(decode=True) == audio.read_bytes()
+
+
+@pytest.mark.asyncio
+async def test_file_is_streamed_in_bounded_chunks(tmp_path):
+    audio = tmp_path / "long.mp3"
+    audio.write_bytes(b"x" * (3 * 1024 * 1024 + 17))
+    body = StreamingUpload(str(audio), {}, chunk_size=64 * 1024)
+
+    chunks = await _collect(body)
+
+    assert max(len(c) for c in chunks[1:-1]) <= 64 * 1024
+    assert body.sent_bytes == audio.stat().st_size
+    assert body.elapsed > 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_httpx_sends_streamed_body(tmp_path):
+    audio = tmp_path / "a.mp3"
+    audio.write_bytes(b"audio bytes")
+    route = respx.post("http://asr/v1/transcript").mock(return_value=Response(200))
+    body = StreamingUpload(str(audio), {"model": "base"})
+
+    async with AsyncClient() as client:
+        await client.post("http://asr/v1/transcript", headers=body.headers, content=body)
+
+    request = route.calls.last.request
+    assert request.headers["Content-Length"] == str(body.content_length)
+    assert b"audio bytes" in request.content
+
+
+@pytest.mark.asyncio
+async def test_progress_callback_sees_every_chunk(tmp_path):
+    audio = tmp_path / "a.mp3"
+    audio.write_bytes(b"x" * 1000)
+    calls = []
+
+    async def on_progress(sent, total):
+        calls.append((sent, total))
+
+    await _collect(StreamingUpload(str(audio), {}, chunk_size=400, on_progress=on_progress))
+
+    assert calls == [(400, 1000), (800, 1000), (1000, 1000)]
@@ -4,14 +4,15 @@ from app.services.asr.murmurai import MurmurAIBackend
 from app.services.asr.base import TranscriptionSettings
 
 @pytest.mark.asyncio
-async def test_submit_sends_correct_params():
+async def test_submit_sends_correct_params(tmp_path):
+    audio = tmp_path / "path.mp3"
+    audio.write_bytes(b"fake audio")
     backend = MurmurAIBackend()
     mock_response = MagicMock()
     mock_response.json.return_value = {"id": "job-123"}
     mock_response.raise_for_status = MagicMock()
 
-    with patch("app.services.asr.murmurai.httpx.AsyncClient") as MockClient, \
-         patch("builtins.open", MagicMock(return_value=MagicMock(__enter__=MagicMock(return_value=b""), __exit__=MagicMock(return_value=False)))):
+    with patch("app.services.asr.murmurai.get_client") as MockClient:
         mock_client = AsyncMock()
         mock_client.post.return_value = mock_response
         mock_client.__aenter__ = AsyncMock(return_value=mock_client)
@@ -19,11 +20,11 @@ async def test_submit_sends_correct_params():
         MockClient.return_value = mock_client
 
         settings_obj = TranscriptionSettings(language="de", model="large-v3", min_speakers=1, max_speakers=4)
-        job_id = await backend.submit("/fake/path.mp3", settings_obj)
+        job_id = await backend.submit(str(audio), settings_obj)
 
     assert job_id == "job-123"
     call_kwargs = mock_client.post.call_args
-    assert "language_code" in call_kwargs.kwargs.get("data", {})
+    assert "language_code" in call_kwargs.kwargs["content"].fields
 
 @pytest.mark.asyncio
 async def test_get_status_maps_murmurai_status():
@@ -32,7 +33,7 @@ async def test_get_status_maps_murmurai_status():
     mock_response.json.return_value = {"status": "processing"}
     mock_response.raise_for_status = MagicMock()
 
-    with patch("app.services.asr.murmurai.httpx.AsyncClient") as MockClient:
+    with patch("app.services.asr.murmurai.get_client") as MockClient:
         mock_client = AsyncMock()
         mock_client.get.return_value = mock_response
         mock_client.__aenter__ = AsyncMock(return_value=mock_client)
@@ -42,3 +43,21 @@ async def test_get_status_maps_murmurai_status():
         status = await backend.get_status("job-123")
 
     assert status.status == "processing"
+
+@pytest.mark.asyncio
+async def test_cancel_deletes_job_and_ignores_missing():
+    backend = MurmurAIBackend()
+    for status_code in (200, 404):
+        mock_response = MagicMock(status_code=status_code)
+        mock_response.raise_for_status = MagicMock()
+        with patch("app.services.asr.murmurai.get_client") as MockClient:
+            mock_client = AsyncMock()
+            mock_client.delete.return_value = mock_response
+            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+            mock_client.__aexit__ = AsyncMock(return_value=False)
+            MockClient.return_value = mock_client
+
+            await backend.cancel("job-123")
+
+        assert mock_client.delete.call_args.args[0].endswith("/v1/transcript/job-123")
+        assert mock_response.raise_for_status.called == (status_code != 404)
@@ -0,0 +1,62 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.database import get_db
+from app.main import app
+from app.models import Utterance
+from app.services import partial_results
+
+
+def _u(start: int, end: int, text: str) -> Utterance:
+    return Utterance(start=start, end=end, text=text, speaker="A")
+
+
+async def _insert(db, tid: str, status: str) -> None:
+    await db.execute("INSERT OR IGNORE INTO users (id, email) VALUES ('dev-user', 'dev@localhost')")
+    await db.execute(
+        "INSERT INTO transcriptions (id, user_id, status, result_json) VALUES (?, 'dev-user', ?, ?)",
+        (tid, status, '[{"start": 0, "end": 1, "text": "full", "speaker": null}]' if status == "completed" else None),
+    )
+
+
+@pytest.mark.asyncio
+async def test_store_appends_in_order_and_drops_stale():
+    async with get_db() as db:
+        await _insert(db, "running", "processing")
+        await _insert(db, "gone", "failed")
+        await partial_results.append(db, "running", [_u(0, 1000, "one"), _u(1000, 2000, "two")])
+        await partial_results.append(db, "running", [])
+        await partial_results.append(db, "running", [_u(600_000, 601_000, "three")])
+        await partial_results.append(db, "gone", [_u(0, 1000, "left over")])
+
+        assert [u.text for u in await partial_results.load(db, "running")] == ["one", "two", "three"]
+        assert await partial_results.summary(db, "running") == {"utterances": 3, "until_ms": 601_000}
+        assert await partial_results.summary(db, "missing") == {"utterances": 0, "until_ms": None}
+
+        assert await partial_results.drop_stale(db) == 1
+        await db.commit()
+        assert await partial_results.load(db, "gone") == []
+        assert len(await partial_results.load(db, "running")) == 3
+
+
+@pytest.mark.asyncio
+async def test_partial_query_serves_utterances_while_running():
+    async with get_db() as db:
+        await _insert(db, "running", "processing")
+        await _insert(db, "done", "completed")
+        await partial_results.append(db, "running", [_u(0, 1000, "first hour")])
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/transcription/running")).status_code == 400
+        partial = (await client.get("/api/transcription/running?partial=true")).json()
+        status = (await client.get("/api/status/running")).json()
+        done = (await client.get("/api/transcription/done?partial=true")).json()
+
+    assert partial["partial"] is True
+    assert partial["status"] == "processing"
+    assert [u["text"] for u in partial["utterances"]] == ["first hour"]
+    assert status["partial_utterances"] == 1
+    # Completed jobs return their full result either way
+    assert done["partial"] is False
+    assert [u["text"] for u in done["utterances"]] == ["full"]
@@ -0,0 +1,59 @@
+import random
+from itertools import islice
+
+import pytest
+
+from app.database import get_db
+from app.services.asr.polling import AdaptivePolling, FixedPolling, RealtimeFactorEstimator
+
+
+def test_adaptive_first_poll_waits_for_expected_completion():
+    strategy = AdaptivePolling(min_delay=2, max_delay=60, rng=random.Random(0))
+    first = next(strategy.delays(expected_seconds=100))
+    assert first == 80  # 0.8 x expected
+
+
+def test_adaptive_first_poll_never_below_min_delay():
+    strategy = AdaptivePolling(min_delay=2, max_delay=60)
+    assert next(strategy.delays(expected_seconds=None)) == 2
+    assert next(strategy.delays(expected_seconds=0.5)) == 2
+
+
+def test_adaptive_backoff_grows_and_is_capped():
+    strategy = AdaptivePolling(min_delay=2, max_delay=10, factor=2, jitter=0.2, rng=random.Random(1))
+    delays = list(islice(strategy.delays(expected_seconds=None), 1, 8))
+    assert 1.6 <= delays[0] <= 2.4
+    assert 3.2 <= delays[1] <= 4.8
+    assert all(d <= 12 for d in delays)  # cap plus max jitter
+    assert all(d >= 8 for d in delays[3:])
+
+
+def test_fixed_polling():
+    assert list(islice(FixedPolling(interval=5, first=0).delays(None), 3)) == [0, 5, 5]
+
+
+def test_rtf_estimator_moving_average():
+    est = RealtimeFactorEstimator()
+    default = est.get("murmurai", "base")
+    assert est.expected_seconds("murmurai", "base", 100) == 100 * default
+    est.observe("murmurai", "base", 0.5)
+    assert est.get("murmurai", "base") == 0.5
+    est.observe("murmurai", "base", 1.5)
+    assert est.get("murmurai", "base") == 0.7
+    assert est.expected_seconds("murmurai", "base", None) is None
+
+
+@pytest.mark.asyncio
+async def test_rtf_estimator_persists_shared_average():
+    async with get_db() as db:
+        worker = RealtimeFactorEstimator()
+        await worker.persist(db, "murmurai", "large", 0.5)
+        await worker.persist(db, "murmurai", "large", 1.5)
+        assert worker.get("murmurai", "large") == pytest.approx(0.7)
+
+        # Another process (or a restart) starts from the stored average
+        api = RealtimeFactorEstimator()
+        await api.load(db)
+        assert api.get("murmurai", "large") == pytest.approx(0.7)
+        cursor = await db.execute("SELECT samples FROM rtf_estimates WHERE model = 'large'")
+        assert (await cursor.fetchone())[0] == 2
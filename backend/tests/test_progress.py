@@ -0,0 +1,118 @@
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.database import get_db
+from app.main import app
+from app.models import TranscriptionResult, TranscriptionStatus, Utterance
+from app.services import progress
+from app.services.asr.polling import FixedPolling
+
+
+def _row(**values):
+    row = {"status": "processing", "stage": None, "progress": None,
+           "stage_detail_json": None, "stage_started_at": None}
+    row.update(values)
+    return row
+
+
+def test_describe_estimates_transcribing_from_elapsed_time():
+    started = (datetime.now(timezone.utc) - timedelta(seconds=30)).isoformat()
+    row = _row(stage="transcribing", stage_started_at=started,
+               stage_detail_json=json.dumps({"expected_seconds": 120}))
+    described = progress.describe(row)
+    assert described["stage"] == "transcribing"
+    assert described["progress"] == pytest.approx(0.25, abs=0.02)
+
+    # Overdue jobs never claim to be finished
+    row["stage_detail_json"] = json.dumps({"expected_seconds": 10})
+    assert progress.describe(row)["progress"] == 0.99
+    # The backend's own figure wins over the estimate
+    assert progress.describe({**row, "progress": 0.4})["progress"] == 0.4
+
+
+def test_describe_queued_and_finished_jobs():
+    assert progress.describe(_row(status="pending", stage="uploading"), position=3) == {
+        "stage": "queued", "progress": None, "detail": {"position": 3},
+    }
+    assert progress.describe(_row(status="completed"))["stage"] is None
+
+
+@pytest.mark.asyncio
+async def test_status_reports_queue_position():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        ids = []
+        for name in ("a.mp3", "b.mp3"):
+            upload = await client.post("/api/upload", files={"file": (name, name.encode(), "audio/mpeg")})
+            resp = await client.post("/api/transcribe", json={"file_id": upload.json()["id"]})
+            ids.append(resp.json()["id"])
+        first = await client.get(f"/api/status/{ids[0]}")
+        second = await client.get(f"/api/status/{ids[1]}")
+
+    assert first.json()["stage"] == "queued"
+    assert first.json()["stage_detail"] == {"position": 1}
+    assert second.json()["stage_detail"] == {"position": 2}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_records_stages(tmp_path):
+    from app.services.job_queue import claim_next_job
+    from app.services.pipeline import run_transcription_job
+
+    audio = tmp_path / "a.mp3"
+    audio.write_bytes(b"x" * 100)
+    async with get_db() as db:
+        await db.execute("INSERT INTO users (id) VALUES ('dev-user')")
+        await db.execute("INSERT INTO files (id, user_id, mp3_path) VALUES ('f1', 'dev-user', ?)", (str(audio),))
+        await db.execute(
+            """INSERT INTO transcriptions (id, user_id, file_id, status, model, audio_duration)
+               VALUES ('t1', 'dev-user', 'f1', 'pending', 'base', 60)""",
+        )
+        await db.commit()
+        job = await claim_next_job(db, worker_id="test-worker")
+
+    seen = []
+
+    async def snapshot():
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT status, stage, progress, stage_detail_json, stage_started_at FROM transcriptions",
+            )
+            seen.append(progress.describe(await cursor.fetchone()))
+
+    async def submit(path, ts, audio_seconds=None, on_progress=None):
+        await on_progress(50, 100)
+        await snapshot()
+        return "job-1"
+
+    async def get_status(job_id):
+        await snapshot()
+        return TranscriptionStatus(id=job_id, status="completed")
+
+    backend = AsyncMock()
+    backend.resumable = True
+    backend.supports_callbacks = False
+    backend.polling_strategy = MagicMock(return_value=FixedPolling(interval=0))
+    backend.submit.side_effect = submit
+    backend.get_status.side_effect = get_status
+    backend.get_result.return_value = TranscriptionResult(
+        id="job-1", status="completed", utterances=[Utterance(start=0, end=1, text="hi")],
+    )
+    with patch("app.services.pipeline.get_asr_backend", return_value=backend):
+        await run_transcription_job(job)
+
+    assert seen[0]["stage"] == "uploading"
+    assert seen[0]["progress"] == 0.5
+    assert seen[0]["detail"] == {"bytes_sent": 50, "bytes_total": 100}
+    assert seen[1]["stage"] == "transcribing"
+    assert seen[1]["detail"]["expected_seconds"] > 0
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status, stage, progress FROM transcriptions WHERE id = 't1'")
+        assert dict(await cursor.fetchone()) == {"status": "completed", "stage": None, "progress": None}
+        # A whole-file run feeds the realtime factor estimate
+        cursor = await db.execute("SELECT COUNT(*) FROM rtf_estimates WHERE model = 'base'")
+        assert (await cursor.fetchone())[0] == 1
@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from httpx import AsyncClient, ASGITransport
+
+from app.database import get_db
+from app.models import TranscriptionStatus, TranscriptionResult, Utterance
+from app.services.asr import result_cache
+from app.services.asr.base import TranscriptionSettings
+from app.services.asr.polling import FixedPolling
+
+
+def test_cache_key_normalizes_equivalent_settings():
+    a = TranscriptionSettings(language="auto", model="base", initial_prompt="  ", hotwords=None)
+    b = TranscriptionSettings(language=None, model="base", initial_prompt=None, hotwords="")
+    c = TranscriptionSettings(language="de", model="base")
+    assert result_cache.cache_key("h", "whisperx", a) == result_cache.cache_key("h", "whisperx", b)
+    assert result_cache.cache_key("h", "whisperx", a) != result_cache.cache_key("h", "whisperx", c)
+    assert result_cache.cache_key("h", "whisperx", a) != result_cache.cache_key("h", "murmurai", a)
+    assert result_cache.cache_key("h", "whisperx", a) != result_cache.cache_key("h2", "whisperx", a)
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(result_cache.settings, "ASR_RESULT_CACHE_MAX_ENTRIES", 2)
+    ts = TranscriptionSettings()
+    utterances = [Utterance(start=0, end=1, text="hi")]
+    async with get_db() as db:
+        await result_cache.store(db, "a", "whisperx", ts, utterances)
+        await result_cache.store(db, "b", "whisperx", ts, utterances)
+        assert await result_cache.lookup(db, "a", "whisperx", ts) is not None
+        await result_cache.store(db, "c", "whisperx", ts, utterances)
+
+        assert await result_cache.lookup(db, "b", "whisperx", ts) is None
+        assert await result_cache.lookup(db, "a", "whisperx", ts) is not None
+        assert await result_cache.lookup(db, "c", "whisperx", ts) is not None
+
+
+@pytest.mark.asyncio
+async def test_evicts_beyond_size_limit(monkeypatch):
+    monkeypatch.setattr(result_cache.settings, "ASR_RESULT_CACHE_MB", 250 / (1024 * 1024))
+    ts = TranscriptionSettings()
+    utterances = [Utterance(start=0, end=1, text="x" * 40)]
+    async with get_db() as db:
+        for content_hash in ("a", "b", "c"):
+            await result_cache.store(db, content_hash, "whisperx", ts, utterances)
+        cursor = await db.execute("SELECT content_hash FROM asr_result_cache")
+        assert {row[0] for row in await cursor.fetchall()} == {"b", "c"}
+
+
+@pytest.mark.asyncio
+async def test_identical_audio_and_settings_skip_asr():
+    from app.main import app
+    from app.services.job_queue import claim_next_job
+    from app.services.pipeline import run_transcription_job
+
+    mock_asr = AsyncMock()
+    mock_asr.polling_strategy = MagicMock(return_value=FixedPolling(interval=0))
+    mock_asr.submit.return_value = "asr-job-1"
+    mock_asr.get_status.return_value = TranscriptionStatus(id="asr-job-1", status="completed")
+    mock_asr.get_result.return_value = TranscriptionResult(
+        id="asr-job-1", status="completed",
+        utterances=[Utterance(start=0, end=1000, text="Hello", speaker="Speaker 1")],
+    )
+
+    transport = ASGITransport(app=app)
+    ids = []
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        for name, prompt in (("a.mp3", None), ("b.mp3", "  ")):
+            upload = await client.post("/api/upload", files={"file": (name, b"same audio", "audio/mpeg")})
+            resp = await client.post("/api/transcribe", json={
+                "file_id": upload.json()["id"], "language": "en", "initial_prompt": prompt,
+            })
+            ids.append(resp.json()["id"])
+            async with get_db() as db:
+                job = await claim_next_job(db, worker_id="w1")
+            with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+                await run_transcription_job(job)
+        # The first user's edits stay theirs
+        await client.put(f"/api/transcription/{ids[0]}", json={
+            "utterances": [{"start": 0, "end": 1000, "text": "Edited", "speaker": "Speaker 1"}],
+        })
+        second = await client.get(f"/api/transcription/{ids[1]}")
+
+    mock_asr.submit.assert_awaited_once()
+    assert second.json()["utterances"][0]["text"] == "Hello"
@@ -0,0 +1,160 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.database import get_db
+from app.services import scheduler
+from app.services.job_queue import claim_next_job
+from app.services.scheduler import pick_next
+
+
+def _job(jid: str, user: str) -> dict:
+    return {"id": jid, "user_id": user}
+
+
+def test_pick_next_prefers_user_with_fewest_running_jobs():
+    candidates = [_job("a1", "alice"), _job("a2", "alice"), _job("b1", "bob")]
+    assert pick_next(candidates, {"alice": 1})["id"] == "b1"
+    assert pick_next(candidates, {})["id"] == "a1"
+
+
+def test_pick_next_respects_global_cap(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "ASR_MAX_CONCURRENT", 2)
+    assert pick_next([_job("b1", "bob")], {"alice": 2}) is None
+
+
+def test_pick_next_respects_per_user_cap(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "ASR_MAX_CONCURRENT", 10)
+    monkeypatch.setattr(scheduler.settings, "ASR_MAX_CONCURRENT_PER_USER", 1)
+    candidates = [_job("a2", "alice"), _job("b1", "bob")]
+    assert pick_next(candidates, {"alice": 1, "bob": 1}) is None
+    assert pick_next(candidates, {"alice": 1})["id"] == "b1"
+
+
+@pytest.mark.asyncio
+async def test_claim_interleaves_users(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "ASR_MAX_CONCURRENT", 10)
+    async with get_db() as db:
+        for user in ("alice", "bob"):
+            await db.execute("INSERT INTO users (id) VALUES (?)", (user,))
+        rows = [("a1", "alice", "00:01"), ("a2", "alice", "00:02"), ("a3", "alice", "00:03"),
+                ("b1", "bob", "00:04")]
+        for tid, user, t in rows:
+            await db.execute(
+                "INSERT INTO transcriptions (id, user_id, status, created_at) VALUES (?, ?, 'pending', ?)",
+                (tid, user, f"2026-01-01 00:{t}"),
+            )
+        await db.commit()
+
+        order = []
+        for _ in range(4):
+            order.append((await claim_next_job(db, worker_id="w1"))["id"])
+
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_transcribe_rejected_with_retry_after_when_user_queue_full(monkeypatch):
+    from app.main import app
+    monkeypatch.setattr(scheduler.settings, "ASR_QUEUE_MAX_PER_USER", 1)
+    monkeypatch.setattr(scheduler.settings, "ASR_QUEUE_RETRY_AFTER_SECONDS", 42)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload_resp = await client.post(
+            "/api/upload", files={"file": ("test.mp3", b"fake", "audio/mpeg")},
+        )
+        body = {"file_id": upload_resp.json()["id"], "model": "base"}
+        first = await client.post("/api/transcribe", json=body)
+        second = await client.post("/api/transcribe", json=body)
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "42"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_cannot_overshoot_user_queue_limit(monkeypatch):
+    import asyncio
+    from app.main import app
+    monkeypatch.setattr(scheduler.settings, "ASR_QUEUE_MAX_PER_USER", 2)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload_resp = await client.post(
+            "/api/upload", files={"file": ("test.mp3", b"fake", "audio/mpeg")},
+        )
+        body = {"file_id": upload_resp.json()["id"], "model": "base"}
+        responses = await asyncio.gather(*(client.post("/api/transcribe", json=body) for _ in range(5)))
+
+    assert sorted(r.status_code for r in responses) == [200, 200, 429, 429, 429]
+
+
+def _timed_job(jid: str, *, cls: str = "interactive", duration: float | None = None,
+               wait: float = 0, user: str = "u1") -> dict:
+    return {"id": jid, "user_id": user, "priority_class": cls,
+            "audio_duration": duration, "wait_seconds": wait}
+
+
+def test_pick_next_orders_by_priority_class():
+    candidates = [_timed_job("batch", cls="batch", duration=10),
+                  _timed_job("upload", duration=10),
+                  _timed_job("rec", cls="recorder", duration=10)]
+    assert pick_next(candidates, {})["id"] == "rec"
+    assert pick_next(candidates[:2], {})["id"] == "upload"
+
+
+def test_pick_next_prefers_shortest_job_within_class():
+    candidates = [_timed_job("lecture", duration=3 * 3600, wait=5),
+                  _timed_job("clip", duration=120)]
+    assert pick_next(candidates, {})["id"] == "clip"
+
+
+def test_pick_next_ages_long_waiting_jobs(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "ASR_QUEUE_AGING_RATE", 1.0)
+    monkeypatch.setattr(scheduler.settings, "ASR_QUEUE_PROMOTE_SECONDS", 1800)
+    # Waited long enough that its aging credit beats a fresh short clip
+    candidates = [_timed_job("lecture", duration=3 * 3600, wait=1700),
+                  _timed_job("clip", duration=120)]
+    assert pick_next(candidates, {})["id"] == "lecture"
+    # Batch job promoted past fresh interactive uploads after waiting
+    candidates = [_timed_job("batch", cls="batch", duration=60, wait=1800),
+                  _timed_job("upload", duration=600)]
+    assert pick_next(candidates, {})["id"] == "batch"
+
+
+@pytest.mark.asyncio
+async def test_transcribe_assigns_priority_class_from_origin_and_token():
+    from app.main import app
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload = await client.post(
+            "/api/upload", files={"file": ("test.mp3", b"fake", "audio/mpeg")},
+        )
+        recording = await client.post(
+            "/api/upload?source=recorder", files={"file": ("rec.mp3", b"fake", "audio/mpeg")},
+        )
+        plain = await client.post("/api/transcribe", json={"file_id": upload.json()["id"]})
+        recorded = await client.post("/api/transcribe", json={"file_id": recording.json()["id"]})
+
+    async with get_db() as db:
+        cursor = await db.execute("SELECT id, priority_class FROM transcriptions")
+        classes = {row["id"]: row["priority_class"] for row in await cursor.fetchall()}
+    assert classes[plain.json()["id"]] == "interactive"
+    assert classes[recorded.json()["id"]] == "recorder"
+    assert scheduler.priority_class_for(via_api_token=True, origin="recorder") == "batch"
+
+
+def test_pick_next_skips_jobs_for_full_pool(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "ASR_MAX_CONCURRENT", 10)
+    monkeypatch.setattr(scheduler.settings, "ASR_POOLS", "gpu=http://gpu1:8880")
+    monkeypatch.setattr(scheduler.settings, "ASR_MODEL_POOLS", "large-v3=gpu")
+    monkeypatch.setattr(scheduler.settings, "ASR_POOL_MAX_CONCURRENT", "gpu=1")
+    candidates = [{**_timed_job("big", duration=60, wait=600), "model": "large-v3"},
+                  {**_timed_job("small", duration=600), "model": "base"}]
+    assert pick_next(candidates, {}, {})["id"] == "big"
+    # The GPU pool is busy: the small-model job doesn't wait behind it
+    assert pick_next(candidates, {"u2": 1}, {"gpu": 1})["id"] == "small"
+    # The GPU endpoints are down: nothing for that pool is handed out
+    assert pick_next(candidates, {}, {}, {"gpu"})["id"] == "small"
+    assert pick_next(candidates[:1], {}, {}, {"gpu"}) is None
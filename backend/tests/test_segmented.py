@@ -0,0 +1,189 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models import TranscriptionResult, TranscriptionStatus, Utterance
+from app.services.asr import segmented
+from app.services.asr.base import TranscriptionSettings
+from app.services.asr.polling import FixedPolling
+from app.services.asr.segmented import Segment, plan_segments, stitch
+
+
+def _u(start: int, end: int, speaker: str, text: str = "x") -> Utterance:
+    return Utterance(start=start, end=end, text=text, speaker=speaker)
+
+
+def test_plan_segments_adds_overlap_before_each_cut():
+    segments = plan_segments(1500.0, [600.0, 1200.0], overlap=15)
+    assert [(s.start, s.cut, s.end) for s in segments] == [
+        (0.0, 0.0, 600.0), (585.0, 600.0, 1200.0), (1185.0, 1200.0, None),
+    ]
+
+
+def test_stitch_offsets_timestamps_and_reconciles_speakers():
+    segments = [Segment(0, 0.0, 0.0, 600.0), Segment(1, 590.0, 600.0, None)]
+    first = [_u(0, 5000, "A", "hello"), _u(592_000, 599_000, "B", "tail")]
+    # Second segment starts at 590s; its diarizer calls the overlap speaker "A"
+    # (really the first segment's "B") and introduces a new voice also named "B".
+    second = [_u(2000, 9000, "A", "tail"), _u(10_000, 20_000, "A", "more"),
+              _u(20_000, 30_000, "B", "new voice")]
+
+    merged = stitch(segments, [first, second])
+
+    assert [(u.start, u.text, u.speaker) for u in merged] == [
+        (0, "hello", "A"),
+        (592_000, "tail", "B"),
+        (600_000, "more", "B"),
+        (610_000, "new voice", "B-2"),
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrent, expected_peak", [(10, 3), (1, 2), (0, 1)])
+async def test_transcribe_segmented_runs_segments_concurrently(monkeypatch, tmp_path, max_concurrent, expected_peak):
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_MINUTES", 10)
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_OVERLAP_SECONDS", 0)
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_MAX_PARALLEL", 4)
+    # Segments beyond the job's own slot need free scheduler slots
+    monkeypatch.setattr(segmented.settings, "ASR_MAX_CONCURRENT", max_concurrent)
+
+    in_flight = 0
+    peak = 0
+
+    async def submit(path, ts, audio_seconds=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return path.rsplit("-", 1)[1].split(".")[0]
+
+    async def get_result(job_id):
+        return TranscriptionResult(id=job_id, status="completed",
+                                   utterances=[_u(1000, 2000, "A", f"seg{int(job_id)}")])
+
+    backend = AsyncMock()
+    backend.submit.side_effect = submit
+    backend.get_result.side_effect = get_result
+    backend.get_status.return_value = TranscriptionStatus(id="x", status="completed")
+    backend.polling_strategy = MagicMock(return_value=FixedPolling(interval=0))
+
+    async def fake_extract(src, dst, start, end):
+        open(dst, "wb").close()
+        return dst
+
+    job_ids: list[str] = []
+    with patch.object(segmented, "detect_silences", AsyncMock(return_value=[])), \
+            patch.object(segmented, "extract_segment", fake_extract):
+        result, count = await segmented.transcribe_segmented(
+            backend, str(tmp_path / "in.mp3"), TranscriptionSettings(), 1800.0, user_id="u1",
+            work_dir=str(tmp_path / "work"), job_ids=job_ids,
+        )
+
+    assert count == 3
+    assert peak == expected_peak
+    assert sorted(job_ids) == ["0000", "0001", "0002"]
+    assert [(u.start, u.text) for u in result.utterances] == [
+        (1000, "seg0"), (601_000, "seg1"), (1_201_000, "seg2"),
+    ]
+    assert not (tmp_path / "work").exists()
+
+
+@pytest.mark.asyncio
+async def test_transcribe_segmented_publishes_segments_in_order(monkeypatch, tmp_path):
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_MINUTES", 10)
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_OVERLAP_SECONDS", 0)
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_MAX_PARALLEL", 3)
+
+    async def submit(path, ts, audio_seconds=None):
+        job_id = path.rsplit("-", 1)[1].split(".")[0]
+        # The first segment is the slowest
+        await asyncio.sleep({"0000": 0.06, "0001": 0.0, "0002": 0.03}[job_id])
+        return job_id
+
+    async def get_result(job_id):
+        return TranscriptionResult(id=job_id, status="completed",
+                                   utterances=[_u(1000, 2000, "A", f"seg{int(job_id)}")])
+
+    backend = AsyncMock()
+    backend.submit.side_effect = submit
+    backend.get_result.side_effect = get_result
+    backend.get_status.return_value = TranscriptionStatus(id="x", status="completed")
+    backend.polling_strategy = MagicMock(return_value=FixedPolling(interval=0))
+
+    async def fake_extract(src, dst, start, end):
+        open(dst, "wb").close()
+        return dst
+
+    published: list[list[str]] = []
+
+    async def on_utterances(utterances):
+        published.append([u.text for u in utterances])
+
+    with patch.object(segmented, "detect_silences", AsyncMock(return_value=[])), \
+            patch.object(segmented, "extract_segment", fake_extract):
+        result, _ = await segmented.transcribe_segmented(
+            backend, str(tmp_path / "in.mp3"), TranscriptionSettings(), 1800.0, user_id="u1",
+            work_dir=str(tmp_path / "work"), job_ids=[], on_utterances=on_utterances,
+        )
+
+    # Later segments wait for the first, then come out in order
+    assert published == [["seg0"], ["seg1"], ["seg2"]]
+    assert [u.text for u in result.utterances] == ["seg0", "seg1", "seg2"]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_runs_long_jobs_in_segments(monkeypatch, tmp_path):
+    from app.database import get_db
+    from app.services.job_queue import claim_next_job
+    from app.services.pipeline import run_transcription_job
+
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_MINUTES", 10)
+    monkeypatch.setattr(segmented.settings, "ASR_SEGMENT_OVERLAP_SECONDS", 0)
+    audio = tmp_path / "a.mp3"
+    audio.write_bytes(b"x")
+    async with get_db() as db:
+        await db.execute("INSERT INTO users (id) VALUES ('dev-user')")
+        await db.execute("INSERT INTO files (id, user_id, mp3_path) VALUES ('f1', 'dev-user', ?)", (str(audio),))
+        await db.execute(
+            """INSERT INTO transcriptions (id, user_id, file_id, status, audio_duration)
+               VALUES ('t1', 'dev-user', 'f1', 'pending', 1800)""",
+        )
+        await db.commit()
+        job = await claim_next_job(db, worker_id="test-worker")
+
+    async def submit(path, ts, audio_seconds=None):
+        return path.rsplit("-", 1)[1].split(".")[0]
+
+    async def get_result(job_id):
+        return TranscriptionResult(id=job_id, status="completed",
+                                   utterances=[_u(1000, 2000, "A", f"seg{int(job_id)}")])
+
+    backend = AsyncMock()
+    backend.supports_callbacks = False
+    backend.submit.side_effect = submit
+    backend.get_result.side_effect = get_result
+    backend.get_status.return_value = TranscriptionStatus(id="x", status="completed")
+    backend.polling_strategy = MagicMock(return_value=FixedPolling(interval=0))
+
+    async def fake_extract(src, dst, start, end):
+        open(dst, "wb").close()
+        return dst
+
+    with patch("app.services.pipeline.get_asr_backend", return_value=backend), \
+            patch.object(segmented, "detect_silences", AsyncMock(return_value=[])), \
+            patch.object(segmented, "extract_segment", fake_extract):
+        await run_transcription_job(job)
+
+    assert backend.submit.await_count == 3
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status, result_json FROM transcriptions WHERE id = 't1'")
+        row = await cursor.fetchone()
+    assert row["status"] == "completed"
+    assert [u["text"] for u in json.loads(row["result_json"])] == ["seg0", "seg1", "seg2"]
+    # Parts ran side by side: their wall time says nothing about the model's speed
+    async with get_db() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM rtf_estimates")
+        assert (await cursor.fetchone())[0] == 0
@@ -1,12 +1,15 @@
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 from app.models import TranscriptionStatus, TranscriptionResult, Utterance
+from app.services.asr.polling import FixedPolling
 
 @pytest.fixture
 def mock_asr():
     mock = AsyncMock()
+    mock.resumable = True
+    mock.polling_strategy = MagicMock(return_value=FixedPolling(interval=0))
     mock.submit.return_value = "asr-job-123"
     mock.get_status.return_value = TranscriptionStatus(id="asr-job-123", status="completed")
     mock.get_result.return_value = TranscriptionResult(
@@ -26,7 +29,7 @@ async def test_transcribe_creates_job(mock_asr):
         )
         file_id = upload_resp.json()["id"]
 
-        with patch("app.routers.transcription.get_asr_backend", return_value=mock_asr):
+        with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
             resp = await client.post("/api/transcribe", json={
                 "file_id": file_id, "language": "en", "model": "base",
             })
@@ -46,7 +49,7 @@ async def test_get_transcriptions_list(mock_asr):
         )
         file_id = upload_resp.json()["id"]
 
-        with patch("app.routers.transcription.get_asr_backend", return_value=mock_asr):
+        with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
             await client.post("/api/transcribe", json={
                 "file_id": file_id, "language": "en", "model": "base",
             })
@@ -71,7 +74,7 @@ async def test_archive_transcription(mock_asr):
         )
         file_id = upload_resp.json()["id"]
 
-        with patch("app.routers.transcription.get_asr_backend", return_value=mock_asr):
+        with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
             transcribe_resp = await client.post("/api/transcribe", json={
                 "file_id": file_id, "language": "en", "model": "base",
             })
@@ -94,3 +97,428 @@ async def test_archive_nonexistent_transcription():
     async with AsyncClient(transport=transport, base_url="http://test") as client:
         resp = await client.post("/api/transcription/nonexistent-id/archive")
     assert resp.status_code == 404
+
+@pytest.mark.asyncio
+async def test_queued_job_runs_to_completion(mock_asr):
+    from app.database import get_db
+    from app.services.pipeline import run_transcription_job
+    from app.services.job_queue import claim_next_job
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload_resp = await client.post(
+            "/api/upload",
+            files={"file": ("test.mp3", b"fake", "audio/mpeg")},
+        )
+        resp = await client.post("/api/transcribe", json={
+            "file_id": upload_resp.json()["id"], "language": "en", "model": "base",
+        })
+    transcription_id = resp.json()["id"]
+
+    async with get_db() as db:
+        job = await claim_next_job(db, worker_id="test-worker")
+    assert job["id"] == transcription_id
+
+    with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+        await run_transcription_job(job)
+
+    mock_asr.submit.assert_awaited_once()
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status, asr_job_id FROM transcriptions WHERE id = ?", (transcription_id,))
+        row = await cursor.fetchone()
+    assert row["status"] == "completed"
+    assert row["asr_job_id"] == "asr-job-123"
+
+
+@pytest.mark.asyncio
+async def test_orphaned_job_resumes_existing_asr_job(mock_asr):
+    from app.database import get_db
+    from app.services.pipeline import run_transcription_job
+
+    async with get_db() as db:
+        await db.execute("INSERT INTO users (id) VALUES ('dev-user')")
+        await db.execute("INSERT INTO files (id, user_id, mp3_path) VALUES ('f1', 'dev-user', '/tmp/x.mp3')")
+        await db.execute(
+            """INSERT INTO transcriptions (id, user_id, file_id, status, model, asr_job_id, attempts)
+               VALUES ('t1', 'dev-user', 'f1', 'processing', 'base', 'asr-job-123', 2)""",
+        )
+        await db.commit()
+        cursor = await db.execute(
+            "SELECT t.*, f.mp3_path FROM transcriptions t JOIN files f ON f.id = t.file_id WHERE t.id = 't1'",
+        )
+        job = dict(await cursor.fetchone())
+
+    with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+        await run_transcription_job(job)
+
+    mock_asr.submit.assert_not_awaited()
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status FROM transcriptions WHERE id = 't1'")
+        assert (await cursor.fetchone())["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_cancel_pending_transcription():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload_resp = await client.post(
+            "/api/upload",
+            files={"file": ("test.mp3", b"fake", "audio/mpeg")},
+        )
+        resp = await client.post("/api/transcribe", json={"file_id": upload_resp.json()["id"]})
+        transcription_id = resp.json()["id"]
+
+        cancel = await client.post(f"/api/transcription/{transcription_id}/cancel")
+        again = await client.post(f"/api/transcription/{transcription_id}/cancel")
+        status = await client.get(f"/api/status/{transcription_id}")
+        missing = await client.post("/api/transcription/nonexistent-id/cancel")
+
+    assert cancel.status_code == 200
+    assert cancel.json()["status"] == "cancelled"
+    assert again.status_code == 409
+    assert status.json()["status"] == "cancelled"
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_cancel_running_transcription_stops_asr_job(mock_asr):
+    import asyncio
+    from app.database import get_db
+    from app.services.job_queue import JobWorker
+    from app.services.pipeline import run_transcription_job
+
+    mock_asr.get_status.return_value = TranscriptionStatus(id="asr-job-123", status="processing")
+    mock_asr.polling_strategy = MagicMock(return_value=FixedPolling(interval=0.01))
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload_resp = await client.post(
+            "/api/upload",
+            files={"file": ("test.mp3", b"fake", "audio/mpeg")},
+        )
+        resp = await client.post("/api/transcribe", json={"file_id": upload_resp.json()["id"]})
+        transcription_id = resp.json()["id"]
+
+        worker = JobWorker(run_transcription_job, worker_id="test-worker")
+        worker.start()
+        try:
+            with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+                for _ in range(200):
+                    if mock_asr.get_status.await_count:
+                        break
+                    await asyncio.sleep(0.01)
+                cancel = await client.post(f"/api/transcription/{transcription_id}/cancel")
+                for _ in range(200):
+                    if not worker.running:
+                        break
+                    await asyncio.sleep(0.01)
+        finally:
+            await worker.stop()
+
+    assert cancel.status_code == 200
+    assert worker.running == set()
+    mock_asr.cancel.assert_awaited_once_with("asr-job-123")
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status FROM transcriptions WHERE id = ?", (transcription_id,))
+        assert (await cursor.fetchone())["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_worker_shutdown_leaves_asr_job_running(mock_asr):
+    import asyncio
+    from app.database import get_db
+    from app.services.job_queue import JobWorker
+    from app.services.pipeline import run_transcription_job
+
+    mock_asr.get_status.return_value = TranscriptionStatus(id="asr-job-123", status="processing")
+    mock_asr.polling_strategy = MagicMock(return_value=FixedPolling(interval=0.01))
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload_resp = await client.post(
+            "/api/upload",
+            files={"file": ("test.mp3", b"fake", "audio/mpeg")},
+        )
+        resp = await client.post("/api/transcribe", json={"file_id": upload_resp.json()["id"]})
+
+    worker = JobWorker(run_transcription_job, worker_id="test-worker")
+    with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+        worker.start()
+        for _ in range(200):
+            if mock_asr.get_status.await_count:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+
+    # Resumed by the next worker rather than cancelled
+    mock_asr.cancel.assert_not_awaited()
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status FROM transcriptions WHERE id = ?", (resp.json()["id"],))
+        assert (await cursor.fetchone())["status"] == "processing"
+
+
+@pytest.mark.asyncio
+async def test_silence_trimmed_job_reports_original_timestamps(mock_asr, monkeypatch):
+    from app.database import get_db
+    from app.services import pipeline
+    from app.services.job_queue import claim_next_job
+
+    monkeypatch.setattr(pipeline.settings, "ASR_TRIM_SILENCE", True)
+    monkeypatch.setattr(pipeline.settings, "ASR_TRIM_PADDING_SECONDS", 0)
+    monkeypatch.setattr(pipeline.settings, "ASR_TRIM_MIN_SAVED_SECONDS", 30)
+    mock_asr.get_result.return_value = TranscriptionResult(
+        id="asr-job-123", status="completed",
+        utterances=[Utterance(start=5000, end=15000, text="after the break")],
+    )
+
+    async def fake_compact(src, dst, regions):
+        open(dst, "wb").close()
+        return dst
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        upload_resp = await client.post("/api/upload", files={"file": ("test.mp3", b"fake", "audio/mpeg")})
+        resp = await client.post("/api/transcribe", json={"file_id": upload_resp.json()["id"]})
+    async with get_db() as db:
+        await db.execute("UPDATE transcriptions SET audio_duration = 600")
+        await db.commit()
+        job = await claim_next_job(db, worker_id="test-worker")
+
+    with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr), \
+            patch.object(pipeline, "detect_silences", AsyncMock(return_value=[(10.0, 500.0)])), \
+            patch.object(pipeline, "compact_audio", fake_compact):
+        await pipeline.run_transcription_job(job)
+
+    submitted = mock_asr.submit.call_args.args[0]
+    assert submitted.endswith(f"{resp.json()['id']}.mp3") and "trimmed" in submitted
+    async with get_db() as db:
+        cursor = await db.execute("SELECT result_json, speech_map_json FROM transcriptions")
+        row = await cursor.fetchone()
+    assert row["speech_map_json"] is not None
+    assert '"start": 5000, "end": 505000' in row["result_json"]
+
+
+async def _upload(client, name="test.mp3", content=b"fake"):
+    resp = await client.post("/api/upload", files={"file": (name, content, "audio/mpeg")})
+    return resp.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_batch_transcribe_queues_all_files():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        a = await _upload(client, "a.mp3", b"aaa")
+        b = await _upload(client, "b.mp3", b"bbb")
+        c = await _upload(client, "c.mp3", b"ccc")
+        resp = await client.post("/api/transcribe/batch", json={
+            "file_ids": [a, b],
+            "items": [{"file_id": c, "language": "de", "model": "large-v3"}],
+            "language": "en", "model": "base",
+        })
+        batch = await client.get(f"/api/batches/{resp.json()['id']}")
+
+    assert resp.status_code == 200
+    assert len(resp.json()["transcription_ids"]) == 3
+    body = batch.json()
+    assert body["status"] == "pending"
+    assert body["total"] == 3
+    assert body["counts"] == {"pending": 3}
+    assert [item["file_id"] for item in body["items"]] == [a, b, c]
+
+    from app.database import get_db
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT file_id, language, model FROM transcriptions WHERE batch_id = ?",
+            (body["id"],),
+        )
+        settings_by_file = {r["file_id"]: (r["language"], r["model"]) for r in await cursor.fetchall()}
+    assert settings_by_file == {a: ("en", "base"), b: ("en", "base"), c: ("de", "large-v3")}
+
+
+@pytest.mark.asyncio
+async def test_batch_transcribe_is_all_or_nothing(monkeypatch):
+    from app.services import scheduler
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        a = await _upload(client, "a.mp3", b"aaa")
+        b = await _upload(client, "b.mp3", b"bbb")
+        unknown = await client.post("/api/transcribe/batch", json={"file_ids": [a, "nope"]})
+        monkeypatch.setattr(scheduler.settings, "ASR_QUEUE_MAX_PER_USER", 2)
+        await client.post("/api/transcribe", json={"file_id": a})
+        over_limit = await client.post("/api/transcribe/batch", json={"file_ids": [a, b]})
+        empty = await client.post("/api/transcribe/batch", json={})
+        listing = await client.get("/api/transcriptions")
+
+    assert unknown.status_code == 404
+    assert over_limit.status_code == 429
+    assert empty.status_code == 422
+    assert len(listing.json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_larger_than_queue_limit_is_rejected_without_retry(monkeypatch):
+    from app.services import scheduler
+    monkeypatch.setattr(scheduler.settings, "ASR_QUEUE_MAX_PER_USER", 2)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        ids = [await _upload(client, f"{n}.mp3", n.encode()) for n in ("a", "b", "c")]
+        # The queue is empty, yet three jobs can never fit under a limit of two
+        resp = await client.post("/api/transcribe/batch", json={"file_ids": ids})
+        listing = await client.get("/api/transcriptions")
+
+    assert resp.status_code == 400
+    assert "retry-after" not in resp.headers
+    assert listing.json() == []
+
+
+@pytest.mark.asyncio
+async def test_batch_status_aggregates_finished_jobs():
+    from app.database import get_db
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        a = await _upload(client, "a.mp3", b"aaa")
+        b = await _upload(client, "b.mp3", b"bbb")
+        resp = await client.post("/api/transcribe/batch", json={"file_ids": [a, b]})
+        first, second = resp.json()["transcription_ids"]
+        async with get_db() as db:
+            await db.execute("UPDATE transcriptions SET status = 'completed' WHERE id = ?", (first,))
+            await db.commit()
+        running = await client.get(f"/api/batches/{resp.json()['id']}")
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE transcriptions SET status = 'failed', error_message = 'boom' WHERE id = ?",
+                (second,),
+            )
+            await db.commit()
+        done = await client.get(f"/api/batches/{resp.json()['id']}")
+        missing = await client.get("/api/batches/nonexistent")
+
+    assert running.json()["status"] == "processing"
+    assert done.json()["status"] == "partial"
+    assert done.json()["counts"] == {"completed": 1, "failed": 1}
+    assert done.json()["items"][1]["error"] == "boom"
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_job_is_held_while_asr_is_unreachable(mock_asr):
+    import httpx
+    from app.database import get_db
+    from app.services.asr.balancer import ASRUnavailableError
+    from app.services.job_queue import claim_next_job
+    from app.services.pipeline import run_transcription_job
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        file_id = await _upload(client)
+        resp = await client.post("/api/transcribe", json={"file_id": file_id})
+    transcription_id = resp.json()["id"]
+
+    async def attempt(error):
+        mock_asr.submit.side_effect = error
+        async with get_db() as db:
+            job = await claim_next_job(db, worker_id="test-worker")
+        with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+            await run_transcription_job(job)
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT status, attempts, claimed_by FROM transcriptions WHERE id = ?", (transcription_id,),
+            )
+            return dict(await cursor.fetchone())
+
+    # Breakers open: back in the queue, and the attempt doesn't count
+    assert await attempt(ASRUnavailableError("down")) == {"status": "pending", "attempts": 0, "claimed_by": None}
+    # Connection refused: the backend is down, not counted either
+    assert (await attempt(httpx.ConnectError("refused")))["attempts"] == 0
+    # A 5xx means the backend answered: it counts against JOB_MAX_ATTEMPTS
+    request = httpx.Request("POST", "http://elsewhere/transcribe")
+    error = httpx.HTTPStatusError("busy", request=request, response=httpx.Response(503, request=request))
+    assert (await attempt(error))["attempts"] == 1
+    # A genuine error still fails the job
+    assert (await attempt(ValueError("bad audio")))["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_job_outlasts_more_breaker_cycles_than_max_attempts(mock_asr, monkeypatch):
+    import httpx
+    from app.database import get_db
+    from app.services import job_queue
+    from app.services.asr import balancer
+    from app.services.pipeline import run_transcription_job
+
+    monkeypatch.setattr(job_queue.settings, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_FAILURES", 1)
+    # Open breakers turn half-open straight away, so every claim is a trial
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_SECONDS", 0)
+    pool = balancer.get_endpoint_pool()
+    endpoint = pool.endpoints[0]
+    down = True
+
+    async def submit(*args, **kwargs):
+        async with pool.request(endpoint, "submit"):
+            if down:
+                raise httpx.ConnectError("refused", request=httpx.Request("POST", f"{endpoint.url}/transcribe"))
+            return "asr-job-123"
+
+    mock_asr.submit.side_effect = submit
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        file_id = await _upload(client)
+        resp = await client.post("/api/transcribe", json={"file_id": file_id})
+    transcription_id = resp.json()["id"]
+
+    async def cycle():
+        async with get_db() as db:
+            job = await job_queue.claim_next_job(db, worker_id="test-worker")
+        assert job is not None
+        with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+            await run_transcription_job(job)
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT status, attempts FROM transcriptions WHERE id = ?", (transcription_id,),
+            )
+            return dict(await cursor.fetchone())
+
+    for _ in range(job_queue.settings.JOB_MAX_ATTEMPTS + 2):
+        assert await cycle() == {"status": "pending", "attempts": 0}
+    down = False
+    assert (await cycle())["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_file_that_keeps_failing_with_5xx_is_given_up(mock_asr, monkeypatch):
+    import httpx
+    from app.database import get_db
+    from app.services import job_queue
+    from app.services.asr import balancer
+    from app.services.pipeline import run_transcription_job
+
+    monkeypatch.setattr(job_queue.settings, "JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_FAILURES", 1)
+    monkeypatch.setattr(balancer.settings, "ASR_EJECT_SECONDS", 0)
+    pool = balancer.get_endpoint_pool()
+    endpoint = pool.endpoints[0]
+
+    async def submit(*args, **kwargs):
+        # The file's own 5xx trips the breaker, which mustn't pass for an outage
+        async with pool.request(endpoint, "submit"):
+            request = httpx.Request("POST", f"{endpoint.url}/transcribe")
+            raise httpx.HTTPStatusError("crash", request=request, response=httpx.Response(500, request=request))
+
+    mock_asr.submit.side_effect = submit
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        file_id = await _upload(client)
+        resp = await client.post("/api/transcribe", json={"file_id": file_id})
+    transcription_id = resp.json()["id"]
+
+    for _ in range(job_queue.settings.JOB_MAX_ATTEMPTS):
+        async with get_db() as db:
+            job = await job_queue.claim_next_job(db, worker_id="test-worker")
+        assert job is not None
+        with patch("app.services.pipeline.get_asr_backend", return_value=mock_asr):
+            await run_transcription_job(job)
+    async with get_db() as db:
+        assert await job_queue.claim_next_job(db, worker_id="test-worker") is None
+        cursor = await db.execute("SELECT status FROM transcriptions WHERE id = ?", (transcription_id,))
+        assert (await cursor.fetchone())["status"] == "failed"
@@ -1,9 +1,18 @@
+import os
+
 import pytest
 from unittest.mock import patch, AsyncMock
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 
 
+async def _fake_convert(path):
+    """Stand in for ffmpeg: an empty mp3 next to the input."""
+    mp3_path = os.path.splitext(path)[0] + ".mp3"
+    open(mp3_path, "wb").close()
+    return mp3_path
+
+
 @pytest.mark.asyncio
 async def test_upload_file():
     transport = ASGITransport(app=app)
@@ -35,7 +44,7 @@ async def test_upload_webm_file():
     """WebM files should be accepted for browser recordings."""
     transport = ASGITransport(app=app)
     with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert:
-        mock_convert.return_value = "/tmp/fake.mp3"
+        mock_convert.side_effect = _fake_convert
         async with AsyncClient(transport=transport, base_url="http://test") as client:
             response = await client.post(
                 "/api/upload",
@@ -118,7 +127,7 @@ async def test_rename_file_not_found():
 async def test_rename_preserves_extension():
     transport = ASGITransport(app=app)
     with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert:
-        mock_convert.return_value = "/tmp/fake.mp3"
+        mock_convert.side_effect = _fake_convert
         async with AsyncClient(transport=transport, base_url="http://test") as client:
             upload_resp = await client.post(
                 "/api/upload",
@@ -140,7 +149,7 @@ async def test_rename_strips_caller_supplied_extension():
     # "meeting.webm" + original ".webm" must not become "meeting.webm.webm".
     transport = ASGITransport(app=app)
     with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert:
-        mock_convert.return_value = "/tmp/fake.mp3"
+        mock_convert.side_effect = _fake_convert
         async with AsyncClient(transport=transport, base_url="http://test") as client:
             upload_resp = await client.post(
                 "/api/upload",
@@ -175,7 +184,7 @@ async def test_upload_with_has_video_param():
     """Recorder can pass has_video query param to skip ffprobe."""
     transport = ASGITransport(app=app)
     with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert:
-        mock_convert.return_value = "/tmp/fake.mp3"
+        mock_convert.side_effect = _fake_convert
         async with AsyncClient(transport=transport, base_url="http://test") as client:
             response = await client.post(
                 "/api/upload?has_video=false",
@@ -192,7 +201,7 @@ async def test_upload_with_has_video_true():
     transport = ASGITransport(app=app)
     with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert, \
          patch("app.routers.upload.has_video_stream", new_callable=AsyncMock) as mock_detect:
-        mock_convert.return_value = "/tmp/fake.mp3"
+        mock_convert.side_effect = _fake_convert
         mock_detect.return_value = True
         async with AsyncClient(transport=transport, base_url="http://test") as client:
             response = await client.post(
@@ -202,3 +211,362 @@ async def test_upload_with_has_video_true():
     assert response.status_code == 200
     data = response.json()
     assert data["has_video"] is True
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_share_stored_media():
+    from app.database import get_db
+
+    transport = ASGITransport(app=app)
+    payload = b"\x1a\x45\xdf\xa3" + b"\x01" * 100
+    with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert, \
+            patch("app.routers.upload.has_video_stream", new_callable=AsyncMock, return_value=False):
+        mock_convert.side_effect = lambda path: path
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/api/upload", files={"file": ("a.webm", payload, "audio/webm")})
+            second = await client.post("/api/upload", files={"file": ("b.webm", payload, "audio/webm")})
+    assert first.status_code == second.status_code == 200
+    mock_convert.assert_called_once()
+
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT id, file_path, content_hash FROM files WHERE id IN (?, ?)",
+            (first.json()["id"], second.json()["id"]),
+        )
+        rows = await cursor.fetchall()
+    assert len({row["file_path"] for row in rows}) == 1
+    assert len({row["content_hash"] for row in rows}) == 1
+    assert "/blobs/" in rows[0]["file_path"]
+
+
+@pytest.mark.asyncio
+async def test_shared_blob_removed_with_last_reference():
+    import os
+
+    transport = ASGITransport(app=app)
+    payload = b"shared mp3 content"
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        ids = []
+        for name in ("one.mp3", "two.mp3"):
+            upload = await client.post("/api/upload", files={"file": (name, payload, "audio/mpeg")})
+            tr = await client.post("/api/transcribe", json={"file_id": upload.json()["id"]})
+            ids.append(tr.json()["id"])
+
+        from app.database import get_db
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT f.file_path FROM files f JOIN transcriptions t ON t.file_id = f.id WHERE t.id = ?",
+                (ids[0],),
+            )
+            path = (await cursor.fetchone())["file_path"]
+
+        await client.delete(f"/api/transcription/{ids[0]}")
+        assert os.path.exists(path)
+        await client.delete(f"/api/transcription/{ids[1]}")
+        assert not os.path.exists(path)
+
+
+@pytest.mark.asyncio
+async def test_converted_mp3_does_not_overwrite_an_original_mp3_of_the_same_bytes():
+    from app.database import get_db
+
+    async def convert(path):
+        if path.endswith(".mp3"):
+            return path
+        mp3_path = os.path.splitext(path)[0] + ".mp3"
+        with open(mp3_path, "wb") as f:
+            f.write(b"transcoded")
+        return mp3_path
+
+    transport = ASGITransport(app=app)
+    payload = b"ID3" + b"\x03" * 100
+    with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert, \
+            patch("app.routers.upload.has_video_stream", new_callable=AsyncMock, return_value=False):
+        mock_convert.side_effect = convert
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            mp3 = (await client.post("/api/upload", files={"file": ("a.mp3", payload, "audio/mpeg")})).json()
+            webm = (await client.post("/api/upload", files={"file": ("a.webm", payload, "audio/webm")})).json()
+
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT id, file_path, mp3_path FROM files WHERE id IN (?, ?)", (mp3["id"], webm["id"]),
+        )
+        rows = {row["id"]: row for row in await cursor.fetchall()}
+    with open(rows[mp3["id"]]["file_path"], "rb") as f:
+        assert f.read() == payload
+    with open(rows[webm["id"]]["mp3_path"], "rb") as f:
+        assert f.read() == b"transcoded"
+
+
+@pytest.mark.asyncio
+async def test_same_content_under_another_extension_keeps_its_media_type():
+    from app.database import get_db
+
+    transport = ASGITransport(app=app)
+    payload = b"\x1a\x45\xdf\xa3" + b"\x02" * 100
+    with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert, \
+            patch("app.routers.upload.has_video_stream", new_callable=AsyncMock, return_value=False):
+        mock_convert.side_effect = _fake_convert
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            webm = (await client.post("/api/upload", files={"file": ("a.webm", payload, "audio/webm")})).json()
+            mp4 = (await client.post("/api/upload", files={"file": ("a.mp4", payload, "video/mp4")})).json()
+            webm_media = await client.get(f"/api/media/{webm['id']}")
+            mp4_media = await client.get(f"/api/media/{mp4['id']}")
+
+            async with get_db() as db:
+                cursor = await db.execute(
+                    "SELECT id, file_path, mp3_path FROM files WHERE id IN (?, ?)", (webm["id"], mp4["id"]),
+                )
+                rows = {row["id"]: row for row in await cursor.fetchall()}
+            transcription = await client.post("/api/transcribe", json={"file_id": webm["id"]})
+            await client.delete(f"/api/transcription/{transcription.json()['id']}")
+
+    assert webm_media.headers["content-type"] == "video/webm"
+    assert mp4_media.headers["content-type"] == "video/mp4"
+    assert rows[webm["id"]]["file_path"] != rows[mp4["id"]]["file_path"]
+    assert rows[webm["id"]]["mp3_path"] == rows[mp4["id"]]["mp3_path"]
+    # The webm original is gone; the mp3 the mp4 upload still uses is not
+    assert not os.path.exists(rows[webm["id"]]["file_path"])
+    assert os.path.exists(rows[mp4["id"]]["file_path"])
+    assert os.path.exists(rows[mp4["id"]]["mp3_path"])
+
+
+@pytest.mark.asyncio
+async def test_upload_session_appends_chunks_and_finalizes():
+    from app.database import get_db
+    transport = ASGITransport(app=app)
+    with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert:
+        mock_convert.side_effect = _fake_convert
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            session = (await client.post(
+                "/api/upload/sessions",
+                json={"filename": "recording.webm", "has_video": False, "source": "recorder"},
+            )).json()
+            assert session["offset"] == 0
+            sid = session["id"]
+
+            first = await client.patch(f"/api/upload/sessions/{sid}?offset=0", content=b"webm header ")
+            assert first.json()["offset"] == 12
+            # A repeated chunk is refused and told where to continue
+            repeated = await client.patch(f"/api/upload/sessions/{sid}?offset=0", content=b"webm header ")
+            assert repeated.status_code == 409
+            assert repeated.headers["upload-offset"] == "12"
+            await client.patch(f"/api/upload/sessions/{sid}?offset=12", content=b"and clusters")
+
+            response = await client.post(f"/api/upload/sessions/{sid}/finalize")
+            again = await client.post(f"/api/upload/sessions/{sid}/finalize")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["original_filename"] == "recording.webm"
+    assert data["file_size"] == 24
+    assert data["has_video"] is False
+    mock_convert.assert_awaited_once()
+    async with get_db() as db:
+        cursor = await db.execute("SELECT file_path FROM files WHERE id = ?", (data["id"],))
+        with open((await cursor.fetchone())["file_path"], "rb") as f:
+            assert f.read() == b"webm header and clusters"
+    assert again.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_session_checks_type_and_size():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        rejected = await client.post("/api/upload/sessions", json={"filename": "notes.txt"})
+        sid = (await client.post("/api/upload/sessions", json={"filename": "talk.mp3"})).json()["id"]
+        with patch("app.routers.upload.MAX_FILE_SIZE", 8):
+            await client.patch(f"/api/upload/sessions/{sid}?offset=0", content=b"12345")
+            too_large = await client.patch(f"/api/upload/sessions/{sid}?offset=5", content=b"6789")
+        # The refused chunk left nothing behind
+        resumed = await client.patch(f"/api/upload/sessions/{sid}?offset=5", content=b"6")
+        aborted = await client.delete(f"/api/upload/sessions/{sid}")
+        gone = await client.patch(f"/api/upload/sessions/{sid}?offset=6", content=b"7")
+
+    assert rejected.status_code == 400
+    assert too_large.status_code == 413
+    assert resumed.json()["offset"] == 6
+    assert aborted.status_code == 200
+    assert gone.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_resumable_upload_validates_size_and_checksum():
+    import hashlib
+    content = b"0123456789" * 10
+    transport = ASGITransport(app=app)
+    with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert:
+        mock_convert.side_effect = _fake_convert
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            too_big = await client.post("/api/upload/sessions", json={"filename": "a.mp3", "size": 2 * 1024 ** 3})
+            sid = (await client.post("/api/upload/sessions", json={
+                "filename": "lecture.mp3", "size": len(content), "sha256": hashlib.sha256(content).hexdigest(),
+            })).json()["id"]
+            await client.patch(f"/api/upload/sessions/{sid}?offset=0", content=content[:60])
+            early = await client.post(f"/api/upload/sessions/{sid}/finalize")
+            # After a dropped connection the client asks where to go on
+            status = await client.get(f"/api/upload/sessions/{sid}")
+            past_end = await client.patch(f"/api/upload/sessions/{sid}?offset=60", content=content[60:] + b"x")
+            await client.patch(f"/api/upload/sessions/{sid}?offset=60", content=content[60:])
+            done = await client.post(f"/api/upload/sessions/{sid}/finalize")
+
+            bad = (await client.post("/api/upload/sessions", json={
+                "filename": "lecture.mp3", "sha256": "0" * 64,
+            })).json()["id"]
+            await client.patch(f"/api/upload/sessions/{bad}?offset=0", content=content)
+            mismatch = await client.post(f"/api/upload/sessions/{bad}/finalize")
+            discarded = await client.get(f"/api/upload/sessions/{bad}")
+
+    assert too_big.status_code == 413
+    assert early.status_code == 409
+    assert status.json()["offset"] == 60
+    assert status.json()["size"] == len(content)
+    assert status.headers["upload-offset"] == "60"
+    assert past_end.status_code == 413
+    assert done.status_code == 200
+    assert done.json()["file_size"] == len(content)
+    assert mismatch.status_code == 400
+    assert discarded.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_session_keeps_interrupted_chunk_and_expires():
+    import os
+    from starlette.requests import ClientDisconnect
+    from app.database import get_db
+    from app.services import upload_sessions
+
+    async def dropped():
+        yield b"first half "
+        raise ClientDisconnect()
+
+    async with get_db() as db:
+        session = await upload_sessions.create(db, "dev-user", "talk.mp3", ".mp3", has_video=None, source="upload")
+        with pytest.raises(ClientDisconnect):
+            await upload_sessions.append(db, session, 0, dropped(), 1024)
+        session = await upload_sessions.get(db, session["id"], "dev-user")
+        assert session["size"] == 11
+
+        assert await upload_sessions.expire(db) == 0
+        await db.execute("UPDATE upload_sessions SET updated_at = '2000-01-01T00:00:00+00:00'")
+        await db.commit()
+        assert await upload_sessions.expire(db) == 1
+        assert await upload_sessions.get(db, session["id"], "dev-user") is None
+    assert not os.path.exists(session["path"])
+
+
+@pytest.mark.asyncio
+async def test_upload_session_chunk_sent_twice_lands_once():
+    from app.database import get_db
+    from app.services import upload_sessions
+
+    async def chunk(data):
+        yield data
+
+    async with get_db() as db:
+        session = await upload_sessions.create(db, "dev-user", "talk.mp3", ".mp3", has_video=None, source="upload")
+        # Two processes read the session before either chunk was in
+        assert await upload_sessions.append(db, session, 0, chunk(b"first "), 1024) == 6
+        with pytest.raises(upload_sessions.OffsetMismatchError) as exc:
+            await upload_sessions.append(db, session, 0, chunk(b"first "), 1024)
+        assert exc.value.expected == 6
+        # Finalizing a stale view of the session changes nothing
+        assert not await upload_sessions.close(db, session)
+        current = await upload_sessions.get(db, session["id"], "dev-user")
+        assert await upload_sessions.close(db, current)
+    with open(session["path"], "rb") as f:
+        assert f.read() == b"first "
+    os.unlink(session["path"])
+
+
+@pytest.mark.asyncio
+async def test_upload_session_chunk_is_written_without_holding_the_write_lock():
+    import asyncio
+    import hashlib
+    from app.database import get_db
+    from app.services import upload_sessions
+
+    resume = asyncio.Event()
+    halfway = asyncio.Event()
+
+    async def slow():
+        yield b"first "
+        halfway.set()
+        await resume.wait()
+        yield b"second"
+
+    async def chunk(data):
+        yield data
+
+    async with get_db() as db:
+        session = await upload_sessions.create(db, "dev-user", "talk.mp3", ".mp3", has_video=None, source="upload")
+        writing = asyncio.create_task(upload_sessions.append(db, session, 0, slow(), 1024))
+        await halfway.wait()
+        async with get_db() as other:
+            # Jobs and heartbeats elsewhere can still write
+            await other.execute("BEGIN IMMEDIATE")
+            await other.rollback()
+            # The same chunk from a retry, or finalizing now, must wait for it
+            with pytest.raises(upload_sessions.OffsetMismatchError):
+                await upload_sessions.append(other, session, 0, chunk(b"first "), 1024)
+            current = await upload_sessions.get(other, session["id"], "dev-user")
+            assert not await upload_sessions.close(other, current)
+        resume.set()
+        assert await writing == 12
+        current = await upload_sessions.get(db, session["id"], "dev-user")
+        assert await upload_sessions.content_hash(current) == hashlib.sha256(b"first second").hexdigest()
+        assert await upload_sessions.close(db, current)
+    with open(session["path"], "rb") as f:
+        assert f.read() == b"first second"
+    os.unlink(session["path"])
+
+
+@pytest.mark.asyncio
+async def test_raw_upload_streams_body():
+    import hashlib
+    from app.database import get_db
+    content = b"\x1a\x45\xdf\xa3" + b"\x00" * 100
+    transport = ASGITransport(app=app)
+    with patch("app.routers.upload.convert_to_mp3", new_callable=AsyncMock) as mock_convert:
+        mock_convert.side_effect = _fake_convert
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.put(
+                "/api/upload/raw?filename=meeting%20notes.webm&has_video=false&source=recorder", content=content,
+            )
+            rejected = await client.put("/api/upload/raw?filename=notes.txt", content=b"text")
+            with patch("app.routers.upload.MAX_FILE_SIZE", 10):
+                too_large = await client.put("/api/upload/raw?filename=a.mp3", content=content)
+            empty = await client.put("/api/upload/raw?filename=a.mp3", content=b"")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["original_filename"] == "meeting notes.webm"
+    assert data["file_size"] == len(content)
+    async with get_db() as db:
+        cursor = await db.execute("SELECT content_hash, origin FROM files WHERE id = ?", (data["id"],))
+        row = await cursor.fetchone()
+    assert row["content_hash"] == hashlib.sha256(content).hexdigest()
+    assert row["origin"] == "recorder"
+    assert rejected.status_code == 400
+    assert too_large.status_code == 413
+    assert empty.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_receive_stream_enforces_limit_as_bytes_arrive(tmp_path):
+    from app.services import storage
+
+    written = []
+
+    async def body():
+        for chunk in (b"1234", b"5678", b"9"):
+            yield chunk
+            written.append(chunk)
+
+    target = tmp_path / "incoming.mp3"
+    with patch.object(storage, "incoming_path", return_value=str(target)):
+        with pytest.raises(storage.UploadTooLargeError):
+            await storage.receive_stream(body(), ".mp3", 8)
+    # Stopped at the chunk over the limit, and left nothing behind
+    assert written == [b"1234", b"5678"]
+    assert not target.exists()
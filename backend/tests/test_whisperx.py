@@ -1,56 +1,152 @@
+import asyncio
+
+import httpx
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
-from app.services.asr.whisperx import WhisperXBackend
+from app.database import get_db
+from app.services.asr import whisperx
+from app.services.asr.whisperx import WhisperXBackend, request_timeout
 from app.services.asr.base import TranscriptionSettings
 
-@pytest.mark.asyncio
-async def test_submit_sends_correct_params():
-    backend = WhisperXBackend()
+
+def _response():
     mock_response = MagicMock()
     mock_response.json.return_value = {
         "text": "Hello world",
         "segments": [{"start": 0.0, "end": 2.0, "text": "Hello world", "speaker": "SPEAKER_00"}],
     }
     mock_response.raise_for_status = MagicMock()
+    return mock_response
+
+
+async def _wait(backend, job_id):
+    for _ in range(100):
+        status = await backend.get_status(job_id)
+        if status.status not in ("pending", "processing"):
+            return status
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never finished")
 
-    with patch("app.services.asr.whisperx.httpx.AsyncClient") as MockClient, \
-         patch("builtins.open", MagicMock(return_value=MagicMock(__enter__=MagicMock(return_value=b""), __exit__=MagicMock(return_value=False)))):
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "path.mp3"
+    path.write_bytes(b"fake audio")
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_submit_sends_correct_params(audio):
+    backend = WhisperXBackend()
+    with patch("app.services.asr.whisperx.get_client") as MockClient:
         mock_client = AsyncMock()
-        mock_client.post.return_value = mock_response
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=False)
+        mock_client.post.return_value = _response()
         MockClient.return_value = mock_client
 
         settings_obj = TranscriptionSettings(language="de", model="large-v3")
-        job_id = await backend.submit("/fake/path.mp3", settings_obj)
+        job_id = await backend.submit(audio, settings_obj, audio_seconds=1200)
+        status = await _wait(backend, job_id)
 
-    assert job_id is not None
-    status = await backend.get_status(job_id)
     assert status.status == "completed"
+    kwargs = mock_client.post.call_args.kwargs
+    assert kwargs["content"].fields["language"] == "de"
+    # Timeout grows with the audio instead of a fixed 600s
+    assert kwargs["timeout"] == request_timeout(1200) > request_timeout(60)
+
 
 @pytest.mark.asyncio
-async def test_get_result_returns_utterances():
+async def test_get_result_returns_utterances(audio):
     backend = WhisperXBackend()
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
-        "text": "Hello world",
-        "segments": [{"start": 0.0, "end": 2.0, "text": "Hello world", "speaker": "SPEAKER_00"}],
-    }
-    mock_response.raise_for_status = MagicMock()
-
-    with patch("app.services.asr.whisperx.httpx.AsyncClient") as MockClient, \
-         patch("builtins.open", MagicMock(return_value=MagicMock(__enter__=MagicMock(return_value=b""), __exit__=MagicMock(return_value=False)))):
+    with patch("app.services.asr.whisperx.get_client") as MockClient:
         mock_client = AsyncMock()
-        mock_client.post.return_value = mock_response
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=False)
+        mock_client.post.return_value = _response()
         MockClient.return_value = mock_client
 
         settings_obj = TranscriptionSettings(language="de")
-        job_id = await backend.submit("/fake/path.mp3", settings_obj)
+        job_id = await backend.submit(audio, settings_obj)
+        await _wait(backend, job_id)
 
     result = await backend.get_result(job_id)
     assert len(result.utterances) == 1
     assert result.utterances[0].text == "Hello world"
     assert result.utterances[0].start == 0
     assert result.utterances[0].end == 2000
+    # Collected once read
+    async with get_db() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM asr_jobs")
+        assert (await cursor.fetchone())[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_before_transcription_and_reports_queued(audio, monkeypatch):
+    monkeypatch.setattr(whisperx.settings, "WHISPERX_MAX_CONCURRENT_PER_ENDPOINT", 1)
+    monkeypatch.setattr(whisperx, "_slots", {})
+    release = asyncio.Event()
+
+    async def slow_post(*args, **kwargs):
+        await release.wait()
+        return _response()
+
+    backend = WhisperXBackend()
+    with patch("app.services.asr.whisperx.get_client") as MockClient:
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = slow_post
+        MockClient.return_value = mock_client
+
+        first = await backend.submit(audio, TranscriptionSettings())
+        second = await backend.submit(audio, TranscriptionSettings())
+        await asyncio.sleep(0.05)
+        assert (await backend.get_status(first)).status == "processing"
+        # Waiting for the endpoint's only slot
+        assert (await backend.get_status(second)).status == "pending"
+
+        release.set()
+        assert (await _wait(backend, first)).status == "completed"
+        assert (await _wait(backend, second)).status == "completed"
+
+
+@pytest.mark.asyncio
+async def test_failures_and_lost_jobs(audio):
+    backend = WhisperXBackend()
+    with patch("app.services.asr.whisperx.get_client") as MockClient:
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = httpx.ConnectError("refused")
+        MockClient.return_value = mock_client
+        job_id = await backend.submit(audio, TranscriptionSettings())
+        # The original error surfaces, so the pipeline can hold the job
+        with pytest.raises(httpx.ConnectError):
+            await _wait(backend, job_id)
+
+    # A row without a task here was left behind by a restarted process
+    async with get_db() as db:
+        await db.execute(
+            "INSERT INTO asr_jobs (id, backend, status) VALUES ('orphan', 'whisperx', 'processing')",
+        )
+        await db.commit()
+    status = await backend.get_status("orphan")
+    assert status.status == "failed"
+    assert "restart" in status.error
+
+
+@pytest.mark.asyncio
+async def test_cancel_aborts_running_request(audio):
+    started = asyncio.Event()
+
+    async def hanging_post(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(3600)
+
+    backend = WhisperXBackend()
+    outstanding = backend.pool.endpoints[0].outstanding_seconds
+    with patch("app.services.asr.whisperx.get_client") as MockClient:
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = hanging_post
+        MockClient.return_value = mock_client
+        job_id = await backend.submit(audio, TranscriptionSettings(), audio_seconds=60)
+        task = whisperx._tasks[job_id]
+        await started.wait()
+        await backend.cancel(job_id)
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert task.cancelled()
+    assert backend.pool.endpoints[0].outstanding_seconds == pytest.approx(outstanding)
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app import worker
+from app.database import get_db
+from app.services import job_queue
+
+
+@pytest.mark.asyncio
+async def test_worker_process_runs_queued_jobs_and_releases_on_stop(monkeypatch, tmp_path):
+    monkeypatch.setattr(job_queue.settings, "JOB_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(worker, "HEARTBEAT_PATH", str(tmp_path / "alive"))
+    async with get_db() as db:
+        await db.execute("INSERT INTO users (id) VALUES ('u1')")
+        await db.execute(
+            "INSERT INTO transcriptions (id, user_id, status) VALUES ('t1', 'u1', 'pending')",
+        )
+        await db.commit()
+
+    started = asyncio.Event()
+
+    async def handler(job):
+        started.set()
+        await asyncio.Event().wait()
+
+    stop = asyncio.Event()
+    with patch.object(worker, "run_transcription_job", handler), \
+            patch.object(worker, "init_db", AsyncMock()):
+        task = asyncio.create_task(worker.run_worker(stop))
+        await asyncio.wait_for(started.wait(), timeout=5)
+        # The container health check sees a live worker, metrics or not
+        assert worker.healthy()
+        stop.set()
+        await asyncio.wait_for(task, timeout=5)
+
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status, lease_expires_at FROM transcriptions WHERE id = 't1'")
+        row = await cursor.fetchone()
+    # Still processing, but with an expired lease so another worker picks it up
+    assert row["status"] == "processing"
+    assert row["lease_expires_at"] < datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def test_health_check_fails_once_the_heartbeat_is_stale(monkeypatch, tmp_path):
+    import os
+    import time
+    heartbeat = tmp_path / "alive"
+    monkeypatch.setattr(worker, "HEARTBEAT_PATH", str(heartbeat))
+    assert not worker.healthy()
+    heartbeat.touch()
+    assert worker.healthy()
+    stale = time.time() - 3600
+    os.utime(heartbeat, (stale, stale))
+    assert not worker.healthy()
@@ -9,11 +9,15 @@ import type {
   PresetBundle, PresetBundleCreate, PresetBundleExpanded,
   ApiToken, ApiTokenCreated,
   Invitation, InvitationCreated, InvitationAcceptResponse,
-  TranslationResult, UtteranceSource,
+  TranslationResult, UtteranceSource, UploadSession,
 } from './types'
 
 const BASE = import.meta.env.BASE_URL.replace(/\/$/, '')
 
+// Resumable uploads send large files in slices of this size
+const UPLOAD_SLICE_BYTES = 8 * 1024 * 1024
+const UPLOAD_MAX_RETRIES = 8
+
 async function request<T>(url: string, options?: RequestInit): Promise<T> {
   let response: Response
   try {
@@ -46,13 +50,28 @@ async function request<T>(url: string, options?: RequestInit): Promise<T> {
   return response.json()
 }
 
+// Upload session calls: callers retry or fall back when the network drops,
+// so a failed fetch must not trigger request()'s auth redirect
+async function uploadRequest<T>(url: string, options?: RequestInit): Promise<T> {
+  const response = await fetch(`${BASE}${url}`, options)
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ detail: response.statusText }))
+    throw new Error(error.detail || response.statusText)
+  }
+  return response.json()
+}
+
 export const api = {
   getConfig: () => request<ConfigResponse>('/api/config'),
 
+  // The raw body is written once server-side; multipart would be spooled first
   uploadFile: async (file: File, signal?: AbortSignal): Promise<FileInfo> => {
-    const formData = new FormData()
-    formData.append('file', file)
-    const response = await fetch(`${BASE}/api/upload`, { method: 'POST', body: formData, signal })
+    const response = await fetch(`${BASE}/api/upload/raw?filename=${encodeURIComponent(file.name)}`, {
+      method: 'PUT',
+      body: file,
+      headers: { 'Content-Type': 'application/octet-stream' },
+      signal,
+    })
     if (!response.ok) {
       const error = await response.json().catch(() => ({ detail: response.statusText }))
       throw new Error(error.detail || response.statusText)
@@ -61,9 +80,12 @@ export const api = {
   },
 
   uploadRecording: async (file: File, hasVideo: boolean): Promise<FileInfo> => {
-    const formData = new FormData()
-    formData.append('file', file)
-    const response = await fetch(`${BASE}/api/upload?has_video=${hasVideo}`, { method: 'POST', body: formData })
+    const params = new URLSearchParams({ filename: file.name, has_video: String(hasVideo), source: 'recorder' })
+    const response = await fetch(`${BASE}/api/upload/raw?${params}`, {
+      method: 'PUT',
+      body: file,
+      headers: { 'Content-Type': 'application/octet-stream' },
+    })
     if (!response.ok) {
       const error = await response.json().catch(() => ({ detail: response.statusText }))
       throw new Error(error.detail || response.statusText)
@@ -71,6 +93,71 @@ export const api = {
     return response.json()
   },
 
+  // Chunked upload: the recorder sends its timeslices while it records
+  createUploadSession: (filename: string, hasVideo: boolean) =>
+    uploadRequest<UploadSession>('/api/upload/sessions', {
+      method: 'POST',
+      body: JSON.stringify({ filename, has_video: hasVideo, source: 'recorder' }),
+      headers: { 'Content-Type': 'application/json' },
+    }),
+
+  // Resolves to the bytes the server holds afterwards. A chunk at the wrong
+  // offset (409) resolves to the offset the server expects instead.
+  appendUploadChunk: async (id: string, offset: number, chunk: Blob, signal?: AbortSignal): Promise<number> => {
+    const response = await fetch(`${BASE}/api/upload/sessions/${id}?offset=${offset}`, {
+      method: 'PATCH',
+      body: chunk,
+      headers: { 'Content-Type': 'application/octet-stream' },
+      signal,
+    })
+    if (response.status === 409) return Number(response.headers.get('Upload-Offset'))
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ detail: response.statusText }))
+      throw new Error(error.detail || response.statusText)
+    }
+    return (await response.json() as UploadSession).offset
+  },
+
+  getUploadSession: (id: string, signal?: AbortSignal) =>
+    uploadRequest<UploadSession>(`/api/upload/sessions/${id}`, { signal }),
+
+  // Large files go up in slices. When the network drops, the upload waits,
+  // asks the server how much arrived and continues from there.
+  uploadFileResumable: async (file: File, signal?: AbortSignal): Promise<FileInfo> => {
+    const session = await uploadRequest<UploadSession>('/api/upload/sessions', {
+      method: 'POST',
+      body: JSON.stringify({ filename: file.name, size: file.size }),
+      headers: { 'Content-Type': 'application/json' },
+      signal,
+    })
+    try {
+      let offset = 0
+      let failures = 0
+      while (offset < file.size) {
+        try {
+          offset = await api.appendUploadChunk(session.id, offset, file.slice(offset, offset + UPLOAD_SLICE_BYTES), signal)
+          failures = 0
+        } catch (err) {
+          // fetch rejects with a TypeError when the request never completed;
+          // anything else is the server refusing the upload
+          if (!(err instanceof TypeError) || signal?.aborted || ++failures > UPLOAD_MAX_RETRIES) throw err
+          await new Promise((resolve) => setTimeout(resolve, Math.min(1000 * 2 ** failures, 30_000)))
+          offset = await api.getUploadSession(session.id, signal).then((s) => s.offset, () => offset)
+        }
+      }
+      return await api.finalizeUploadSession(session.id)
+    } catch (err) {
+      api.abortUploadSession(session.id).catch(() => { /* expires server-side */ })
+      throw err
+    }
+  },
+
+  finalizeUploadSession: (id: string) =>
+    uploadRequest<FileInfo>(`/api/upload/sessions/${id}/finalize`, { method: 'POST' }),
+
+  abortUploadSession: (id: string) =>
+    uploadRequest<{ status: string }>(`/api/upload/sessions/${id}`, { method: 'DELETE' }),
+
   startTranscription: (settings: TranscriptionSettings) =>
     request<{ id: string; status: string }>('/api/transcribe', {
       method: 'POST',
@@ -80,6 +167,10 @@ export const api = {
   getStatus: (id: string) => request<TranscriptionStatus>(`/api/status/${id}`),
   getTranscription: (id: string) => request<TranscriptionResult>(`/api/transcription/${id}`),
 
+  // Utterances already final while a segmented job is still running
+  getPartialTranscription: (id: string) =>
+    request<TranscriptionResult>(`/api/transcription/${id}?partial=true`),
+
   exportTranscription: async (id: string, format: string): Promise<string> => {
     const response = await fetch(`${BASE}/api/transcription/${id}/export/${format}`)
     if (!response.ok) throw new Error('Export failed')
@@ -101,6 +192,9 @@ export const api = {
   deleteTranscription: (id: string) =>
     request<{ status: string }>(`/api/transcription/${id}`, { method: 'DELETE' }),
 
+  cancelTranscription: (id: string) =>
+    request<{ id: string; status: string }>(`/api/transcription/${id}/cancel`, { method: 'POST' }),
+
   archiveTranscription: (id: string) =>
     request<{ status: string; expires_at: string }>(`/api/transcription/${id}/archive`, { method: 'POST' }),
 
@@ -170,6 +264,13 @@ export const api = {
     return new WebSocket(`${protocol}//${window.location.host}${BASE}/api/ws/status/${transcriptionId}`)
   },
 
+  connectLiveTranscription: (params: { language?: string | null; format: string; hasVideo: boolean }): WebSocket => {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+    const query = new URLSearchParams({ format: params.format, has_video: String(params.hasVideo) })
+    if (params.language) query.set('language', params.language)
+    return new WebSocket(`${protocol}//${window.location.host}${BASE}/api/ws/live?${query}`)
+  },
+
   // --- Presets ---
 
   getTranscriptionPresets: () => request<TranscriptionPreset[]>('/api/presets/transcription'),
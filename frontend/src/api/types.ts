@@ -8,6 +8,14 @@ export interface FileInfo {
   has_video: boolean
 }
 
+export interface UploadSession {
+  id: string
+  filename: string
+  offset: number
+  size: number | null
+  expires_at: string
+}
+
 export interface TranscriptionSettings {
   file_id: string
   language: string | null
@@ -20,9 +28,30 @@ export interface TranscriptionSettings {
 
 export interface TranscriptionStatus {
   id: string
-  status: 'pending' | 'processing' | 'completed' | 'failed'
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled'
   progress: number | null
   error: string | null
+  stage: TranscriptionStage['stage'] | null
+  stage_detail: TranscriptionStage['detail']
+  queue_position: number | null
+  expected_start_at: string | null
+  expected_completion_at: string | null
+  partial_utterances: number
+}
+
+export type TranscriptionEstimate = Pick<
+  TranscriptionStatus, 'queue_position' | 'expected_start_at' | 'expected_completion_at'
+>
+
+export type LiveMessage =
+  | { type: 'transcript'; final: Utterance[]; partial: Utterance[] }
+  | { type: 'done'; file: FileInfo; transcription_id: string; status: 'completed' | 'pending' }
+  | { type: 'error'; detail: string }
+
+export interface TranscriptionStage {
+  stage: 'queued' | 'converting' | 'uploading' | 'transcribing' | 'generating_title'
+  progress: number | null
+  detail: { position?: number; bytes_sent?: number; bytes_total?: number; expected_seconds?: number }
 }
 
 export interface Utterance {
@@ -35,6 +64,7 @@ export interface Utterance {
 export interface TranscriptionResult {
   id: string
   status: string
+  partial?: boolean
   utterances: Utterance[]
   text: string
   language: string | null
@@ -122,6 +152,13 @@ export interface RefinementResult {
   metadata: RefinementMetadata
 }
 
+export interface ModelQueue {
+  pool: string
+  queued: number
+  running: number
+  max_concurrent: number
+}
+
 export interface ConfigResponse {
   asr_backend: string
   whisper_models: string[]
@@ -135,6 +172,8 @@ export interface ConfigResponse {
   contact_email?: string
   is_admin?: boolean
   invitation_mode?: boolean
+  model_queues?: Record<string, ModelQueue>
+  live_transcription?: boolean
 }
 
 export interface AnalysisTemplate {
@@ -5,6 +5,8 @@ import { useStore } from '../../store'
 import { formatFileSize } from '../../utils/format'
 
 const MAX_FILE_SIZE = 1 * 1024 * 1024 * 1024 // 1GB
+// Above this, upload in resumable slices so a dropped connection loses little
+const RESUMABLE_UPLOAD_MIN_SIZE = 32 * 1024 * 1024
 
 export function FileUpload() {
   const { t } = useTranslation()
@@ -26,7 +28,9 @@ export function FileUpload() {
     setUploadAbortController(controller)
     setUploading(true)
     try {
-      const fileInfo = await api.uploadFile(selectedFile, controller.signal)
+      const fileInfo = selectedFile.size > RESUMABLE_UPLOAD_MIN_SIZE
+        ? await api.uploadFileResumable(selectedFile, controller.signal)
+        : await api.uploadFile(selectedFile, controller.signal)
       setFile(fileInfo)
     } catch (e) {
       // AbortError is a user-initiated cancel; don't show an error banner.
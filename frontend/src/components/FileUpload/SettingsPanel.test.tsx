@@ -82,4 +82,21 @@ describe('SettingsPanel — model field', () => {
 
     expect(onChange).toHaveBeenCalledWith({ model: 'large-v3' })
   })
+
+  it('shows how many jobs are queued for a model\'s pool', () => {
+    useStore.setState({
+      config: {
+        ...buildConfig(['base', 'large-v3']),
+        model_queues: {
+          base: { pool: 'cpu', queued: 0, running: 1, max_concurrent: 8 },
+          'large-v3': { pool: 'gpu', queued: 3, running: 4, max_concurrent: 4 },
+        },
+      },
+    })
+    render(<SettingsPanel values={buildValues({ model: 'base' })} onChange={vi.fn()} />)
+
+    const combobox = screen.getByRole('combobox', { name: 'Quality' })
+    const options = within(combobox).getAllByRole('option').map((o) => o.textContent)
+    expect(options).toEqual(['Standard (base)', 'Best quality (large-v3) · 3 queued'])
+  })
 })
@@ -157,7 +157,13 @@ export function SettingsPanel({ values, onChange, saveError = null }: SettingsPa
               >
                 {models.map((m) => {
                   const label = t(`settings.modelLabels.${m}`, '')
-                  return <option key={m} value={m}>{label ? `${label} (${m})` : m}</option>
+                  const queued = config?.model_queues?.[m]?.queued ?? 0
+                  const name = label ? `${label} (${m})` : m
+                  return (
+                    <option key={m} value={m}>
+                      {queued > 0 ? `${name} · ${t('settings.modelQueued', { count: queued })}` : name}
+                    </option>
+                  )
                 })}
               </select>
             )}
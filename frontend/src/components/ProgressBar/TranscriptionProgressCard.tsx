@@ -2,6 +2,8 @@ import { useEffect, useRef, useState } from 'react'
 import { useTranslation } from 'react-i18next'
 import { useStore } from '../../store'
 import { api } from '../../api/client'
+import { formatTime as formatOffset } from '../../utils/format'
+import type { TranscriptionEstimate, TranscriptionStage, Utterance } from '../../api/types'
 
 interface TranscriptionProgressCardProps {
   pendingTranscription?: boolean
@@ -26,9 +28,13 @@ export function TranscriptionProgressCard({
   const pollRef = useRef<ReturnType<typeof setInterval> | null>(null)
   const doneRef = useRef(false)
   const [errorMessage, setErrorMessage] = useState<string | null>(null)
+  const [cancelling, setCancelling] = useState(false)
+  const [stage, setStage] = useState<TranscriptionStage | null>(null)
+  const [estimate, setEstimate] = useState<TranscriptionEstimate | null>(null)
+  const [partial, setPartial] = useState<Utterance[]>([])
 
   useEffect(() => {
-    if (!transcriptionId || status === 'completed' || status === 'failed') return
+    if (!transcriptionId || status === 'completed' || status === 'failed' || status === 'cancelled') return
 
     doneRef.current = false
     retriesRef.current = 0
@@ -55,6 +61,11 @@ export function TranscriptionProgressCard({
       if (error) setErrorMessage(error)
     }
 
+    const handleCancelled = () => {
+      markDone()
+      setStatus('cancelled')
+    }
+
     const connect = () => {
       if (doneRef.current) return
       const ws = api.connectWebSocket(transcriptionId)
@@ -68,9 +79,22 @@ export function TranscriptionProgressCard({
             handleCompleted()
           } else if (data.status === 'failed') {
             handleFailed(data.error)
+          } else if (data.status === 'cancelled') {
+            handleCancelled()
           } else {
             setStatus(data.status)
+            setStage(data.stage ? { stage: data.stage, progress: data.progress ?? null, detail: data.detail ?? {} } : null)
+            setEstimate({
+              queue_position: data.queue_position ?? null,
+              expected_start_at: data.expected_start_at ?? null,
+              expected_completion_at: data.expected_completion_at ?? null,
+            })
           }
+        } else if (data.type === 'partial') {
+          // More of the start is final: show it while the rest is transcribed
+          api.getPartialTranscription(transcriptionId)
+            .then((result) => { if (!doneRef.current) setPartial(result.utterances) })
+            .catch(() => { /* next notification retries */ })
         }
       }
 
@@ -89,6 +113,8 @@ export function TranscriptionProgressCard({
                 handleCompleted()
               } else if (s.status === 'failed') {
                 handleFailed(s.error || undefined)
+              } else if (s.status === 'cancelled') {
+                handleCancelled()
               }
             } catch { /* ignore */ }
           }, 10000)
@@ -107,6 +133,19 @@ export function TranscriptionProgressCard({
     }
   }, [transcriptionId, status, setStatus, setResult])
 
+  const handleCancel = async () => {
+    if (!transcriptionId) return
+    setCancelling(true)
+    try {
+      await api.cancelTranscription(transcriptionId)
+      setStatus('cancelled')
+    } catch {
+      // Finished in the meantime: the status channel reports the outcome
+    } finally {
+      setCancelling(false)
+    }
+  }
+
   // Variant: pending upload (clicked Transcribe before upload finished)
   if (pendingTranscription && uploading && !file) {
     return (
@@ -196,18 +235,87 @@ export function TranscriptionProgressCard({
     )
   }
 
+  if (status === 'cancelled') {
+    return (
+      <div className="mx-6 my-4 p-5 bg-gray-800 rounded-lg border border-gray-700">
+        <div className="flex items-center justify-between gap-3">
+          <span className="text-gray-300">{t('transcription.cancelled')}</span>
+          {onTryAgain && (
+            <button
+              onClick={onTryAgain}
+              className="shrink-0 px-3 py-1.5 bg-gray-700 hover:bg-gray-600 text-white rounded text-sm"
+            >
+              {t('transcription.progress.editSettings')}
+            </button>
+          )}
+        </div>
+      </div>
+    )
+  }
+
   // In-progress (queued / processing)
-  const label =
+  let label =
     status === 'pending'
       ? t('transcription.progress.queued')
       : t('transcription.progress.processing')
+  if (stage?.stage === 'queued' && stage.detail.position) {
+    label = t('transcription.progress.stage.queuedAt', { position: stage.detail.position })
+  } else if (stage && stage.stage !== 'queued') {
+    label = t(`transcription.progress.stage.${stage.stage}`)
+  }
+  const percent = stage?.progress != null ? Math.round(stage.progress * 100) : null
+  const formatTime = (iso: string) =>
+    new Date(iso).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
+  let etaLabel: string | null = null
+  if (status === 'pending' && estimate?.expected_start_at) {
+    etaLabel = t('transcription.progress.expectedStart', { time: formatTime(estimate.expected_start_at) })
+  } else if (estimate?.expected_completion_at) {
+    etaLabel = t('transcription.progress.expectedCompletion', { time: formatTime(estimate.expected_completion_at) })
+  }
 
   return (
     <div className="mx-6 my-4 p-5 bg-gray-800 rounded-lg border border-gray-700">
-      <div className="flex items-center gap-3">
-        <div className="animate-spin h-5 w-5 border-2 border-blue-500 border-t-transparent rounded-full" />
-        <span className="text-gray-200">{label}</span>
+      <div className="flex items-center justify-between gap-3">
+        <div className="flex items-center gap-3">
+          <div className="animate-spin h-5 w-5 border-2 border-blue-500 border-t-transparent rounded-full" />
+          <span className="text-gray-200">
+            {label}
+            {percent != null && <span className="text-gray-400"> · {percent}%</span>}
+          </span>
+        </div>
+        <button
+          onClick={handleCancel}
+          disabled={cancelling}
+          className="shrink-0 px-3 py-1.5 bg-gray-700 hover:bg-gray-600 disabled:opacity-50 text-white rounded text-sm"
+        >
+          {cancelling ? t('transcription.progress.cancelling') : t('transcription.progress.cancel')}
+        </button>
       </div>
+      {percent != null && (
+        <div className="mt-3 h-1.5 bg-gray-700 rounded">
+          <div className="h-1.5 bg-blue-500 rounded transition-all" style={{ width: `${percent}%` }} />
+        </div>
+      )}
+      {etaLabel && <p className="text-gray-400 text-sm mt-2">{etaLabel}</p>}
+      {partial.length > 0 && (
+        <details className="mt-3">
+          <summary className="text-gray-300 text-sm cursor-pointer">
+            {t('transcription.progress.partialReady', {
+              count: partial.length,
+              time: formatOffset(partial[partial.length - 1].end),
+            })}
+          </summary>
+          <div className="mt-2 max-h-64 overflow-y-auto space-y-1 text-sm">
+            {partial.map((u, i) => (
+              <p key={i} className="text-gray-300">
+                <span className="text-gray-500 font-mono text-xs mr-2">{formatOffset(u.start)}</span>
+                {u.speaker && <span className="text-gray-400 mr-1">{u.speaker}:</span>}
+                {u.text}
+              </p>
+            ))}
+          </div>
+        </details>
+      )}
       <p className="text-gray-500 text-xs mt-2">
         {t('transcription.progress.youCanLeave')}
       </p>
@@ -1,6 +1,8 @@
 import { useState, useCallback, useEffect, useRef } from 'react'
 import { useTranslation } from 'react-i18next'
 import { useMediaRecorder, getFileExtension, getPreferredMimeType } from './useMediaRecorder'
+import { useLiveTranscription } from './useLiveTranscription'
+import { useChunkedUpload } from './useChunkedUpload'
 import { RecorderControls } from './RecorderControls'
 import { AudioLevelMeter } from './AudioLevelMeter'
 import { RecordingSources } from './RecordingSources'
@@ -13,6 +15,7 @@ export function RecorderPanel() {
   const file = useStore((s) => s.file)
   const setFile = useStore((s) => s.setFile)
   const transcriptionTitle = useStore((s) => s.transcriptionTitle)
+  const liveEnabled = useStore((s) => !!s.config?.live_transcription)
 
   const [audioDeviceId, setAudioDeviceId] = useState('')
   const [videoDeviceId, setVideoDeviceId] = useState('')
@@ -33,8 +36,28 @@ export function RecorderPanel() {
     if (capture) setUseCamera(false)
   }, [])
 
-  const { state, blob, stream, duration, error, start, pause, resume, stop, discard } =
-    useMediaRecorder({ audioDeviceId, videoDeviceId, useCamera, captureSystemAudio, secondAudioDeviceId, useMicrophone })
+  const live = useLiveTranscription()
+  const { push: pushLiveChunk } = live
+  const { push: pushUploadChunk, finish: finishUpload, reset: resetUpload } = useChunkedUpload()
+  // Chunks go to the live session, or are uploaded while recording
+  const handleChunk = useCallback((chunk: Blob, mimeType: string) => {
+    const hasVideo = useCamera && !captureSystemAudio
+    if (liveEnabled) pushLiveChunk(chunk, mimeType, hasVideo)
+    else pushUploadChunk(chunk, mimeType, hasVideo)
+  }, [liveEnabled, pushLiveChunk, pushUploadChunk, useCamera, captureSystemAudio])
+
+  const { state, blob, stream, duration, error, start, pause, resume, stop, discard: discardRecording } =
+    useMediaRecorder({
+      audioDeviceId, videoDeviceId, useCamera, captureSystemAudio, secondAudioDeviceId, useMicrophone,
+      onChunk: handleChunk,
+    })
+
+  const { reset: resetLive } = live
+  const discard = useCallback(() => {
+    resetLive()
+    resetUpload()
+    discardRecording()
+  }, [resetLive, resetUpload, discardRecording])
 
   const videoPreviewRef = useRef<HTMLVideoElement>(null)
 
@@ -57,12 +80,33 @@ export function RecorderPanel() {
     return () => window.removeEventListener('beforeunload', handler)
   }, [state, blob])
 
+  const { finish: finishLive } = live
   const handleUseRecording = useCallback(async () => {
     if (!blob) return
     setUploading(true)
     setUploadError(null)
 
     try {
+      // The live session already holds the recording: take its file and transcript
+      const liveResult = await finishLive()
+      if (liveResult) {
+        const store = useStore.getState()
+        store.setTranscriptionId(liveResult.transcription_id)
+        store.setTranscriptionStatus(liveResult.status)
+        if (liveResult.status === 'completed') {
+          store.setTranscriptionResult(await api.getTranscription(liveResult.transcription_id))
+        }
+        setFile(liveResult.file)
+        return
+      }
+
+      // Most of the recording is usually on the server already
+      const uploaded = await finishUpload()
+      if (uploaded) {
+        setFile(uploaded)
+        return
+      }
+
       const mimeType = blob.type || getPreferredMimeType(useCamera)
       const ext = getFileExtension(mimeType)
       const timestamp = new Date().toISOString().replace(/[:.]/g, '-')
@@ -76,7 +120,7 @@ export function RecorderPanel() {
     } finally {
       setUploading(false)
     }
-  }, [blob, useCamera, setFile, t])
+  }, [blob, useCamera, setFile, finishLive, finishUpload, t])
 
   // Auto-upload once the recording is captured — avoids a second "Transcribe"
   // press on an intermediate page. The settings panel + Transcribe / Discard
@@ -110,8 +154,10 @@ export function RecorderPanel() {
     } catch {
       // Audio cue is best-effort
     }
+    resetLive()
+    resetUpload()
     await start()
-  }, [start])
+  }, [start, resetLive, resetUpload])
 
   const isActive = state === 'recording' || state === 'paused'
 
@@ -168,6 +214,14 @@ export function RecorderPanel() {
         </div>
       )}
 
+      {/* Live transcript while recording */}
+      {liveEnabled && isActive && (live.final.length > 0 || live.partial.length > 0) && (
+        <div className="max-h-48 overflow-y-auto p-3 bg-gray-900 rounded text-sm text-gray-200" aria-live="polite">
+          {live.final.map((u) => u.text).join(' ')}{' '}
+          <span className="text-gray-500">{live.partial.map((u) => u.text).join(' ')}</span>
+        </div>
+      )}
+
       {/* Consent reminder */}
       {state === 'idle' && (
         <p className="text-xs text-gray-400 text-center">
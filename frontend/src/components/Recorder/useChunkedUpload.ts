@@ -0,0 +1,86 @@
+import { useRef, useCallback, useEffect } from 'react'
+import { api } from '../../api/client'
+import type { FileInfo } from '../../api/types'
+import { getFileExtension } from './useMediaRecorder'
+
+interface UseChunkedUploadReturn {
+  push: (chunk: Blob, mimeType: string, hasVideo: boolean) => void
+  finish: () => Promise<FileInfo | null>
+  reset: () => void
+}
+
+const MAX_ATTEMPTS = 4
+
+async function sendChunk(sessionId: string, chunk: Blob, start: number): Promise<number> {
+  // Retries network errors; after one, the server says how much of the chunk it kept
+  const end = start + chunk.size
+  let offset = start
+  for (let attempt = 1; ; attempt++) {
+    try {
+      offset = await api.appendUploadChunk(sessionId, offset, chunk.slice(offset - start))
+      if (offset >= end) return offset
+    } catch (err) {
+      if (attempt >= MAX_ATTEMPTS) throw err
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** attempt))
+    }
+    if (offset < start || attempt >= MAX_ATTEMPTS) throw new Error('Upload out of sync')
+  }
+}
+
+export function useChunkedUpload(): UseChunkedUploadReturn {
+  const sessionRef = useRef<Promise<string> | null>(null)
+  // Chunks are sent one after another, in recording order
+  const queueRef = useRef<Promise<void>>(Promise.resolve())
+  const offsetRef = useRef(0)
+  const failedRef = useRef(false)
+
+  const abort = useCallback(() => {
+    const session = sessionRef.current
+    sessionRef.current = null
+    queueRef.current = Promise.resolve()
+    offsetRef.current = 0
+    failedRef.current = false
+    session?.then((id) => api.abortUploadSession(id)).catch(() => { /* expires server-side */ })
+  }, [])
+
+  useEffect(() => abort, [abort])
+
+  const push = useCallback((chunk: Blob, mimeType: string, hasVideo: boolean) => {
+    if (failedRef.current) return
+    if (!sessionRef.current) {
+      const timestamp = new Date().toISOString().replace(/[:.]/g, '-')
+      const filename = `recording-${timestamp}.${getFileExtension(mimeType)}`
+      sessionRef.current = api.createUploadSession(filename, hasVideo).then((s) => s.id)
+    }
+    const session = sessionRef.current
+    queueRef.current = queueRef.current
+      .then(async () => {
+        if (failedRef.current) return
+        offsetRef.current = await sendChunk(await session, chunk, offsetRef.current)
+      })
+      .catch(() => {
+        // The recording is still in memory: it is uploaded whole when stopped
+        failedRef.current = true
+      })
+  }, [])
+
+  const finish = useCallback(async (): Promise<FileInfo | null> => {
+    const session = sessionRef.current
+    if (!session) return null
+    await queueRef.current
+    if (failedRef.current) {
+      abort()
+      return null
+    }
+    try {
+      const fileInfo = await api.finalizeUploadSession(await session)
+      sessionRef.current = null
+      return fileInfo
+    } catch {
+      abort()
+      return null
+    }
+  }, [abort])
+
+  return { push, finish, reset: abort }
+}
@@ -0,0 +1,106 @@
+import { useState, useRef, useCallback, useEffect } from 'react'
+import { api } from '../../api/client'
+import type { LiveMessage, Utterance } from '../../api/types'
+
+export type LiveResult = Extract<LiveMessage, { type: 'done' }>
+
+interface UseLiveTranscriptionReturn {
+  final: Utterance[]
+  partial: Utterance[]
+  active: boolean
+  failed: boolean
+  push: (chunk: Blob, mimeType: string, hasVideo: boolean) => void
+  finish: () => Promise<LiveResult | null>
+  reset: () => void
+}
+
+// How long to wait for the server's last pass and the stored recording
+const FINISH_TIMEOUT_MS = 120_000
+
+export function useLiveTranscription(language?: string | null): UseLiveTranscriptionReturn {
+  const [final, setFinal] = useState<Utterance[]>([])
+  const [partial, setPartial] = useState<Utterance[]>([])
+  const [active, setActive] = useState(false)
+  const [failed, setFailed] = useState(false)
+
+  const wsRef = useRef<WebSocket | null>(null)
+  const resultRef = useRef<((result: LiveResult | null) => void) | null>(null)
+
+  const close = useCallback(() => {
+    wsRef.current?.close()
+    wsRef.current = null
+    setActive(false)
+  }, [])
+
+  useEffect(() => close, [close])
+
+  const connect = useCallback((mimeType: string, hasVideo: boolean) => {
+    const format = mimeType.includes('mp4') ? 'mp4' : 'webm'
+    const ws = api.connectLiveTranscription({ language, format, hasVideo })
+    ws.binaryType = 'arraybuffer'
+    ws.onmessage = (event) => {
+      const data = JSON.parse(event.data) as LiveMessage
+      if (data.type === 'transcript') {
+        setFinal((prev) => (data.final.length ? [...prev, ...data.final] : prev))
+        setPartial(data.partial)
+      } else if (data.type === 'done') {
+        resultRef.current?.(data)
+        resultRef.current = null
+      }
+    }
+    ws.onclose = () => {
+      // Closed before "done": the caller falls back to a normal upload
+      resultRef.current?.(null)
+      resultRef.current = null
+      if (wsRef.current === ws) {
+        wsRef.current = null
+        setActive(false)
+        setFailed(true)
+      }
+    }
+    wsRef.current = ws
+    setActive(true)
+    setFailed(false)
+    return ws
+  }, [language])
+
+  const push = useCallback((chunk: Blob, mimeType: string, hasVideo: boolean) => {
+    if (failed) return
+    const ws = wsRef.current ?? connect(mimeType, hasVideo)
+    // WebSocket.send queues while connecting, but only once open; chunks must stay in order
+    if (ws.readyState === WebSocket.CONNECTING) {
+      ws.addEventListener('open', () => ws.send(chunk), { once: true })
+    } else if (ws.readyState === WebSocket.OPEN) {
+      ws.send(chunk)
+    }
+  }, [connect, failed])
+
+  const finish = useCallback((): Promise<LiveResult | null> => {
+    const ws = wsRef.current
+    if (!ws) return Promise.resolve(null)
+    return new Promise((resolve) => {
+      const timer = setTimeout(() => {
+        resultRef.current = null
+        resolve(null)
+        close()
+      }, FINISH_TIMEOUT_MS)
+      resultRef.current = (result) => {
+        clearTimeout(timer)
+        resolve(result)
+        if (result) close()
+      }
+      const sendStop = () => ws.send(JSON.stringify({ type: 'stop' }))
+      if (ws.readyState === WebSocket.OPEN) sendStop()
+      else ws.addEventListener('open', sendStop, { once: true })
+    })
+  }, [close])
+
+  const reset = useCallback(() => {
+    close()
+    setFinal([])
+    setPartial([])
+    setFailed(false)
+  }, [close])
+
+  return { final, partial, active, failed, push, finish, reset }
+}
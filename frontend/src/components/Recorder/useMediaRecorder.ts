@@ -10,6 +10,8 @@ interface UseMediaRecorderOptions {
   captureSystemAudio?: boolean
   secondAudioDeviceId?: string
   useMicrophone?: boolean
+  // Called with each MediaRecorder timeslice as it arrives (live transcription, chunked upload)
+  onChunk?: (chunk: Blob, mimeType: string) => void
 }
 
 interface UseMediaRecorderReturn {
@@ -57,6 +59,8 @@ export function useMediaRecorder(options: UseMediaRecorderOptions = {}): UseMedi
   const mixAudioContextRef = useRef<AudioContext | null>(null)
   const displayEndedHandlerRef = useRef<(() => void) | null>(null)
   const secondStreamRef = useRef<MediaStream | null>(null)
+  const onChunkRef = useRef(options.onChunk)
+  onChunkRef.current = options.onChunk
 
   const stopAllTracks = useCallback(() => {
     // Remove ended listener before stopping tracks
@@ -316,7 +320,10 @@ export function useMediaRecorder(options: UseMediaRecorderOptions = {}): UseMedi
       const recorder = new MediaRecorder(recordingStream, mimeType ? { mimeType } : undefined)
 
       recorder.ondataavailable = (e) => {
-        if (e.data.size > 0) chunksRef.current.push(e.data)
+        if (e.data.size > 0) {
+          chunksRef.current.push(e.data)
+          if (!discardingRef.current) onChunkRef.current?.(e.data, recorder.mimeType || mimeType)
+        }
       }
 
       recorder.onstop = () => {
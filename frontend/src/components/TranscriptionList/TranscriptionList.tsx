@@ -269,6 +269,7 @@ export function TranscriptionList() {
               <span className={`text-xs px-2 py-0.5 rounded ${
                 item.status === 'completed' ? 'bg-green-900 text-green-300' :
                 item.status === 'failed' ? 'bg-red-900 text-red-300' :
+                item.status === 'cancelled' ? 'bg-gray-700 text-gray-300' :
                 'bg-yellow-900 text-yellow-300'
               }`}>
                 {item.status}